@@ -1,10 +1,53 @@
+import argparse
+import heapq
+import itertools
 import tkinter as tk
 import tkinter.messagebox as messagebox
 import random
 import time
+from collections import Counter
+
+TICK_MS = 200
+ENEMY_LIFETIME_MS = 3000
+ENEMY_RESPAWN_MS = (2000, 5000)
+WAVE_LIFETIME_MS = 6000
+POWER_UP_LIFETIME_MS = 5000
+POWER_UP_POINTS = 3
+
+
+class EventScheduler:
+    # Every timed event of the game in one heap, run by the update loop
+    # instead of one Tk after() callback each. The clock is game time in ms
+    # and moves a tick at a time, so hundreds of pending spawns and despawns
+    # are heap entries and the Tk event queue only ever holds the update.
+    def __init__(self):
+        self.now = 0
+        self.heap = []
+        self.counter = itertools.count()
+
+    def schedule(self, delay, callback, *args):
+        # An event due now would run in the advance() that scheduled it, a
+        # spawner rescheduling itself that way would never let it return
+        assert delay > 0, "events must be scheduled into the future"
+        event = [self.now + delay, next(self.counter), callback, args]
+        heapq.heappush(self.heap, event)
+        return event
+
+    def cancel(self, event):
+        # Left in the heap and skipped when it comes up
+        event[2] = None
+
+    def advance(self, ms):
+        self.now += ms
+        heap = self.heap
+        while heap and heap[0][0] <= self.now:
+            _, _, callback, args = heapq.heappop(heap)
+            if callback is not None:
+                callback(*args)
+
 
 class SnakeGame:
-    def __init__(self, master):
+    def __init__(self, master, wave_size=0, wave_ms=8000, power_up_ms=0):
         self.master = master
         self.master.title("Snake Game")
         self.master.geometry("400x400")
@@ -19,11 +62,24 @@ class SnakeGame:
         self.score_label = self.canvas.create_text(20, 10, text="Score: 0", fill="white", anchor="nw")
 
         self.food = self.create_food()
-        self.enemy_snake = None  # Enemy snake object
         self.obstacles = []
+        # How many obstacle and enemy segments are on each (x, y), kept up to
+        # date as they come and go so a collision is a lookup
+        self.obstacle_cells = Counter()
+        self.enemy_cells = Counter()
+        self.power_ups = {}
+        self.scheduler = EventScheduler()
+        self.wave_size = wave_size
+        self.wave_ms = wave_ms
+        self.power_up_ms = power_up_ms
+        self.running = True
 
         self.master.bind("<KeyPress>", self.change_direction)
 
+        if wave_size:
+            self.scheduler.schedule(wave_ms, self.spawn_obstacle_wave)
+        if power_up_ms:
+            self.scheduler.schedule(power_up_ms, self.spawn_power_up)
         self.update()
 
     def create_food(self):
@@ -31,7 +87,7 @@ class SnakeGame:
         y = random.randint(0, 19) * 20
         food = self.canvas.create_rectangle(x, y, x + 20, y + 20, fill="red")
         return food
-    
+
     def create_enemy_snake(self):
         segments = []
         x = random.randint(0, 17) * 20  # Adjusted to avoid exceeding canvas bounds
@@ -39,12 +95,22 @@ class SnakeGame:
         for _ in range(3):
             segments.append((x, y))
             x -= 20
-        enemy_snake = [self.canvas.create_rectangle(x, y, x + 20, y + 20, fill="blue") for (x, y) in segments]
-        return enemy_snake
+        items = [self.canvas.create_rectangle(x, y, x + 20, y + 20, fill="blue") for (x, y) in segments]
+        self.enemy_cells.update(segments)
+        return segments, items
 
     def create_obstacle(self, x, y):
         obstacle = self.canvas.create_rectangle(x, y, x + 20, y + 20, fill="gray")
         self.obstacles.append(obstacle)
+        self.obstacle_cells[(x, y)] += 1
+        return obstacle
+
+    def remove_obstacle(self, obstacle, cell):
+        self.canvas.delete(obstacle)
+        self.obstacles.remove(obstacle)
+        self.obstacle_cells[cell] -= 1
+        if not self.obstacle_cells[cell]:
+            del self.obstacle_cells[cell]
 
     def check_collision(self):
         x, y = self.snake[0]
@@ -66,6 +132,10 @@ class SnakeGame:
         self.snake.insert(0, new_head)
 
     def update(self):
+        if not self.running:
+            return
+        # Whatever is due this tick spawns or leaves before the snake moves
+        self.scheduler.advance(TICK_MS)
         self.move_snake()
         self.snake = self.snake[:len(self.snake)-1]
         head = self.snake[0]
@@ -82,41 +152,29 @@ class SnakeGame:
             self.score += 1
             self.canvas.itemconfig(self.score_label, text=f"Score: {self.score}")
 
-        if self.check_collision() or self.check_collision_with_obstacle():
-            messagebox.showinfo("Game Over", "Best luck next time")
-            self.game_over()
-
-        for obstacle_coords in self.obstacles:
-            if self.check_collision_with_obstacle():
-                messagebox.showinfo("Game Over", "Best luck next time")
-                self.game_over()
-
-        for segment in self.snake[1:]:
-            if head[0] == segment[0] and head[1] == segment[1]:
-                messagebox.showinfo("Game Over", "Best luck next time")
-                self.game_over()
+        power_up = self.power_ups.pop(head, None)
+        if power_up is not None:
+            item, event = power_up
+            self.canvas.delete(item)
+            self.scheduler.cancel(event)
+            self.score += POWER_UP_POINTS
+            self.canvas.itemconfig(self.score_label, text=f"Score: {self.score}")
 
-        if self.enemy_snake is not None and self.check_collision_with_enemy():
+        # One pass: the head against the board edge and the indexes, then
+        # against the rest of the snake
+        if (self.check_collision() or self.check_collision_with_obstacle()
+                or self.check_collision_with_enemy() or head in self.snake[1:]):
             messagebox.showinfo("Game Over", "Best luck next time")
             self.game_over()
+            return
 
-        self.master.after(200, self.update)
+        self.master.after(TICK_MS, self.update)
 
     def check_collision_with_enemy(self):
-        head = self.snake[0]
-        for segment in self.enemy_snake:
-            segment_coords = self.canvas.coords(segment)
-            if head[0] == segment_coords[0] and head[1] == segment_coords[1]:
-                return True
-        return False
+        return self.snake[0] in self.enemy_cells
 
     def check_collision_with_obstacle(self):
-        head = self.snake[0]
-        for obstacle in self.obstacles:
-            obstacle_coords = self.canvas.coords(obstacle)
-            if head[0] == obstacle_coords[0] and head[1] == obstacle_coords[1]:
-                return True
-        return False
+        return self.snake[0] in self.obstacle_cells
 
     def change_direction(self, event):
         if event.keysym == "Right" and not self.direction == "Left":
@@ -129,29 +187,73 @@ class SnakeGame:
             self.direction = "Down"
 
     def game_over(self):
+        self.running = False
         self.master.destroy()
         messagebox.showinfo("Game Over", "Game Over")
         print('game over')
 
     def spawn_enemy_snake(self):
-        self.enemy_snake = self.create_enemy_snake()
-        self.master.after(3000, self.disappear_enemy_snake)
+        enemy = self.create_enemy_snake()
+        self.scheduler.schedule(ENEMY_LIFETIME_MS, self.disappear_enemy_snake, enemy)
 
-    def disappear_enemy_snake(self):
-        for segment in self.enemy_snake:
+    def disappear_enemy_snake(self, enemy):
+        segments, items = enemy
+        for segment in items:
             self.canvas.delete(segment)
-        self.enemy_snake = None
-        delay = random.randint(2000, 5000)
-        self.master.after(delay, self.spawn_enemy_snake)
+        self.enemy_cells.subtract(segments)
+        for cell in segments:
+            if not self.enemy_cells[cell]:
+                del self.enemy_cells[cell]
+        delay = random.randint(*ENEMY_RESPAWN_MS)
+        self.scheduler.schedule(delay, self.spawn_enemy_snake)
 
     def spawn_obstacle(self):
         obstacle_positions = [(140, 140), (160, 140), (180, 140), (200, 140)]
         for position in obstacle_positions:
             self.create_obstacle(*position)
 
+    def spawn_obstacle_wave(self):
+        # wave_size obstacles off the snake for WAVE_LIFETIME_MS, then the next wave
+        wave = []
+        for _ in range(self.wave_size):
+            cell = (random.randint(0, 19) * 20, random.randint(0, 19) * 20)
+            if cell not in self.snake:
+                wave.append((self.create_obstacle(*cell), cell))
+        self.scheduler.schedule(WAVE_LIFETIME_MS, self.clear_obstacle_wave, wave)
+        self.scheduler.schedule(self.wave_ms, self.spawn_obstacle_wave)
+
+    def clear_obstacle_wave(self, wave):
+        for obstacle, cell in wave:
+            self.remove_obstacle(obstacle, cell)
+
+    def spawn_power_up(self):
+        # Worth POWER_UP_POINTS if eaten before it fades
+        cell = (random.randint(0, 19) * 20, random.randint(0, 19) * 20)
+        if cell not in self.power_ups:
+            item = self.canvas.create_rectangle(cell[0], cell[1], cell[0] + 20, cell[1] + 20, fill="gold")
+            event = self.scheduler.schedule(POWER_UP_LIFETIME_MS, self.remove_power_up, cell)
+            self.power_ups[cell] = (item, event)
+        self.scheduler.schedule(self.power_up_ms, self.spawn_power_up)
+
+    def remove_power_up(self, cell):
+        item, _ = self.power_ups.pop(cell)
+        self.canvas.delete(item)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play the classic Snake game.")
+    parser.add_argument("--enemies", type=int, default=1, help="enemy snakes coming and going at once")
+    parser.add_argument("--wave-size", type=int, default=0, help="obstacles in every timed wave, 0 for none")
+    parser.add_argument("--wave-ms", type=int, default=8000, help="milliseconds between obstacle waves")
+    parser.add_argument("--power-up-ms", type=int, default=0, help="milliseconds between power-ups, 0 for none")
+    args = parser.parse_args()
+    if args.wave_size > 0 and args.wave_ms <= 0:
+        parser.error("--wave-ms must be positive when there are waves")
+    if args.power_up_ms < 0:
+        parser.error("--power-up-ms can't be negative")
+
     root = tk.Tk()
-    game = SnakeGame(root)
-    game.spawn_enemy_snake()
+    game = SnakeGame(root, args.wave_size, args.wave_ms, args.power_up_ms)
+    for _ in range(args.enemies):
+        game.spawn_enemy_snake()
     game.spawn_obstacle()
     root.mainloop()
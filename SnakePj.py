@@ -1,236 +1,398 @@
+import argparse
 import tkinter as tk
-import random
-from queue import PriorityQueue
 import time
+from collections import deque
+
+from pathfinding import JumpPointSearch
+from planning import PLAN_MS, PlanningWorker
+from profiling import TickProfiler
+from replay import ReplayPlayer, ReplayRecorder
+from snake_engine import (
+    HEIGHT,
+    WIDTH,
+    INITIAL_AI_SNAKE_COORDS,
+    INITIAL_SNAKE_COORDS,
+    OBSTACLES_COUNT,
+    GAME_TIME,
+    TICK_MS,
+    MAX_BOARD_CELLS,
+    STRATEGIES,
+    AISnake,
+    SnakeEngine,
+)
+
+FRAME_MS = 16 # draw at most this often, about one display frame
+MINIMAP_SIZE = 160 # pixels along the longer side of the board
+MINIMAP_REFRESH_TICKS = 10 # the occupancy image is rebuilt this often
+
+
+class SnakeSprite:
+    # One persistent canvas rectangle per segment. When the snake advances the
+    # rectangles at the tail are moved to the new head positions instead of
+    # deleting and recreating the whole body every tick.
+    def __init__(self, canvas, fill, tag):
+        self.canvas = canvas
+        self.fill = fill
+        self.tag = tag
+        self.items = deque()
+        self.moves = 0
+
+    def create_segment(self, segment):
+        return self.canvas.create_rectangle(
+            segment[0],
+            segment[1],
+            segment[0] + 20,
+            segment[1] + 20,
+            fill=self.fill,
+            tags=self.tag,
+        )
 
-HEIGHT = 650
-WIDTH = 1000
-INITIAL_AI_SNAKE_COORDS = [(100, 200), (90, 200), (80, 200)]
-INITIAL_SNAKE_COORDS = [(100, 100), (90, 100), (80, 100)]
-OBSTACLES_COUNT = 20
-GAME_TIME = 300 # in seconds
-
-
-class AISnake:
-    def __init__(self, game):
-        self.game = game
-        self.coordinates = INITIAL_AI_SNAKE_COORDS
-        self.direction = "Down"
-
-    def decide_direction(self, food_coords, obstacle_coords, user_snake_coords):
-        # A* algorithm for pathfinding
-        path = self.greedy_search(food_coords, obstacle_coords, user_snake_coords)
-        if path:
-            # Move towards the next point in the path
-            next_point = path[1]
-            head = self.coordinates[0]
-            if head[0] < next_point[0]:
-                self.direction = "Right"
-            elif head[0] > next_point[0]:
-                self.direction = "Left"
-            elif head[1] < next_point[1]:
-                self.direction = "Down"
+    def place(self, item, segment):
+        self.canvas.coords(item, segment[0], segment[1], segment[0] + 20, segment[1] + 20)
+
+    def draw(self, coordinates, moves):
+        # moves is how many steps the snake has taken in total, so the sprite
+        # can catch up even if some ticks were never drawn
+        items = self.items
+        steps = moves - self.moves
+        self.moves = moves
+        if not coordinates:
+            while items:
+                self.canvas.delete(items.pop())
+            return
+        if steps >= len(items) or steps < 0:
+            for item, segment in zip(items, coordinates):
+                self.place(item, segment)
+        elif steps > 0:
+            items.rotate(steps)
+            for i in range(steps):
+                self.place(items[i], coordinates[i])
+        while len(items) > len(coordinates):
+            self.canvas.delete(items.pop())
+        for segment in coordinates[len(items):]:
+            items.append(self.create_segment(segment))
+
+
+class HudText:
+    # A canvas text item that is only reconfigured when its text changes
+    def __init__(self, canvas, x, y, fill, tag, **options):
+        self.canvas = canvas
+        self.text = None
+        self.item = canvas.create_text(x, y, font=('consolas', 12), fill=fill, tags=tag, **options)
+
+    def set(self, text):
+        if text != self.text:
+            self.text = text
+            self.canvas.itemconfig(self.item, text=text)
+
+
+class Viewport:
+    # The part of a board larger than the window that is on screen, and
+    # canvas items for just the occupied cells inside it. Items are keyed by
+    # cell and moved, hidden or reused from a spare pool per colour as the
+    # picture changes, so the canvas never holds more than a screenful
+    # however big the board is. The camera follows the user's snake (or a
+    # live AI snake once it died) and only scrolls when the head leaves the
+    # middle half of the screen; scrolling moves every item in one call.
+    def __init__(self, canvas, width, height):
+        self.canvas = canvas
+        self.cols = width // 20 + 1
+        self.rows = height // 20 + 1
+        self.x0 = self.y0 = None
+        self.items = {}
+        self.spare = {}
+
+    def follow(self, engine):
+        grid = engine.grid
+        head = engine.snake.head_cell()
+        if head < 0:
+            alive = [s for s in engine.ai_snakes if not s.died]
+            head = alive[0].coordinates.head_cell() if alive else -1
+        if head < 0:
+            return
+        x, y = head % grid.cols, head // grid.cols
+        x0, y0 = self.x0, self.y0
+        if x0 is None or not x0 + self.cols // 4 <= x < x0 + 3 * self.cols // 4:
+            x0 = x - self.cols // 2
+        if y0 is None or not y0 + self.rows // 4 <= y < y0 + 3 * self.rows // 4:
+            y0 = y - self.rows // 2
+        x0 = max(0, min(x0, grid.cols - self.cols + 1))
+        y0 = max(0, min(y0, grid.rows - self.rows + 1))
+        if self.x0 is not None and (x0, y0) != (self.x0, self.y0):
+            self.canvas.move("world", (self.x0 - x0) * 20, (self.y0 - y0) * 20)
+        self.x0, self.y0 = x0, y0
+
+    def visible(self, engine):
+        # {cell: colour} for every occupied cell on screen
+        grid = engine.grid
+        colours = {ai_snake.id: ai_snake.colour for ai_snake in engine.ai_snakes}
+        cells = {}
+        x_end = min(self.x0 + self.cols, grid.cols)
+        for y in range(self.y0, min(self.y0 + self.rows, grid.rows)):
+            start = y * grid.cols + self.x0
+            stop = y * grid.cols + x_end
+            rows = zip(grid.obstacles[start:stop], grid.snake[start:stop], grid.ai_snake[start:stop])
+            for i, (obstacle, snake, ai_snake) in enumerate(rows, start):
+                if obstacle:
+                    cells[i] = "white"
+                elif snake:
+                    cells[i] = "green"
+                elif ai_snake:
+                    cells[i] = colours.get(grid.owners[i][-1], "yellow")
+        food = grid.index(engine.food) if engine.food is not None else -1
+        x, y = food % grid.cols, food // grid.cols
+        if food >= 0 and self.x0 <= x < x_end and self.y0 <= y < self.y0 + self.rows:
+            cells[food] = "blue"
+        return cells
+
+    def draw(self, engine):
+        self.follow(engine)
+        if self.x0 is None:
+            return
+        canvas, items, cols = self.canvas, self.items, engine.grid.cols
+        cells = self.visible(engine)
+        for i in [i for i, (item, fill) in items.items() if cells.get(i) != fill]:
+            item, fill = items.pop(i)
+            canvas.itemconfig(item, state="hidden")
+            self.spare.setdefault(fill, []).append(item)
+        created = False
+        for i, fill in cells.items():
+            if i in items:
+                continue
+            x = (i % cols - self.x0) * 20
+            y = (i // cols - self.y0) * 20
+            spare = self.spare.get(fill)
+            if spare:
+                item = spare.pop()
+                canvas.coords(item, x, y, x + 20, y + 20)
+                canvas.itemconfig(item, state="normal")
             else:
-                self.direction = "Up"
-
-    def check_collision(self, obstacle_coords):
-        x, y = self.coordinates[0]
-        def is_collided(obj_coords):
-            return obj_coords[0] == x and obj_coords[1] == y
-        # Boundary check
-        if x < 0 or x >= WIDTH or y < 0 or y >= HEIGHT:
-            # Game over condition (you can implement game over logic here)
-            self.game.on_ai_snake_died("End! Enemy Snake died because it hit the boundary.")
-
-        # Snake colliding with a obstacle
-        for coords in obstacle_coords:
-            if is_collided(coords):
-                self.game.on_ai_snake_died("End! Enemy Snake died because it hit an obstacle.")
-
-        # Snake colliding with itself
-        for body_part in self.coordinates[1:]:
-            if is_collided(body_part):
-                self.game.on_ai_snake_died("End! Enemy Snake died because it hit itself.")
-
-        for body_part in self.game.snake:
-            if is_collided(body_part):
-                self.game.on_ai_snake_died("End! Enemy Snake died because it hit User Snake.")
-
-    def move(self):
-        head = self.coordinates[0]
-        new_head = None
-        if self.direction == "Right":
-            new_head = (head[0] + 20, head[1])
-        elif self.direction == "Left":
-            new_head = (head[0] - 20, head[1])
-        elif self.direction == "Up":
-            new_head = (head[0], head[1] - 20)
-        elif self.direction == "Down":
-            new_head = (head[0], head[1] + 20)
-
-        self.coordinates.insert(0, new_head)
-        self.coordinates.pop()
-
-    def calculate_direction(self, current, target):
-        if current[0] < target[0]:
-            return "Right"
-        elif current[0] > target[0]:
-            return "Left"
-        elif current[1] < target[1]:
-            return "Down"
-        else:
-            return "Up"
-
-    def greedy_search(self, food_coords, obstacle_coords, user_snake_coords):
-        def heuristic(a, b):
-            return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-        def is_valid(point):
-            x, y = point
-            return (
-                    0 <= x < WIDTH
-                    and 0 <= y < HEIGHT
-                    and point not in obstacle_coords
-                    and point not in user_snake_coords
-                    and point not in self.coordinates
-            )
-
-        start = self.coordinates[0]
-        end = food_coords
-
-        open_set = PriorityQueue()
-        open_set.put((heuristic(start, end), (start, self.direction)))
-        came_from = {}
-        explored = set()
-
-        while not open_set.empty():
-            current, direction = open_set.get()[1]
-            explored.add(current)
-            if current == end:
-                path = [current]
-                while current in came_from.keys():
-                    current = came_from[current]
-                    path.append(current)
-                return path[::-1]
-            moves = {
-                "Right": (current[0] + 20, current[1]),
-                "Left": (current[0] - 20, current[1]),
-                "Up": (current[0], current[1] - 20),
-                "Down": (current[0], current[1] + 20),
-            }
-            if direction == "Right":
-                moves.pop("Left")
-            elif direction == "Left":
-                moves.pop("Right")
-            elif direction == "Up":
-                moves.pop("Down")
+                item = canvas.create_rectangle(x, y, x + 20, y + 20, fill=fill, tags="world")
+                created = True
+            items[i] = (item, fill)
+        if created:
+            # Keep the board under the score and the other texts
+            canvas.tag_lower("world")
+
+
+class Minimap:
+    # The whole board shrunk into a corner: an image where each pixel is a
+    # block of cells, coloured by the most important thing in the block. The
+    # obstacles never move, so their blocks are worked out once, a whole row
+    # of cells at a time as one big int; snakes are marked from their bodies
+    # when the image is rebuilt every MINIMAP_REFRESH_TICKS ticks. The
+    # viewport outline and the food are canvas items updated every frame.
+    def __init__(self, canvas, grid, x, y, size=MINIMAP_SIZE):
+        self.canvas = canvas
+        self.scale = -(-max(grid.cols, grid.rows) // size)
+        self.width = -(-grid.cols // self.scale)
+        self.height = -(-grid.rows // self.scale)
+        self.x = x - self.width
+        self.y = y - self.height
+        self.image = tk.PhotoImage(width=self.width, height=self.height)
+        canvas.create_image(self.x, self.y, image=self.image, anchor="nw", tags="minimap")
+        self.view = canvas.create_rectangle(0, 0, 0, 0, outline="red", tags="minimap")
+        self.food = canvas.create_rectangle(0, 0, 0, 0, fill="blue", outline="blue", tags="minimap")
+        self.drawn_at = None
+        self.obstacles = self.blocks(grid, grid.obstacles)
+
+    def blocks(self, grid, layer):
+        # One list per row of pixels, True where any cell of the block is set
+        rows = []
+        cols, scale = grid.cols, self.scale
+        for top in range(0, grid.rows, scale):
+            merged = 0
+            for y in range(top, min(top + scale, grid.rows)):
+                merged |= int.from_bytes(layer[y * cols:(y + 1) * cols], "little")
+            merged = merged.to_bytes(cols, "little")
+            rows.append([any(merged[x:x + scale]) for x in range(0, cols, scale)])
+        return rows
+
+    def refresh(self, engine):
+        grid = engine.grid
+        cols, scale = grid.cols, self.scale
+        rows = [["#ffffff" if obstacle else "#404040" for obstacle in row] for row in self.obstacles]
+        snakes = [(s.coordinates, "#ffff00") for s in engine.ai_snakes] + [(engine.snake, "#00ff00")]
+        for body, colour in snakes:
+            for i in body.cells_from_tail():
+                if i >= 0:
+                    rows[i // cols // scale][i % cols // scale] = colour
+        self.image.put(" ".join("{" + " ".join(row) + "}" for row in rows))
+
+    def draw(self, engine, viewport):
+        grid = engine.grid
+        ticks = engine.tick - self.drawn_at if self.drawn_at is not None else -1
+        if not 0 <= ticks < MINIMAP_REFRESH_TICKS:
+            self.drawn_at = engine.tick
+            self.refresh(engine)
+        scale = self.scale
+        if viewport.x0 is not None:
+            x, y = self.x + viewport.x0 // scale, self.y + viewport.y0 // scale
+            self.canvas.coords(self.view, x, y, x + viewport.cols // scale + 1, y + viewport.rows // scale + 1)
+        food = grid.index(engine.food) if engine.food is not None else -1
+        if food >= 0:
+            x = self.x + food % grid.cols // scale
+            y = self.y + food // grid.cols // scale
+            self.canvas.coords(self.food, x - 1, y - 1, x + 2, y + 2)
+
+
+class GameLoop:
+    # Runs the simulation at a fixed tick rate on the monotonic clock and
+    # draws at most once per display frame. If the ticks of a frame already
+    # used up its time, that frame is not drawn so the simulation can catch
+    # up, which keeps the game at full speed and only lowers the frame rate.
+    def __init__(self, master, tick, render, tick_ms=TICK_MS, frame_ms=FRAME_MS,
+                 max_frame_skip=5, max_catch_up=10):
+        self.master = master
+        self.tick = tick
+        self.render = render
+        self.tick_seconds = tick_ms / 1000
+        self.frame_seconds = frame_ms / 1000
+        self.max_frame_skip = max_frame_skip
+        self.max_catch_up = max_catch_up
+        self.running = False
+        self.lag = 0.0
+        self.skipped_in_row = 0
+        self.frames_skipped = 0
+        self.tick_rate = 0.0
+        self.frame_rate = 0.0
+        self.window_ticks = 0
+        self.window_frames = 0
+
+    def start(self):
+        self.running = True
+        self.last = self.window_start = time.monotonic()
+        self.master.after(int(self.frame_seconds * 1000), self.run)
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        if not self.running:
+            return
+        frame_start = time.monotonic()
+        self.lag += frame_start - self.last
+        self.last = frame_start
+
+        ticks = 0
+        while self.lag >= self.tick_seconds and self.running:
+            if ticks == self.max_catch_up:
+                # The machine can't keep up at all, let the backlog go
+                self.lag = 0.0
+                break
+            self.tick()
+            self.lag -= self.tick_seconds
+            ticks += 1
+        self.window_ticks += ticks
+        if not self.running:
+            return
+
+        if ticks:
+            over_budget = time.monotonic() - frame_start > self.frame_seconds
+            if over_budget and self.skipped_in_row < self.max_frame_skip:
+                self.frames_skipped += 1
+                self.skipped_in_row += 1
             else:
-                moves.pop("Up")
-            for move, neighbor in moves.items():
-                if is_valid(neighbor):
-                    if neighbor not in came_from and neighbor not in explored:
-                        priority = heuristic(neighbor, end)
-                        open_set.put((priority, (neighbor, move)))
-                        came_from[neighbor] = current
-                        explored.add(current)
-            # for i, j in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            #     neighbor = (current[0] + i * 20, current[1] + j * 20)
-            #     if is_valid(neighbor):
-            #         if neighbor not in came_from and neighbor not in explored:
-            #             priority = heuristic(neighbor, end)
-            #             open_set.put((priority, neighbor))
-            #             came_from[neighbor] = current
-            #             explored.add(current)
-        return []
-
-    def a_star_pathfinding(self, food_coords, obstacle_coords, user_snake_coords):
-        def heuristic(a, b):
-            return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-        def is_valid(point):
-            x, y = point
-            return (
-                    0 <= x < WIDTH
-                    and 0 <= y < HEIGHT
-                    and point not in obstacle_coords
-                    and point not in user_snake_coords
-            )
-
-        start = self.coordinates[0]
-        end = food_coords
-
-        open_set = PriorityQueue()
-        open_set.put((0, start))
-        came_from = {}
-        g_score = {start: 0}
-
-        while not open_set.empty():
-            current = open_set.get()[1]
-
-            if current == end:
-                path = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path.append(current)
-                return path[::-1]
-
-            for i, j in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                neighbor = (current[0] + i * 20, current[1] + j * 20)
-                tentative_g_score = g_score[current] + 1
-
-                if is_valid(neighbor):
-                    if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
-                        g_score[neighbor] = tentative_g_score
-                        priority = tentative_g_score + heuristic(end, neighbor)
-                        open_set.put((priority, neighbor))
-                        came_from[neighbor] = current
-        path = [food_coords]
-        while current in came_from:
-            current = came_from[current]
-            path.append(current)
-        if len(path) > 1:
-            return path[::-1]
-        return []
+                self.render()
+                self.window_frames += 1
+                self.skipped_in_row = 0
+
+        now = time.monotonic()
+        if now - self.window_start >= 1:
+            self.tick_rate = self.window_ticks / (now - self.window_start)
+            self.frame_rate = self.window_frames / (now - self.window_start)
+            self.window_ticks = self.window_frames = 0
+            self.window_start = now
+        delay = self.frame_seconds - (now - frame_start)
+        self.master.after(max(1, int(delay * 1000)), self.run)
 
 
 class SnakeGame:
-    def __init__(self, master):
+    def __init__(self, master, engine=None, record=None, tick_ms=TICK_MS, profile=None, plan_ms=PLAN_MS):
         # Initialising Game Window settings
         self.master = master
         self.master.title("Snake Game")
         self.master.geometry("{w}x{h}".format(h=HEIGHT, w=WIDTH))
         self.master.resizable(False, False)
 
-        self.score_label = None
-        self.score = 0
-        self.ai_score = 0
+        # All game state lives in the engine, this class only draws it
+        self.engine = engine if engine is not None else SnakeEngine(tick_ms=tick_ms)
+        self.direction = self.engine.direction
 
-        self.game_time = GAME_TIME
-        self.start_time = time.time()
-        self.is_game_over = False
-        self.ai_snake_died = False
+        self.score_label = None
+        self.recorder = ReplayRecorder(record, self.engine) if record else None
+        self.finished = False
+        self.ai_dead = 0
         self.snake_died = False
+        self.shown_scores = (self.score, self.ai_score)
+        # profile is where the timings are dumped at game over (.csv or .json)
+        self.profile = profile
+        self.profiler = None
+        if profile:
+            self.profiler = self.engine.profiler = TickProfiler()
+        # The AI snakes plan on a worker thread, plan_ms=0 plans in the tick
+        self.planner = PlanningWorker(self.engine, plan_ms) if plan_ms else None
+        if plan_ms:
+            # Tree search runs in the tick, give it the same time limit
+            for ai_snake in self.engine.ai_snakes:
+                if ai_snake.strategy == "mcts":
+                    ai_snake.monte_carlo().time_ms = plan_ms
 
         self.canvas = tk.Canvas(self.master, bg="grey", width=WIDTH, height=HEIGHT)
         self.canvas.pack()
         self.setup_score_board()
+        self.time_text = HudText(self.canvas, 80, 30, "red", "time")
+        self.stats_text = HudText(self.canvas, 110, 50, "red", "stats")
+        self.snake_sprite = SnakeSprite(self.canvas, "green", "snake")
+        self.ai_snake_sprites = [
+            SnakeSprite(self.canvas, ai_snake.colour, "ai_snake") for ai_snake in self.engine.ai_snakes
+        ]
+        self.ai_died_text = HudText(self.canvas, WIDTH - 80, 100, "red", "enemy_snake_died")
+        self.profile_text = None
+        self.profile_shown_at = None
+        if self.profiler is not None:
+            self.profile_text = HudText(self.canvas, 20, 70, "black", "profile", anchor="nw")
+
+        # A board bigger than the window is drawn through a scrolling viewport
+        grid = self.engine.grid
+        self.viewport = self.minimap = None
+        if grid.width > WIDTH or grid.height > HEIGHT:
+            self.viewport = Viewport(self.canvas, WIDTH, HEIGHT)
+            self.minimap = Minimap(self.canvas, grid, WIDTH - 10, HEIGHT - 10)
+            self.obstacles = []
+            self.food_coords = self.food = None
+        else:
+            self.obstacles = [self.create_obstacle(coords) for coords in self.engine.obstacles]
+            self.food_coords = self.engine.food
+            self.food = self.create_food()
+        self.master.bind("<KeyPress>", self.change_direction)
 
-        self.snake = INITIAL_SNAKE_COORDS
-        self.ai_snake = AISnake(self)
-        self.direction = "Right"
+        self.loop = GameLoop(self.master, self.tick, self.render, tick_ms)
+        self.render()
+        self.loop.start()
 
-        self.obstacles = [self.create_obstacle() for _ in range(OBSTACLES_COUNT)]
-        self.food = self.create_food()
-        self.master.bind("<KeyPress>", self.change_direction)
-        self.update_time()
+    @property
+    def snake(self):
+        return self.engine.snake
+
+    @property
+    def ai_snake(self):
+        return self.engine.ai_snake
+
+    @property
+    def score(self):
+        return self.engine.score
 
-        self.update()
+    @property
+    def ai_score(self):
+        return self.engine.ai_score
 
+    @property
+    def is_game_over(self):
+        return self.engine.is_game_over
 
     def on_snake_died(self, msg: str):
-        self.coordinates = [(0, 0)]
         self.snake_died = True
-        self.snake = [(0, 0)]
         self.canvas.create_text(
             WIDTH - 80,
             80,
@@ -241,89 +403,50 @@ class SnakeGame:
         )
 
     def on_ai_snake_died(self, msg: str):
-        self.ai_snake_died = True
-        self.ai_snake.coordinates = [(0, 0)]
-        self.canvas.create_text(
-            WIDTH - 80,
-            100,
-            font=('consolas', 12),
-            text="Enemy Snake Died",
-            fill="red",
-            tags="enemy_snake_died",
-        )
-
-    def max_x(self):
-        return (WIDTH // 20) - 1
-
-    def max_y(self):
-        return (HEIGHT // 20) - 1
+        self.ai_dead += 1
+        if len(self.engine.ai_snakes) == 1:
+            self.ai_died_text.set("Enemy Snake Died")
+        else:
+            self.ai_died_text.set("Enemies Died: {}/{}".format(self.ai_dead, len(self.engine.ai_snakes)))
 
     def setup_score_board(self):
-        self.canvas.delete("user_points")
-        self.canvas.delete("ai_points")
-        self.canvas.create_text(
-            WIDTH - 80,
-            30,
-            font=('consolas', 12),
-            text="Score: {}".format(self.score),
-            fill="green",
-            tags="score",
-        )
-        self.canvas.create_text(
-            WIDTH - 80,
-            50,
-            font=('consolas', 12),
-            text="Enemy Score:   {}".format(self.ai_score),
-            fill="green",
-            tags="enemy_score",
-        )
-        # self.score_label = tk.Label(
-        #     self.master,
-        #     text="Points:{}".format(self.score),
-        #     font=('consolas', 20)
-        # )
-        # self.score_label.pack()
-        # self.ai_score_label = tk.Label(
-        #     self.master,
-        #     text="AI Points:{}".format(self.ai_score),
-        #     font=('consolas', 20)
-        # )
-        # self.ai_score_label.pack()
-        pass
-
-    def increase_score(self, of: str):
-        if of == 'user':
-            self.score += 1
-        elif of == 'ai':
-            self.ai_score += 1
-        self.setup_score_board()
+        self.score_text = HudText(self.canvas, WIDTH - 80, 30, "green", "score")
+        self.ai_score_text = HudText(self.canvas, WIDTH - 80, 50, "green", "enemy_score")
+        self.update_score_board()
+
+    def update_score_board(self):
+        self.score_text.set("Score: {}".format(self.score))
+        self.ai_score_text.set("Enemy Score:   {}".format(self.ai_score))
 
     def create_food(self):
-        obstacle_coords = [self.canvas.coords(obstacle) for obstacle in self.obstacles]
-        obstacles_x = [coords[0] for coords in obstacle_coords]
-        obstacles_y = [coords[1] for coords in obstacle_coords]
-        x = random.randint(0, self.max_x()) * 20
-        while x in obstacles_x:
-            x = random.randint(0, self.max_x()) * 20
-        y = random.randint(0, self.max_y()) * 20
-        while y in obstacles_y:
-            y = random.randint(0, self.max_y()) * 20
+        x, y = self.engine.food
         food = self.canvas.create_rectangle(x, y, x + 20, y + 20, fill="blue", tags="food")
         return food
 
-    def create_obstacle(self):
-        x = random.randint(0, 39) * 20
-        y = random.randint(0, 29) * 20
+    def create_obstacle(self, coords):
+        x, y = coords
         obstacle = self.canvas.create_rectangle(
             x, y, x + 20, y + 20, fill="white"
         )  # Adjust color or appearance as needed
         return obstacle
 
     def game_over(self, msg):
+        self.finished = True
+        self.loop.stop()
+        if self.planner is not None:
+            self.planner.close()
+        if not self.engine.is_game_over:
+            self.engine.game_over(msg)
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.profiler is not None:
+            self.profiler.dump(self.profile)
+            print("Profile written to {}".format(self.profile))
         self.canvas.delete("all")
-        if self.score < self.ai_score:
+        winner = self.engine.winner()
+        if winner == "ai":
             won_message = "Enemy Snake Wins!"
-        elif self.score > self.ai_score:
+        elif winner == "user":
             won_message = "Your Snake Wins!"
         else:
             won_message = "Its a draw!"
@@ -351,124 +474,81 @@ class SnakeGame:
             fill="red",
             tags="gameover",
         )
-        self.is_game_over = True
-
-    def is_collided(self, obj, msg):
-        obj_coords = self.canvas.coords(obj)  # obj should be the ID of the canvas item
-        head_coords = self.snake[0]
-        if head_coords[0] == obj_coords[0] and head_coords[1] == obj_coords[1]:
-            self.on_snake_died(msg)
-
-    def check_collision(self):
-        # Boundary check
-        x, y = self.snake[0]
-        if x < 0 or x >= WIDTH or y < 0 or y >= HEIGHT:
-            # Game over condition (you can implement game over logic here)
-            self.on_snake_died("Game Over! Snake hit the boundary.")
-
-        # Snake colliding with a obstacle
-        for obstacle in self.obstacles:
-            self.is_collided(obstacle, "Game Over! Snake hit an obstacle.")
-
-        # Snake colliding with itself
-        for body_part in self.snake[1:]:
-            if x == body_part[0] and y == body_part[1]:
-                self.on_snake_died("Game Over! Snake hit itself.")
-
-        for body_part in self.ai_snake.coordinates:
-            if x == body_part[0] and y == body_part[1]:
-                self.on_snake_died("Game Over! Snake hit AI Snake.")
-        # message = "Game Over! Snake collided with itself."
-        # print(self.snake)
-        # for segment in self.snake[1:]:
-        #     self.is_collided(segment, message)
-
-    def move_snake(self):
-        head = self.snake[0]
-        new_head = None
-        if self.direction == "Right":
-            new_head = (head[0] + 20, head[1])
-        elif self.direction == "Left":
-            new_head = (head[0] - 20, head[1])
-        elif self.direction == "Up":
-            new_head = (head[0], head[1] - 20)
-        elif self.direction == "Down":
-            new_head = (head[0], head[1] + 20)
-
-        self.snake.insert(0, new_head)
-        self.snake.pop()
-
-    def check_for_food(self, head, ai_head):
-        def on_food_eaten(by: str):
-            print("Food eaten by {}".format(by))
-            self.canvas.delete("food")
-            self.food = self.create_food()
-            self.increase_score(by)
-
-        food_coords = self.canvas.coords(self.food)
-        if head[0] == food_coords[0] and head[1] == food_coords[1]:
-            self.snake.append((0, 0))
-            on_food_eaten('user')
-
-        if ai_head[0] == food_coords[0] and ai_head[1] == food_coords[1]:
-            self.ai_snake.coordinates.append((0, 0))
-            on_food_eaten('ai')
 
     def update_time(self):
-        if self.is_game_over:
+        # Game time comes from the tick count, a slow frame can't stretch it
+        remaining = int((self.engine.max_ticks - self.engine.tick) * self.loop.tick_seconds)
+        self.time_text.set("Time: {}".format(remaining))
+
+    def draw_events(self):
+        score, ai_score = self.shown_scores
+        self.shown_scores = (self.score, self.ai_score)
+        if self.engine.snake_died and not self.snake_died:
+            self.on_snake_died(self.engine.snake_death_cause)
+        while self.ai_dead < len(self.engine.ai_snakes) - self.engine.ai_alive:
+            self.on_ai_snake_died(self.engine.ai_snake_death_cause)
+        if self.score != score:
+            print("Food eaten by user")
+        if self.ai_score != ai_score:
+            print("Food eaten by ai")
+        if self.score != score or self.ai_score != ai_score:
+            self.update_score_board()
+        if self.food is not None and self.engine.food != self.food_coords:
+            self.food_coords = x, y = self.engine.food
+            self.canvas.coords(self.food, x, y, x + 20, y + 20)
+
+    def tick(self):
+        if self.finished:
+            return
+        if self.planner is None:
+            self.engine.step(self.direction)
+        else:
+            started = time.perf_counter()
+            ai_targets = self.planner.targets()
+            waited = time.perf_counter() - started
+            self.engine.step(self.direction, ai_targets=ai_targets)
+            if self.profiler is not None:
+                self.profiler.add_planning(waited * 1000, self.planner.expanded)
+        self.direction = self.engine.direction
+        if self.recorder is not None:
+            self.recorder.record()
+        if self.engine.is_game_over:
+            self.game_over(self.engine.game_over_message)
+
+    def render(self):
+        if self.finished:
+            return
+        if self.profiler is None:
+            self.draw()
             return
-        if time.time() - self.start_time >= self.game_time:
-            self.game_over("Game Over! Time's up!")
+        started = self.profiler.clock()
+        self.draw()
+        self.profiler.add_render((self.profiler.clock() - started) * 1000)
+        self.update_profile_text()
+
+    def update_profile_text(self):
+        # Refreshed every few ticks, sorting the samples every frame would
+        # show up in the very numbers it displays
+        if self.profile_shown_at is None or self.engine.tick - self.profile_shown_at >= 5:
+            self.profile_shown_at = self.engine.tick
+            self.profile_text.set(self.profiler.overlay_text())
+
+    def draw(self):
+        self.draw_events()
+        if self.viewport is not None:
+            self.viewport.draw(self.engine)
+            self.minimap.draw(self.engine, self.viewport)
         else:
-            self.canvas.delete("time")
-            self.canvas.create_text(
-                80,
-                30,
-                font=('consolas', 12),
-                text="Time: {}".format(int(self.game_time - (time.time() - self.start_time))),
-                fill="red",
-                tags="time",
-            )
-            self.master.after(1000, self.update_time)
+            self.snake_sprite.draw(self.snake, self.engine.snake_moves)
+            for ai_snake, sprite in zip(self.engine.ai_snakes, self.ai_snake_sprites):
+                sprite.draw(ai_snake.coordinates, ai_snake.moves)
+        self.update_time()
+        self.stats_text.set("TPS: {:.1f}  FPS: {:.1f}  Skipped: {}".format(
+            self.loop.tick_rate, self.loop.frame_rate, self.loop.frames_skipped))
 
     def update(self):
-        if self.is_game_over:
-            return
-        self.move_snake()
-        self.check_collision()
-        head = self.snake[0]
-        food_coords = tuple(self.canvas.coords(self.food)[:2])
-        obstacle_coords = [tuple(self.canvas.coords(obstacle)[:2]) for obstacle in self.obstacles]
-        user_snake_coords = [coords for coords in self.snake]
-        self.ai_snake.decide_direction(food_coords, obstacle_coords, user_snake_coords)
-        self.ai_snake.move()
-
-        self.canvas.delete("snake")
-        if not self.snake_died:
-            for segment in self.snake:
-                self.canvas.create_rectangle(
-                    segment[0],
-                    segment[1],
-                    segment[0] + 20,
-                    segment[1] + 20,
-                    fill="green",
-                    tags="snake",
-                )
-
-        self.canvas.delete("ai_snake")
-        if not self.ai_snake_died:
-            for segment in self.ai_snake.coordinates:
-                self.canvas.create_rectangle(
-                    segment[0],
-                    segment[1],
-                    segment[0] + 20,
-                    segment[1] + 20,
-                    fill="yellow",
-                    tags="ai_snake",
-                )
-
-        self.check_for_food(head, self.ai_snake.coordinates[0])
-        self.master.after(200, self.update)
+        self.tick()
+        self.render()
 
     def change_direction(self, event):
         if event.keysym == "Right" and not self.direction == "Left":
@@ -479,9 +559,108 @@ class SnakeGame:
             self.direction = "Up"
         elif event.keysym == "Down" and not self.direction == "Up":
             self.direction = "Down"
+        elif event.keysym == "F3" and self.profile_text is not None:
+            # Show or hide the profiling overlay
+            hidden = self.canvas.itemcget(self.profile_text.item, "state") == "hidden"
+            self.canvas.itemconfig(self.profile_text.item, state="normal" if hidden else "hidden")
+
+
+class ReplayGame(SnakeGame):
+    # Plays a recording back in the window. Right/Left seek 50 ticks,
+    # Up/Down double or halve the speed and space pauses.
+    def __init__(self, master, player, speed=1.0):
+        self.player = player
+        self.speed = speed
+        self.position = 0.0
+        self.paused = False
+        super().__init__(master, player.seek(0), plan_ms=0)
+        self.master.title("Snake Game Replay")
+
+    def update_time(self):
+        self.time_text.set("Tick: {}/{}  x{:g}{}".format(
+            self.engine.tick, self.player.ticks, self.speed, "  paused" if self.paused else ""))
+
+    def seek(self, tick):
+        if tick < self.engine.tick:
+            # Going back in time, forget what was already shown as dead
+            self.canvas.delete("Your_snake_died")
+            self.snake_died = False
+            self.ai_dead = 0
+            self.ai_died_text.set("")
+        self.engine = self.player.seek(tick)
+
+    def tick(self):
+        if not self.paused:
+            self.position = min(self.position + self.speed, self.player.ticks)
+            self.seek(int(self.position))
+
+    def change_direction(self, event):
+        if event.keysym == "Right":
+            self.position = min(self.position + 50, self.player.ticks)
+        elif event.keysym == "Left":
+            self.position = max(self.position - 50, 0)
+        elif event.keysym == "Up":
+            self.speed *= 2
+        elif event.keysym == "Down":
+            self.speed /= 2
+        elif event.keysym == "space":
+            self.paused = not self.paused
+        self.seek(int(self.position))
+        self.render()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Snake against the AI.")
+    parser.add_argument("ai_count", nargs="?", type=int, default=1, help="number of AI snakes")
+    parser.add_argument("--strategy", choices=STRATEGIES, help="how the AI snakes pick their moves")
+    parser.add_argument("--record", help="save the game to this replay file")
+    parser.add_argument("--replay", help="play back a replay file instead")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed")
+    parser.add_argument("--tick-ms", type=int, default=TICK_MS, help="milliseconds per game tick")
+    parser.add_argument("--profile", help="time every phase of a tick and write them to this .csv "
+                                          "or .json file at game over, F3 toggles the overlay")
+    parser.add_argument("--board", help="board size in cells, e.g. 2000x2000, up to {0}x{0}".format(
+        MAX_BOARD_CELLS))
+    parser.add_argument("--plan-ms", type=int, default=PLAN_MS,
+                        help="deadline of the AI planning thread, 0 plans in the game tick")
+    parser.add_argument("--policy", help="checkpoint from evolve.py for the neural strategy")
+    parser.add_argument("--landmark-cache", help="keep landmark tables of the jps strategy on large boards in this directory")
+    args = parser.parse_args()
+    if args.ai_count < 1:
+        parser.error("need at least one AI snake")
+    if args.tick_ms <= 0:
+        parser.error("--tick-ms must be positive")
+    if args.plan_ms < 0:
+        parser.error("--plan-ms can't be negative")
+    JumpPointSearch.cache_dir = args.landmark_cache
+    policy = None
+    if args.policy:
+        from neural import load_policy  # numpy is only needed for the neural strategy
+        policy = load_policy(args.policy)
+        if args.strategy is None:
+            args.strategy = "neural"
+    elif args.strategy == "neural":
+        parser.error("--strategy neural needs a --policy checkpoint")
+    width, height = WIDTH, HEIGHT
+    if args.board:
+        try:
+            cols, rows = (int(n) for n in args.board.lower().split("x"))
+        except ValueError:
+            parser.error("--board must look like 2000x2000, not {}".format(args.board))
+        # The snakes start at fixed coordinates that have to be on the board
+        start = INITIAL_SNAKE_COORDS + INITIAL_AI_SNAKE_COORDS
+        min_cols = max(x for x, _ in start) // 20 + 1
+        min_rows = max(y for _, y in start) // 20 + 1
+        if not (min_cols <= cols <= MAX_BOARD_CELLS and min_rows <= rows <= MAX_BOARD_CELLS):
+            parser.error("--board is at least {0}x{1} and at most {2}x{2} cells".format(
+                min_cols, min_rows, MAX_BOARD_CELLS))
+        width, height = cols * 20, rows * 20
+
     root = tk.Tk()
-    game = SnakeGame(root)
+    if args.replay:
+        game = ReplayGame(root, ReplayPlayer(args.replay), args.speed)
+    else:
+        engine = SnakeEngine(ai_count=args.ai_count, strategy=args.strategy, width=width, height=height,
+                             policy=policy, tick_ms=args.tick_ms)
+        game = SnakeGame(root, engine, args.record, args.tick_ms, args.profile, args.plan_ms)
     root.mainloop()
@@ -0,0 +1,160 @@
+import numpy as np
+
+from snake_engine import (
+    HEIGHT,
+    WIDTH,
+    INITIAL_SNAKE_COORDS,
+    OBSTACLES_COUNT,
+    GAME_TIME,
+    TICK_MS,
+    DIRECTIONS,
+    OPPOSITE,
+)
+
+# Cell codes of the board and of the observations
+EMPTY = 0
+OBSTACLE = 1
+BODY = 2
+HEAD = 3
+FOOD = 4
+
+# Actions are indices into DIRECTIONS: Right, Left, Up, Down
+DX = np.array([1, -1, 0, 0], dtype=np.int64)
+DY = np.array([0, 0, -1, 1], dtype=np.int64)
+REVERSE = np.array([DIRECTIONS.index(OPPOSITE[d]) for d in DIRECTIONS], dtype=np.int64)
+
+
+class BatchSnakeEnv:
+    # N independent single-player games of the SnakePj.py rules stepped
+    # together with NumPy. Every snake body is a ring buffer of cell indices
+    # and every board an int8 row of cell codes, so one step() is a fixed
+    # number of array operations whatever N is. The greedy AI snake is a
+    # search per game and does not vectorize, so it is left out here.
+    def __init__(self, num_envs, seed=None, width=WIDTH, height=HEIGHT,
+                 obstacles_count=OBSTACLES_COUNT, max_steps=GAME_TIME * 1000 // TICK_MS):
+        self.num_envs = num_envs
+        self.cols = (width + 19) // 20
+        self.rows = (height + 19) // 20
+        self.cells = self.cols * self.rows
+        self.obstacles_count = obstacles_count
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self.arange = np.arange(num_envs)
+
+        # Food and obstacles only go on fully visible cells, as in OccupancyGrid
+        cells = np.arange(self.cells)
+        self.placeable = (cells % self.cols < width // 20) & (cells // self.cols < height // 20)
+        self.placeable_cells = cells[self.placeable]
+        self.initial_cells = np.array(
+            [(y // 20) * self.cols + x // 20 for x, y in reversed(INITIAL_SNAKE_COORDS)],
+            dtype=np.int64,
+        )
+
+        self.board = np.zeros((num_envs, self.cells), dtype=np.int8)
+        self.body = np.zeros((num_envs, self.cells), dtype=np.int64)
+        self.head_ptr = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int64)
+        self.grow = np.zeros(num_envs, dtype=bool)
+        self.direction = np.zeros(num_envs, dtype=np.int64)
+        self.food = np.zeros(num_envs, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+
+    def heads(self):
+        return self.body[self.arange, self.head_ptr]
+
+    def observe(self):
+        obs = self.board.copy()
+        obs[self.arange, self.food] = FOOD
+        obs[self.arange, self.heads()] = HEAD
+        return obs.reshape(self.num_envs, self.rows, self.cols)
+
+    def random_free_cells(self, ids):
+        # A uniformly drawn empty placeable cell per game. The boards are
+        # mostly empty, so redrawing the few that hit something is about one
+        # round; a very full board falls back to scanning every cell.
+        placeable = self.placeable_cells
+        cells = placeable[self.rng.integers(0, len(placeable), len(ids))]
+        redo = np.nonzero(self.board[ids, cells] != EMPTY)[0]
+        for _ in range(32):
+            if not len(redo):
+                return cells
+            cells[redo] = placeable[self.rng.integers(0, len(placeable), len(redo))]
+            redo = redo[self.board[ids[redo], cells[redo]] != EMPTY]
+        if len(redo):
+            free = (self.board[ids[redo]] == EMPTY) & self.placeable
+            cells[redo] = np.argmax(self.rng.random(free.shape) * free, axis=1)
+        return cells
+
+    def place_food(self, ids):
+        # Like create_food: any cell without an obstacle or the snake on it
+        self.food[ids] = self.random_free_cells(ids)
+
+    def reset_envs(self, ids):
+        n = len(ids)
+        if not n:
+            return
+        self.board[ids] = EMPTY
+        column = ids[:, None]
+        start = len(self.initial_cells)
+        self.board[column, self.initial_cells] = BODY
+
+        # Obstacles on free cells one at a time, like create_obstacle
+        for _ in range(min(self.obstacles_count, len(self.placeable_cells) - start)):
+            self.board[ids, self.random_free_cells(ids)] = OBSTACLE
+        self.body[column, np.arange(start)] = self.initial_cells
+        self.head_ptr[ids] = start - 1
+        self.length[ids] = start
+        self.grow[ids] = False
+        self.direction[ids] = DIRECTIONS.index("Right")
+        self.score[ids] = 0
+        self.steps[ids] = 0
+        self.place_food(ids)
+
+    def reset(self):
+        self.reset_envs(self.arange)
+        return self.observe()
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        arange = self.arange
+        cells = self.cells
+
+        # change_direction: reversing onto the body is ignored
+        direction = np.where(actions == REVERSE[self.direction], self.direction, actions)
+        self.direction = direction
+
+        head = self.body[arange, self.head_ptr]
+        x = head % self.cols + DX[direction]
+        y = head // self.cols + DY[direction]
+
+        # move_snake pops the tail before the collision check; a snake that
+        # ate on the previous tick keeps it, just as the appended segment did
+        moving = ~self.grow
+        tail = self.body[arange, (self.head_ptr - self.length + 1) % cells]
+        self.board[arange[moving], tail[moving]] = EMPTY
+        self.length += self.grow
+
+        out = (x < 0) | (x >= self.cols) | (y < 0) | (y >= self.rows)
+        new_head = np.where(out, 0, y * self.cols + x)
+        died = out | (self.board[arange, new_head] != EMPTY)
+
+        alive = arange[~died]
+        self.head_ptr[alive] = (self.head_ptr[alive] + 1) % cells
+        self.body[alive, self.head_ptr[alive]] = new_head[alive]
+        self.board[alive, new_head[alive]] = BODY
+
+        ate = ~died & (new_head == self.food)
+        self.grow = ate
+        self.score += ate
+        eaten = arange[ate]
+        if len(eaten):
+            self.place_food(eaten)
+
+        self.steps += 1
+        truncated = ~died & (self.steps >= self.max_steps)
+        dones = died | truncated
+        rewards = ate.astype(np.float32) - died
+        info = {"score": self.score.copy(), "died": died, "truncated": truncated}
+        self.reset_envs(arange[dones])
+        return self.observe(), rewards, dones, info
@@ -0,0 +1,159 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from pathfinding import PATHFINDERS
+from profiling import percentile
+from snake_engine import HEIGHT, WIDTH, OBSTACLES_COUNT, OccupancyGrid
+
+# python bench_pathfinding.py --out bench.json
+# python bench_pathfinding.py --out new.json --compare bench.json
+
+
+def parse_sizes(text):
+    sizes = []
+    for size in text.split(","):
+        width, height = size.lower().split("x")
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def obstacle_count(spec, cells):
+    # "20" is a count, "30%" a share of the board's cells
+    if spec.endswith("%"):
+        return int(cells * float(spec[:-1]) / 100)
+    return int(spec)
+
+
+def make_board(width, height, obstacles, snake_length, seed):
+    rng = random.Random("{}-{}x{}-{}-{}".format(seed, width, height, obstacles, snake_length))
+    grid = OccupancyGrid(width, height)
+    cells = list(range(grid.size))
+    rng.shuffle(cells)
+    for i in cells[:min(obstacles, grid.size // 2)]:
+        grid.obstacles[i] = 1
+
+    # Random walk from a free cell so the body is a connected snake
+    head = next(i for i in cells if not grid.obstacles[i])
+    body = [head]
+    grid.ai_snake[head] = 1
+    while len(body) < snake_length:
+        options = [n for n in grid.neighbours(body[-1]) if grid.free(n)]
+        if not options:
+            break
+        tail = rng.choice(options)
+        grid.ai_snake[tail] = 1
+        body.append(tail)
+    return grid, head, rng
+
+
+def run_case(width, height, obstacles, snake_length, algorithms, queries, seed):
+    grid, head, rng = make_board(width, height, obstacles, snake_length, seed)
+    free_cells = [i for i in range(grid.size) if grid.free(i)]
+    goals = [rng.choice(free_cells) for _ in range(queries)]
+    results = []
+    for name in algorithms:
+        finder = PATHFINDERS[name](grid)
+        # Tables built from the obstacles are set up with the game, untimed
+        finder.prepare()
+        latencies, expanded, lengths = [], [], []
+        for goal in goals:
+            started = time.perf_counter()
+            path = finder.search(head, goal)
+            latencies.append((time.perf_counter() - started) * 1000)
+            expanded.append(finder.expanded)
+            if path:
+                lengths.append(len(path) - 1)
+        results.append({
+            "width": width,
+            "height": height,
+            "obstacles": obstacles,
+            "snake_length": snake_length,
+            "algorithm": name,
+            "calls": queries,
+            "found": len(lengths),
+            "nodes_expanded": sum(expanded) / len(expanded),
+            "path_length": sum(lengths) / len(lengths) if lengths else None,
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+        })
+    return results
+
+
+def case_key(result):
+    return (result["width"], result["height"], result["obstacles"],
+            result["snake_length"], result["algorithm"])
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return {case_key(r): r for r in json.load(f)["results"]}
+
+
+def compare(results, baseline, tolerance):
+    regressions = 0
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None or not old["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"]
+        flag = ""
+        if ratio > 1 + tolerance or result["nodes_expanded"] > old["nodes_expanded"]:
+            flag = "  REGRESSION"
+            regressions += 1
+        print("{:>5}x{:<5} obstacles={:<6} length={:<5} {:<12} p50 x{:.2f}  nodes {:.0f} -> {:.0f}{}".format(
+            *case_key(result), ratio, old["nodes_expanded"], result["nodes_expanded"], flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AISnake pathfinders on seeded boards.")
+    parser.add_argument("--sizes", default="{}x{},2000x1300,4000x2600".format(WIDTH, HEIGHT),
+                        help="board sizes in pixels, e.g. 1000x650,2000x1300")
+    parser.add_argument("--obstacles", default="{},10%,30%".format(OBSTACLES_COUNT),
+                        help="obstacle counts, or percentages of the board")
+    parser.add_argument("--lengths", default="3,50,200", help="AI snake lengths")
+    parser.add_argument("--algorithms", default=",".join(PATHFINDERS), help="pathfinder names")
+    parser.add_argument("--queries", type=int, default=50, help="searches per board and algorithm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_pathfinding.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p50 slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    # Read before anything is written, --out may be the baseline itself
+    baseline = load_baseline(args.compare) if args.compare else None
+    algorithms = args.algorithms.split(",")
+    results = []
+    for width, height in parse_sizes(args.sizes):
+        cells = ((width + 19) // 20) * ((height + 19) // 20)
+        for spec in args.obstacles.split(","):
+            obstacles = obstacle_count(spec, cells)
+            for length in args.lengths.split(","):
+                case = run_case(width, height, obstacles, int(length), algorithms, args.queries, args.seed)
+                for result in case:
+                    print("{:>5}x{:<5} obstacles={:<6} length={:<5} {:<12} nodes={:<9.0f} p50={:.3f}ms p99={:.3f}ms".format(
+                        *case_key(result), result["nodes_expanded"], result["p50_ms"], result["p99_ms"]))
+                results.extend(case)
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "queries": args.queries,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
+
+    if baseline is not None:
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+WINDOW_RADIUS = 8 # cells around the move a first flood fill looks at
+
+
+class MoveSafety:
+    # Whether a snake's next cell leaves it room for its body, by flood
+    # filling a bitboard: a Python int with one byte per cell of a window
+    # around the move, read straight from the grid's layers with
+    # int.from_bytes, so a fill step is a handful of shifts and masks over
+    # the whole window at once. The fill runs in time steps and the snake's
+    # own tail frees a cell every step (after any pending growth), so a
+    # region is also big enough once it reaches a cell the tail has left:
+    # the snake can follow its tail. The window starts WINDOW_RADIUS cells
+    # around the move and only grows when a fill too small for the body
+    # touches its edge; once the radius is the body's length, reaching the
+    # edge means a way at least that long. Other snakes stay where they are.
+    def __init__(self, grid):
+        self.grid = grid
+        self.masks = {}
+
+    def window_masks(self, w, h):
+        masks = self.masks.get((w, h))
+        if masks is None:
+            row = b"\x01" * w
+            full = int.from_bytes(row * h, "little")
+            first_col = int.from_bytes((b"\x01" + b"\x00" * (w - 1)) * h, "little")
+            last_col = int.from_bytes((b"\x00" * (w - 1) + b"\x01") * h, "little")
+            first_row = int.from_bytes(row, "little")
+            masks = self.masks[(w, h)] = (full, first_col, last_col, first_row, first_row << (8 * w * (h - 1)))
+        return masks
+
+    def room(self, body, cell, need):
+        # Cells the snake can reach after moving its head onto cell, counted
+        # up to need, which is also the answer when it can reach its tail
+        if cell < 0:
+            return 0
+        grid = self.grid
+        cols, rows = grid.cols, grid.rows
+        radius = WINDOW_RADIUS
+        while True:
+            x, y = cell % cols, cell // cols
+            x0, x1 = max(0, x - radius), min(cols - 1, x + radius)
+            y0, y1 = max(0, y - radius), min(rows - 1, y + radius)
+            whole = radius >= need or (x0 == 0 and y0 == 0 and x1 == cols - 1 and y1 == rows - 1)
+            room = self.fill(body, cell, need, x0, y0, x1, y1, whole)
+            if room >= 0:
+                return room
+            radius *= 4
+
+    def fill(self, body, cell, need, x0, y0, x1, y1, whole):
+        # -1 when the fill got to the edge of the window without the room
+        grid = self.grid
+        cols = grid.cols
+        w, h = x1 - x0 + 1, y1 - y0 + 1
+        full, first_col, last_col, first_row, last_row = self.window_masks(w, h)
+        blocked = 0
+        for layer in (grid.obstacles, grid.snake, grid.ai_snake):
+            rows = [layer[y * cols + x0:y * cols + x1 + 1] for y in range(y0, y1 + 1)]
+            blocked |= int.from_bytes(b"".join(rows), "little")
+        # Any nonzero byte down to its low bit, the layers count segments
+        blocked |= blocked >> 4
+        blocked |= blocked >> 2
+        blocked |= blocked >> 1
+        free = full & ~blocked
+        edge = 0
+        if not whole:
+            if x0 > 0:
+                edge |= first_col
+            if x1 < grid.cols - 1:
+                edge |= last_col
+            if y0 > 0:
+                edge |= first_row
+            if y1 < grid.rows - 1:
+                edge |= last_row
+        not_first, not_last, row_shift = full ^ first_col, full ^ last_col, 8 * w
+
+        # Tail segment j leaves on move j + 1 + pending, the move that frees
+        # it can already go onto it
+        cells, mask, length = body.cells, body.mask, body.length
+        tail = body.head - length + 1
+        delay = body.pending + 1
+
+        def bit(i):
+            # The cell's bit in the window, 0 outside it
+            x, y = i % cols - x0, i // cols - y0
+            if 0 <= x < w and 0 <= y < h:
+                return 1 << (8 * (y * w + x))
+            return 0
+
+        vacated, j, t = 0, 0, 1
+        while j < length and j + delay <= t:
+            vacated |= bit(cells[(tail + j) & mask])
+            j += 1
+        free |= vacated
+        reach = bit(cell) & free
+        if not reach:
+            return 0
+        while True:
+            if reach & vacated:
+                return need
+            count = reach.bit_count()
+            if count >= need:
+                return need
+            if reach & edge:
+                return -1
+            grown = (reach | ((reach << 8) & not_first) | ((reach >> 8) & not_last)
+                     | (reach << row_shift) | (reach >> row_shift))
+            t += 1
+            while j < length and j + delay <= t:
+                vacated |= bit(cells[(tail + j) & mask])
+                j += 1
+            if (grown & (free | vacated)) == reach:
+                # Walled in: only the tail leaving can open a way out, skip
+                # ahead to the next tail cell inside the window. The snake
+                # can't stand still, it only lasts until then if it has a
+                # cell of the region for every move before that one.
+                while j < length and not bit(cells[(tail + j) & mask]):
+                    j += 1
+                if j == length or j + delay - 1 > count:
+                    return count
+                t = j + delay
+                vacated |= bit(cells[(tail + j) & mask])
+                j += 1
+            free |= vacated
+            reach = grown & free
@@ -0,0 +1,143 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from neural import INPUTS, OUTPUTS, NeuralPolicy, save_policy
+from snake_engine import SnakeEngine
+
+# python evolve.py --generations 100 --population 64 --out policy.npz
+# python SnakePj.py --policy policy.npz
+# python tournament.py --strategies neural,greedy --policy policy.npz
+SURVIVAL_WEIGHT = 0.5 # fitness for lasting the whole game, next to 1 per food
+
+# The population as the worker processes see it, attached once per process
+shared = None
+population = None
+
+
+def attach(name, shape):
+    global shared, population
+    shared = shared_memory.SharedMemory(name=name)
+    population = np.ndarray(shape, dtype=np.float64, buffer=shared.buf)
+
+
+def play(policy, seed, max_ticks):
+    engine = SnakeEngine(seed=seed, strategy="neural", user_snake=False, policy=policy)
+    engine.max_ticks = max_ticks
+    while not engine.is_game_over:
+        engine.step()
+    ai_snake = engine.ai_snake
+    survived = ai_snake.death_tick if ai_snake.died else engine.tick
+    return ai_snake.score + SURVIVAL_WEIGHT * survived / max_ticks
+
+
+def evaluate(task):
+    # One member of the population over this generation's seeds; the
+    # weights are read from shared memory, only the row index is pickled
+    index, seeds, max_ticks = task
+    policy = NeuralPolicy(population[index])
+    return sum(play(policy, seed, max_ticks) for seed in seeds) / len(seeds)
+
+
+class Evolution:
+    # A (mu + lambda) evolution strategy over the policy's weights. Each
+    # generation every member plays the same seeded headless games, new
+    # seeds each generation so nothing learns one board by heart. The
+    # `elite` best carry over unchanged and every other slot is a random
+    # elite plus gaussian noise of `sigma`. The population lives in a
+    # shared memory block the worker processes map, so a generation sends
+    # them row numbers, not weights.
+    def __init__(self, population=64, elite=8, sigma=0.1, games=4, max_ticks=500, seed=0, workers=None):
+        self.size = population
+        self.elite = elite
+        self.sigma = sigma
+        self.games = games
+        self.max_ticks = max_ticks
+        self.seed = seed
+        self.workers = workers
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+        self.best = None
+        self.best_fitness = None
+        shape = (population, OUTPUTS * INPUTS)
+        self.shared = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+        self.population = np.ndarray(shape, dtype=np.float64, buffer=self.shared.buf)
+        self.population[:] = self.rng.normal(0.0, 1.0, shape)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=attach,
+                                        initargs=(self.shared.name, shape))
+
+    def resume(self, path):
+        # Start from a checkpoint's population, topped up with mutants of
+        # its best if this population is larger
+        with np.load(path) as checkpoint:
+            saved = checkpoint["population"]
+            self.generation = int(checkpoint["generation"])
+            best = checkpoint["weights"].ravel()
+        count = min(len(saved), self.size)
+        self.population[:count] = saved[:count]
+        self.population[count:] = best + self.rng.normal(0.0, self.sigma, (self.size - count, best.size))
+
+    def step(self):
+        seeds = [self.seed + self.generation * self.games + k for k in range(self.games)]
+        tasks = [(i, seeds, self.max_ticks) for i in range(self.size)]
+        chunksize = max(1, self.size // (4 * (self.workers or os.cpu_count() or 1)))
+        fitness = np.array(list(self.pool.map(evaluate, tasks, chunksize=chunksize)))
+        order = np.argsort(-fitness)
+        elites = self.population[order[:self.elite]].copy()
+        self.best, self.best_fitness = elites[0], fitness[order[0]]
+        parents = elites[self.rng.integers(0, self.elite, self.size - self.elite)]
+        self.population[:self.elite] = elites
+        self.population[self.elite:] = parents + self.rng.normal(0.0, self.sigma, parents.shape)
+        self.generation += 1
+        return fitness
+
+    def save(self, path):
+        save_policy(path, self.best, fitness=self.best_fitness, generation=self.generation,
+                    population=self.population, sigma=self.sigma)
+
+    def close(self):
+        self.pool.shutdown()
+        self.shared.close()
+        self.shared.unlink()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evolve a neural policy for the AI snake.")
+    parser.add_argument("--generations", type=int, default=100, help="generations to run")
+    parser.add_argument("--population", type=int, default=64, help="policies per generation")
+    parser.add_argument("--elite", type=int, default=8, help="best policies kept every generation")
+    parser.add_argument("--sigma", type=float, default=0.1, help="mutation noise")
+    parser.add_argument("--games", type=int, default=4, help="seeded games every policy plays per generation")
+    parser.add_argument("--max-ticks", type=int, default=500, help="length of a training game in ticks")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game and of the mutations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--resume", help="checkpoint to carry on from")
+    parser.add_argument("--out", default="policy.npz", help="checkpoint written after every generation")
+    args = parser.parse_args(argv)
+
+    if not 0 < args.elite < args.population:
+        parser.error("--elite must be between 0 and --population")
+
+    evolution = Evolution(args.population, args.elite, args.sigma, args.games, args.max_ticks,
+                          args.seed, args.workers)
+    try:
+        if args.resume:
+            evolution.resume(args.resume)
+        while evolution.generation < args.generations:
+            started = time.time()
+            fitness = evolution.step()
+            evolution.save(args.out)
+            print("generation {:>4}  best {:6.2f}  mean {:6.2f}  {:.1f}s".format(
+                evolution.generation, fitness.max(), fitness.mean(), time.time() - started))
+    finally:
+        evolution.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
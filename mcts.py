@@ -0,0 +1,169 @@
+import math
+import random
+import time
+
+from snake_engine import DIRECTIONS, OPPOSITE
+
+# python tournament.py --strategies mcts,greedy
+
+
+class Node:
+    __slots__ = ("visits", "value", "children")
+
+    def __init__(self):
+        self.visits = 0
+        self.value = 0.0
+        self.children = {}
+
+
+class MonteCarloSearch:
+    # Open-loop Monte Carlo tree search over the snake's own moves. Every
+    # iteration restores the game to the moment of the decision, follows the
+    # tree with UCT, adds one new move and plays on with a cheap policy for
+    # every snake (safe moves, mostly towards the food) for up to `depth`
+    # ticks, using the real SnakeEngine rules. The engine's random numbers
+    # are swapped for the search's own seeded ones while it plays, so food
+    # respawns are guessed, not read from the game's future, and the same
+    # seed always gives the same decisions. A search stops after
+    # `iterations`, or earlier at `time_ms` if one is given.
+    def __init__(self, seed=0, iterations=200, depth=12, time_ms=None, exploration=1.0, greed=0.7):
+        self.rng = random.Random(seed)
+        self.iterations = iterations
+        self.depth = depth
+        self.time_ms = time_ms
+        self.exploration = exploration
+        self.greed = greed
+        self.simulated = 0
+
+    def decide(self, ai_snake):
+        # Called from SnakeEngine.finish_step when it is ai_snake's turn
+        engine = ai_snake.game
+        moves = self.safe_moves(engine.grid, ai_snake.coordinates, ai_snake.direction)
+        if len(moves) < 2:
+            return moves[0] if moves else ai_snake.direction
+
+        k = engine.ai_snakes.index(ai_snake)
+        root = engine.snapshot()
+        game_random, profiler = engine.random, engine.profiler
+        engine.profiler = None
+        engine.grid.recording = False
+        tree = Node()
+        deadline = time.perf_counter() + self.time_ms / 1000 if self.time_ms else None
+        self.simulated = 0
+        try:
+            for _ in range(self.iterations):
+                engine.restore(root)
+                engine.random = self.rng
+                self.iterate(engine, ai_snake, k, tree, root)
+                engine.random = game_random
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+        finally:
+            engine.random = game_random
+            engine.restore(root)
+            engine.grid.recording = True
+            engine.profiler = profiler
+        best = max(tree.children.items(), key=lambda item: item[1].visits)
+        return best[0]
+
+    def iterate(self, engine, ai_snake, k, tree, root):
+        node, path = tree, [tree]
+        score = ai_snake.score
+        distance = self.food_distance(engine, ai_snake)
+        depth = 0
+        # Down the tree while every move of the node has been tried
+        while depth < self.depth and not ai_snake.died and not engine.is_game_over:
+            moves = self.safe_moves(engine.grid, ai_snake.coordinates, ai_snake.direction)
+            if not moves:
+                break
+            untried = [move for move in moves if move not in node.children]
+            if untried:
+                move = self.rng.choice(untried)
+                node.children[move] = child = Node()
+            else:
+                move, child = self.select(node, moves)
+            self.play(engine, ai_snake, k, move, first=depth == 0)
+            node = child
+            path.append(node)
+            depth += 1
+            if untried:
+                break
+        # Then on with the rollout policy
+        while depth < self.depth and not ai_snake.died and not engine.is_game_over:
+            self.play(engine, ai_snake, k, self.policy(engine, ai_snake.coordinates, ai_snake.direction),
+                      first=depth == 0)
+            depth += 1
+        reward = self.evaluate(engine, ai_snake, score, distance)
+        for node in path:
+            node.visits += 1
+            node.value += reward
+
+    def select(self, node, moves):
+        log_n = math.log(node.visits)
+        best, best_score = None, -math.inf
+        for move in moves:
+            child = node.children[move]
+            score = child.value / child.visits + self.exploration * math.sqrt(log_n / child.visits)
+            if score > best_score:
+                best, best_score = move, score
+        return best, node.children[best]
+
+    def play(self, engine, ai_snake, k, move, first):
+        # The first tick of a search is the one being decided, the snakes
+        # before this one already moved in it
+        self.simulated += 1
+        directions = [None] * len(engine.ai_snakes)
+        for j, other in enumerate(engine.ai_snakes):
+            if j == k:
+                directions[j] = move
+            elif not other.died:
+                directions[j] = self.policy(engine, other.coordinates, other.direction)
+            else:
+                directions[j] = other.direction
+        if first:
+            engine.finish_step(directions, k)
+        else:
+            user_dir = None
+            if not engine.snake_died:
+                user_dir = self.policy(engine, engine.snake, engine.direction)
+            engine.step(user_dir, directions)
+
+    def safe_moves(self, grid, body, direction):
+        head = body.head_cell()
+        moves = []
+        for move in DIRECTIONS:
+            if move != OPPOSITE[direction]:
+                i = grid.next_cell(head, move)
+                if i >= 0 and grid.free(i):
+                    moves.append(move)
+        return moves
+
+    def policy(self, engine, body, direction):
+        grid = engine.grid
+        moves = self.safe_moves(grid, body, direction)
+        if not moves:
+            return direction
+        if engine.food is None or self.rng.random() >= self.greed:
+            return self.rng.choice(moves)
+        food = grid.index(engine.food)
+        head = body.head_cell()
+        return min(moves, key=lambda move: self.distance(grid, grid.next_cell(head, move), food))
+
+    def distance(self, grid, a, b):
+        cols = grid.cols
+        return abs(a % cols - b % cols) + abs(a // cols - b // cols)
+
+    def food_distance(self, engine, ai_snake):
+        if engine.food is None:
+            return 0
+        grid = engine.grid
+        return self.distance(grid, ai_snake.coordinates.head_cell(), grid.index(engine.food))
+
+    def evaluate(self, engine, ai_snake, score, distance):
+        # Food eaten, dying is worse than missing any food, and without food
+        # the share of the way to it that was covered
+        if ai_snake.died:
+            return ai_snake.score - score - 2
+        if ai_snake.score > score:
+            return ai_snake.score - score
+        return 0.5 * (distance - self.food_distance(engine, ai_snake)) / self.depth
@@ -0,0 +1,91 @@
+import numpy as np
+
+RADIUS = 2 # the policy sees the (2 * RADIUS + 1) square of cells around the head
+# Unit vectors ahead and to the right of each heading, x right and y down
+HEADINGS = {
+    "Right": ((1, 0), (0, 1)),
+    "Left": ((-1, 0), (0, -1)),
+    "Up": ((0, -1), (1, 0)),
+    "Down": ((0, 1), (-1, 0)),
+}
+VECTORS = {(1, 0): "Right", (-1, 0): "Left", (0, -1): "Up", (0, 1): "Down"}
+# The heading after turning left, going straight or turning right
+TURNS = {
+    heading: (VECTORS[(-rx, -ry)], heading, VECTORS[(rx, ry)])
+    for heading, (_, (rx, ry)) in HEADINGS.items()
+}
+# (dx, dy) of every cell the policy sees, in the heading's own frame, so
+# the same weights work whichever way the snake faces
+WINDOW = {
+    heading: [
+        (a * fx + b * rx, a * fy + b * ry)
+        for a in range(RADIUS, -RADIUS - 1, -1)
+        for b in range(-RADIUS, RADIUS + 1)
+        if a or b
+    ]
+    for heading, ((fx, fy), (rx, ry)) in HEADINGS.items()
+}
+# Window cells, then danger left/straight/right, food ahead and to the
+# right, and a bias
+INPUTS = (2 * RADIUS + 1) ** 2 - 1 + 3 + 2 + 1
+OUTPUTS = len(next(iter(TURNS.values())))
+
+
+class NeuralPolicy:
+    # A linear policy over what the snake sees from its head: whether the
+    # cells around it are taken, the three danger flags check_collision
+    # would raise on the next move (board edge, obstacle, any snake) and
+    # where the food is. A decision is one OUTPUTS x INPUTS matrix-vector
+    # product and an argmax over turning left, going straight or turning
+    # right. The weights come from evolve.py.
+    def __init__(self, weights):
+        self.weights = np.asarray(weights, dtype=np.float64).reshape(OUTPUTS, INPUTS)
+
+    def features(self, grid, head, heading, food):
+        cols, rows = grid.cols, grid.rows
+        obstacles, snake, ai_snake = grid.obstacles, grid.snake, grid.ai_snake
+        hx, hy = head % cols, head // cols
+        inputs = []
+        for dx, dy in WINDOW[heading]:
+            x, y = hx + dx, hy + dy
+            if 0 <= x < cols and 0 <= y < rows:
+                i = y * cols + x
+                inputs.append(1.0 if obstacles[i] or snake[i] or ai_snake[i] else 0.0)
+            else:
+                inputs.append(1.0)
+        (fx, fy), (rx, ry) = HEADINGS[heading]
+        for dx, dy in ((-rx, -ry), (fx, fy), (rx, ry)):
+            x, y = hx + dx, hy + dy
+            if 0 <= x < cols and 0 <= y < rows:
+                i = y * cols + x
+                inputs.append(1.0 if obstacles[i] or snake[i] or ai_snake[i] else 0.0)
+            else:
+                inputs.append(1.0)
+        if food >= 0:
+            dx, dy = food % cols - hx, food // cols - hy
+            ahead, right = dx * fx + dy * fy, dx * rx + dy * ry
+            distance = max(1, abs(ahead) + abs(right))
+            inputs += [ahead / distance, right / distance]
+        else:
+            inputs += [0.0, 0.0]
+        inputs.append(1.0)
+        return np.array(inputs)
+
+    def decide(self, ai_snake):
+        grid = ai_snake.game.grid
+        food = grid.index(ai_snake.game.food) if ai_snake.game.food is not None else -1
+        x = self.features(grid, ai_snake.coordinates.head_cell(), ai_snake.direction, food)
+        return TURNS[ai_snake.direction][int(np.argmax(self.weights @ x))]
+
+
+def save_policy(path, weights, **info):
+    # A .npz checkpoint; evolve.py adds its population to resume from
+    np.savez(path, weights=np.asarray(weights, dtype=np.float64).reshape(OUTPUTS, INPUTS), **info)
+
+
+def load_policy(path):
+    with np.load(path) as checkpoint:
+        weights = checkpoint["weights"]
+    if weights.size != OUTPUTS * INPUTS:
+        raise ValueError("{} holds {} weights, this policy has {}".format(path, weights.size, OUTPUTS * INPUTS))
+    return NeuralPolicy(weights)
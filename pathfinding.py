@@ -0,0 +1,942 @@
+import hashlib
+import os
+import time
+import weakref
+from array import array
+from collections import deque
+from heapq import heappop, heappush
+
+INF = float("inf")
+LARGE_BOARD_CELLS = 10000 # past this many cells a route is followed until it is blocked
+SHORTCUT_MARGIN = 2 # cells a cycle shortcut keeps clear of the snake's own tail
+DETOUR_CELLS = 6 # longest way off the cycle to food the cycle leaves out
+LANDMARKS = 4 # landmark cells of the ALT heuristic
+
+
+class SearchScratch:
+    # The parent, cost and seen arrays every search on a grid works in. A
+    # search only reads them until it returns and searches on a grid run one
+    # at a time, so all the finders of all the snakes share one set: on a
+    # 2000x2000 board that is 48 MB for the grid, not 96 MB of lists per snake.
+    # The stamp is shared too, so no finder mistakes another's marks for its own.
+    def __init__(self, size):
+        self.parent = array("i", [-1]) * size
+        self.cost = array("i", [0]) * size
+        self.seen = array("i", [0]) * size
+        self.stamp = 0
+
+    def next_stamp(self):
+        if self.stamp == 2 ** 31 - 1:
+            self.seen[:] = array("i", [0]) * len(self.seen)
+            self.stamp = 0
+        self.stamp += 1
+        return self.stamp
+
+
+_search_scratch = weakref.WeakKeyDictionary()
+
+
+def search_scratch(grid):
+    scratch = _search_scratch.get(grid)
+    if scratch is None:
+        scratch = _search_scratch[grid] = SearchScratch(grid.size)
+    return scratch
+
+
+class Pathfinder:
+    # Common base of the searches: cells are grid indices and the parent and
+    # cost arrays are allocated once per grid and reused by every call. A
+    # cell's entries only count if its seen[] stamp matches the current
+    # search, so nothing has to be cleared between calls. A shared finder is
+    # kept once per game and used by every AI snake.
+    # With a deadline (a time.perf_counter() value) a search that runs out of
+    # time returns the path to the closest cell to the goal it got to. On a
+    # large board next_step keeps the last route and walks it while the next
+    # cell is free, searching again only when the food moves or the way is
+    # blocked, since a route there can be over a thousand cells long.
+    # Tables built from the obstacles alone come from prepare(), which the
+    # game calls once they are all placed, outside any timed search.
+    name = None
+    shared = False
+    deadline = None
+    # The cell of the snake's own tail, set by the caller like deadline for
+    # the finders that need it
+    tail = -1
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.scratch = search_scratch(grid)
+        self.parent, self.cost, self.seen = self.scratch.parent, self.scratch.cost, self.scratch.seen
+        self.stamp = 0
+        self.expanded = 0
+        self.reuse_route = grid.size > LARGE_BOARD_CELLS
+        self.route = []
+        self.route_at = 0
+        self.route_goal = -1
+
+    def heuristic(self, a, b):
+        cols = self.grid.cols
+        return abs(a % cols - b % cols) + abs(a // cols - b // cols)
+
+    def tie(self, i):
+        # Equal priorities go to the smaller (x, y), like the old pixel tuples
+        return (i % self.grid.cols) * self.grid.rows + i // self.grid.cols
+
+    def out_of_time(self):
+        # Only every 256 expansions, reading the clock isn't free
+        return (self.deadline is not None and not self.expanded & 255
+                and time.perf_counter() > self.deadline)
+
+    def begin(self, start):
+        self.stamp = self.scratch.next_stamp()
+        self.expanded = 0
+        self.seen[start] = self.stamp
+        self.parent[start] = -1
+        self.cost[start] = 0
+
+    def path(self, goal):
+        path = []
+        parent = self.parent
+        while goal >= 0:
+            path.append(goal)
+            goal = parent[goal]
+        return path[::-1]
+
+    def prepare(self):
+        pass
+
+    def search(self, start, goal):
+        raise NotImplementedError
+
+    def follow_route(self, start, goal):
+        route, k = self.route, self.route_at
+        if goal == self.route_goal and k + 1 < len(route) and route[k] == start:
+            if self.grid.free(route[k + 1]):
+                self.route_at = k + 1
+                return route[k + 1]
+        return -1
+
+    def next_step(self, start, goal):
+        if self.reuse_route:
+            step = self.follow_route(start, goal)
+            if step >= 0:
+                self.expanded = 0
+                return step
+        path = self.search(start, goal)
+        if self.reuse_route:
+            self.route, self.route_at, self.route_goal = path, 1, goal
+        if len(path) > 1:
+            return path[1]
+        return -1
+
+
+class GreedySearch(Pathfinder):
+    # Greedy best-first: always expand the cell closest to the food
+    name = "greedy"
+
+    def search(self, start, goal):
+        self.begin(start)
+        free, neighbours = self.grid.free, self.grid.neighbours
+        seen, parent, stamp = self.seen, self.parent, self.stamp
+        heuristic, tie = self.heuristic, self.tie
+
+        open_set = [(heuristic(start, goal), 0, start)]
+        best, best_h = start, INF
+        while open_set:
+            h, _, current = heappop(open_set)
+            self.expanded += 1
+            if current == goal:
+                return self.path(goal)
+            if self.deadline is not None:
+                if h < best_h:
+                    best, best_h = current, h
+                if self.out_of_time():
+                    return self.path(best)
+            for neighbor in neighbours(current):
+                if seen[neighbor] != stamp and free(neighbor):
+                    seen[neighbor] = stamp
+                    parent[neighbor] = current
+                    heappush(open_set, (heuristic(neighbor, goal), tie(neighbor), neighbor))
+        return []
+
+
+class AStarSearch(Pathfinder):
+    name = "a_star"
+
+    def search(self, start, goal):
+        self.begin(start)
+        free, neighbours = self.grid.free, self.grid.neighbours
+        seen, parent, cost, stamp = self.seen, self.parent, self.cost, self.stamp
+        heuristic, tie = self.heuristic, self.tie
+
+        open_set = [(heuristic(start, goal), 0, start)]
+        best, best_h = start, INF
+        while open_set:
+            priority, _, current = heappop(open_set)
+            g = cost[current]
+            if priority > g + heuristic(current, goal):
+                continue  # a shorter way to this cell was queued after this entry
+            self.expanded += 1
+            if current == goal:
+                return self.path(goal)
+            if self.deadline is not None:
+                # Closest by distance, Dijkstra's heuristic is always 0
+                h = Pathfinder.heuristic(self, current, goal)
+                if h < best_h:
+                    best, best_h = current, h
+                if self.out_of_time():
+                    return self.path(best)
+            g += 1
+            for neighbor in neighbours(current):
+                if (seen[neighbor] != stamp or g < cost[neighbor]) and free(neighbor):
+                    seen[neighbor] = stamp
+                    cost[neighbor] = g
+                    parent[neighbor] = current
+                    heappush(open_set, (g + heuristic(neighbor, goal), tie(neighbor), neighbor))
+        return []
+
+
+class DijkstraSearch(AStarSearch):
+    name = "dijkstra"
+
+    def heuristic(self, a, b):
+        return 0
+
+
+class BreadthFirstSearch(Pathfinder):
+    name = "bfs"
+
+    def search(self, start, goal):
+        self.begin(start)
+        free, neighbours = self.grid.free, self.grid.neighbours
+        seen, parent, stamp = self.seen, self.parent, self.stamp
+
+        queue = deque([start])
+        best, best_h = start, INF
+        while queue:
+            current = queue.popleft()
+            self.expanded += 1
+            if current == goal:
+                return self.path(goal)
+            if self.deadline is not None:
+                h = self.heuristic(current, goal)
+                if h < best_h:
+                    best, best_h = current, h
+                if self.out_of_time():
+                    return self.path(best)
+            for neighbor in neighbours(current):
+                if seen[neighbor] != stamp and free(neighbor):
+                    seen[neighbor] = stamp
+                    parent[neighbor] = current
+                    queue.append(neighbor)
+        return []
+
+
+class IncrementalPlanner(Pathfinder):
+    # D* Lite searching from the food back to the snake's head. The g/rhs
+    # values survive between ticks, so when only a few snake cells changed
+    # just the affected part of the search is repaired. A new food cell (or a
+    # change log that was trimmed before we read it) starts a fresh search.
+    name = "incremental"
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.goal = -1
+        self.start = -1
+        self.cursor = -1
+        self.expanded = 0
+
+    def reset(self, start, goal):
+        size = self.grid.size
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self.open = []
+        self.keys = {}
+        self.km = 0
+        self.start = start
+        self.goal = goal
+        self.update_vertex(goal)
+
+    def key(self, s):
+        m = min(self.g[s], self.rhs[s])
+        return (m + self.heuristic(self.start, s) + self.km, m)
+
+    def push(self, s):
+        key = self.key(s)
+        self.keys[s] = key
+        heappush(self.open, (key, s))
+
+    def blocked(self, s):
+        # The head sits on its own body but the search has to start from it
+        return s != self.start and not self.grid.free(s)
+
+    def update_vertex(self, s):
+        g = self.g
+        if self.blocked(s):
+            self.rhs[s] = INF
+        elif s == self.goal:
+            self.rhs[s] = 0
+        else:
+            self.rhs[s] = min(g[n] for n in self.grid.neighbours(s)) + 1
+        self.keys.pop(s, None)
+        if g[s] != self.rhs[s]:
+            self.push(s)
+
+    def compute(self, target):
+        g, rhs, keys, open_set = self.g, self.rhs, self.keys, self.open
+        neighbours = self.grid.neighbours
+        while open_set:
+            k_old, u = open_set[0]
+            if keys.get(u) != k_old:
+                heappop(open_set)
+                continue
+            if not (k_old < self.key(target) or rhs[target] != g[target]):
+                break
+            heappop(open_set)
+            del keys[u]
+            self.expanded += 1
+            if self.out_of_time():
+                # Stop with u still queued; the next call carries on from
+                # here and the move is read from the g values so far
+                self.push(u)
+                break
+            k_new = self.key(u)
+            if k_old < k_new:
+                self.push(u)
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for n in neighbours(u):
+                    self.update_vertex(n)
+            else:
+                g[u] = INF
+                self.update_vertex(u)
+                for n in neighbours(u):
+                    self.update_vertex(n)
+
+    def next_step(self, start, goal):
+        self.expanded = 0
+        changed = self.grid.changes_since(self.cursor)
+        if goal != self.goal or changed is None:
+            self.reset(start, goal)
+        else:
+            changed = set(changed)
+            if start != self.start:
+                self.km += self.heuristic(self.start, start)
+                changed.add(self.start)
+                changed.add(start)
+                self.start = start
+            for s in changed:
+                self.update_vertex(s)
+        self.cursor = self.grid.cursor()
+        self.compute(start)
+        return self.best_neighbour(start)
+
+    def best_neighbour(self, s):
+        best, best_g = -1, INF
+        for n in self.grid.neighbours(s):
+            if self.g[n] < best_g and not self.blocked(n):
+                best, best_g = n, self.g[n]
+        return best
+
+    def search(self, start, goal):
+        step = self.next_step(start, goal)
+        if step < 0:
+            return []
+        path = [start, step]
+        while step != goal and len(path) <= self.grid.size:
+            step = self.best_neighbour(step)
+            path.append(step)
+        return path
+
+
+class DistanceField(IncrementalPlanner):
+    # Distance to the food for every cell, shared by all AI snakes. A new food
+    # cell gets one BFS flood fill over the static obstacles; snake bodies are
+    # then fed in as changed cells and only repaired (LPA*, no heuristic) as
+    # far as the cells a snake actually asks about. Picking a move is reading
+    # the four neighbours of the head.
+    name = "field"
+    shared = True
+
+    def heuristic(self, a, b):
+        return 0
+
+    def reset(self, start, goal):
+        size = self.grid.size
+        self.g = g = [INF] * size
+        self.rhs = rhs = [INF] * size
+        self.open = []
+        self.keys = {}
+        self.km = 0
+        self.start = -1
+        self.goal = goal
+        obstacles = self.grid.obstacles
+        neighbours, free = self.grid.neighbours, self.grid.free
+        blocked = []
+        if obstacles[goal]:
+            return
+        g[goal] = rhs[goal] = 0
+        queue = deque([goal])
+        while queue:
+            current = queue.popleft()
+            if not free(current):
+                blocked.append(current)
+            d = g[current] + 1
+            for neighbor in neighbours(current):
+                if g[neighbor] == INF and not obstacles[neighbor]:
+                    g[neighbor] = rhs[neighbor] = d
+                    queue.append(neighbor)
+        for s in blocked:
+            self.update_vertex(s)
+
+    def next_step(self, start, goal):
+        self.expanded = 0
+        changed = self.grid.changes_since(self.cursor)
+        if goal != self.goal or changed is None:
+            self.reset(start, goal)
+        else:
+            for s in set(changed):
+                self.update_vertex(s)
+        self.cursor = self.grid.cursor()
+        return self.best_neighbour(start)
+
+    def best_neighbour(self, s):
+        best, best_g = -1, INF
+        for n in self.grid.neighbours(s):
+            if self.grid.free(n):
+                self.compute(n)
+                if self.g[n] < best_g:
+                    best, best_g = n, self.g[n]
+        return best
+
+
+class CycleTable:
+    # A closed walk through the board that visits cells one step apart, as
+    # two flat tables: order[p] is the p-th cell of the cycle and position[i]
+    # where cell i is in it, -1 if the cycle leaves it out. Built by merging
+    # 2x2 blocks along a spanning tree: every block starts as a square loop
+    # and every tree edge between two blocks swaps their two facing edges for
+    # two edges across, joining the loops. Blocks holding an obstacle (and an
+    # odd last row or column) are left out, so on a board with obstacles this
+    # is a near-Hamiltonian cycle over the largest connected set of blocks.
+    def __init__(self, grid):
+        cols, rows = grid.cols, grid.rows
+        block_cols, block_rows = cols // 2, rows // 2
+        obstacles = grid.obstacles
+
+        def cells_of(b):
+            x, y = (b % block_cols) * 2, (b // block_cols) * 2
+            i = y * cols + x
+            return i, i + 1, i + cols, i + cols + 1
+
+        open_blocks = bytearray(block_cols * block_rows)
+        for b in range(len(open_blocks)):
+            open_blocks[b] = not any(obstacles[i] for i in cells_of(b))
+
+        # Spanning tree (BFS) of the largest group of connected open blocks
+        blocks, tree = [], []
+        seen = bytearray(len(open_blocks))
+        for root in range(len(open_blocks)):
+            if not open_blocks[root] or seen[root]:
+                continue
+            seen[root] = 1
+            group, edges = [root], []
+            queue = deque([root])
+            while queue:
+                b = queue.popleft()
+                bx, by = b % block_cols, b // block_cols
+                for n, ok in ((b + 1, bx + 1 < block_cols), (b + block_cols, by + 1 < block_rows),
+                              (b - 1, bx > 0), (b - block_cols, by > 0)):
+                    if ok and open_blocks[n] and not seen[n]:
+                        seen[n] = 1
+                        group.append(n)
+                        edges.append((b, n))
+                        queue.append(n)
+            if len(group) > len(blocks):
+                blocks, tree = group, edges
+
+        # Every cell of the cycle keeps its two cycle neighbours
+        size = grid.size
+        first = array("l", [-1]) * size
+        second = array("l", [-1]) * size
+
+        def link(a, b):
+            if first[a] < 0:
+                first[a] = b
+            else:
+                second[a] = b
+            if first[b] < 0:
+                first[b] = a
+            else:
+                second[b] = a
+
+        def unlink(a, b):
+            for u, v in ((a, b), (b, a)):
+                if first[u] == v:
+                    first[u] = second[u]
+                second[u] = -1
+
+        for b in blocks:
+            top_left, top_right, bottom_left, bottom_right = cells_of(b)
+            link(top_left, top_right)
+            link(top_right, bottom_right)
+            link(bottom_right, bottom_left)
+            link(bottom_left, top_left)
+        for a, b in tree:
+            if b < a:
+                a, b = b, a
+            a_cells, b_cells = cells_of(a), cells_of(b)
+            if b == a + 1:
+                # Side by side: a's right edge and b's left edge go across
+                unlink(a_cells[1], a_cells[3])
+                unlink(b_cells[0], b_cells[2])
+                link(a_cells[1], b_cells[0])
+                link(a_cells[3], b_cells[2])
+            else:
+                # One above the other: a's bottom edge and b's top edge
+                unlink(a_cells[2], a_cells[3])
+                unlink(b_cells[0], b_cells[1])
+                link(a_cells[2], b_cells[0])
+                link(a_cells[3], b_cells[1])
+
+        self.position = array("l", [-1]) * size
+        self.order = array("l")
+        if blocks:
+            start = cells_of(blocks[0])[0]
+            previous, current = -1, start
+            while True:
+                self.position[current] = len(self.order)
+                self.order.append(current)
+                following = first[current] if first[current] != previous else second[current]
+                previous, current = current, following
+                if current == start:
+                    break
+        self.length = len(self.order)
+
+
+_cycle_tables = weakref.WeakValueDictionary()
+
+
+def cycle_table(grid):
+    # One table per obstacle layout, whichever grid holds it, so a planning
+    # thread's copy of the grid finds the game's table
+    key = layout_key(grid)
+    table = _cycle_tables.get(key)
+    if table is None:
+        table = _cycle_tables[key] = CycleTable(grid)
+    return table
+
+
+class HamiltonianCycle(GreedySearch):
+    # Follows a precomputed cycle through the board, so the snake can't trap
+    # itself in its own body however long it gets, and every move is a table
+    # lookup. Shortcuts: of the head's free neighbours on the cycle it takes
+    # the one furthest along that neither passes the food nor gets within
+    # SHORTCUT_MARGIN cells of its tail, which keeps the body in cycle order.
+    # The direction around the cycle is picked at the first move, whichever
+    # way is open. Food the cycle leaves out is reached by a detour of at
+    # most DETOUR_CELLS cells off the cycle that comes back on a little way
+    # ahead, or not at all: food in a dead end would trap a long snake. When
+    # the cycle is lost or blocked by another snake greedy search takes over.
+    # The cycle takes seconds to build on a large board, prepare() does it
+    # before the game starts; a finder nobody prepared builds it on first use.
+    name = "hamiltonian"
+
+    def __init__(self, grid):
+        super().__init__(grid)
+        self.cycle = None
+        self.sign = 0
+        self.goal = -1
+        self.entries = ()
+        self.plan = []
+
+    def prepare(self):
+        self.cycle = cycle_table(self.grid)
+
+    def ahead(self, p, q):
+        # Steps along the cycle from position p to position q
+        return ((q - p) * self.sign) % self.cycle.length
+
+    def next_step(self, start, goal):
+        self.expanded = 0
+        if self.cycle is None:
+            self.prepare()
+        cycle = self.cycle
+        position, free, neighbours = cycle.position, self.grid.free, self.grid.neighbours
+        if self.plan:
+            step = self.plan.pop()
+            if free(step) and step in neighbours(start):
+                return step
+            self.plan = []
+        if cycle.length < 2:
+            return self.fallback(start, goal)
+        p = position[start]
+        tail = position[self.tail] if self.tail >= 0 else -1
+        if p < 0:
+            return self.rejoin(start, goal, tail)
+        if not self.sign:
+            forward = cycle.order[(p + 1) % cycle.length]
+            self.sign = 1 if free(forward) else -1
+        room = self.ahead(p, tail) - SHORTCUT_MARGIN if tail >= 0 else 1
+        if goal != self.goal:
+            self.goal = goal
+            self.entries = self.entries_of(goal)
+
+        target = position[goal]
+        if target < 0:
+            if start in self.entries:
+                path = self.detour([start], False, p, goal, room)
+                if path:
+                    self.plan = path[:0:-1]
+                    return self.plan.pop()
+            # Don't skip past the next place a detour could start from
+            target = min((position[i] for i in self.entries if i != start),
+                         key=lambda q: self.ahead(p, q), default=p - self.sign)
+        food = self.ahead(p, target)
+
+        best, best_d = -1, 0
+        for n in neighbours(start):
+            q = position[n]
+            if q < 0 or not free(n):
+                continue
+            d = self.ahead(p, q)
+            if d > best_d and (d == 1 or d <= food and d < room):
+                best, best_d = n, d
+        if best >= 0:
+            return best
+        return self.fallback(start, goal)
+
+    def entries_of(self, goal):
+        # Cells of the cycle next to the cells around goal that it leaves out
+        position, obstacles, neighbours = self.cycle.position, self.grid.obstacles, self.grid.neighbours
+        if position[goal] >= 0:
+            return ()
+        entries = set()
+        depth = {goal: 0}
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            for n in neighbours(cell):
+                if position[n] >= 0:
+                    entries.add(n)
+                elif n not in depth and not obstacles[n] and depth[cell] < DETOUR_CELLS:
+                    depth[n] = depth[cell] + 1
+                    queue.append(n)
+        return entries
+
+    def detour(self, path, fed, p, goal, room):
+        # The shortest way from the cycle through the food and back on it
+        # ahead of p, off the cycle in between, as a list of cells
+        for limit in range(2, DETOUR_CELLS + 2):
+            found = self.extend(path, fed, limit, p, goal, room)
+            if found:
+                return found
+        return None
+
+    def extend(self, path, fed, limit, p, goal, room):
+        position, free = self.cycle.position, self.grid.free
+        self.expanded += 1
+        for n in self.grid.neighbours(path[-1]):
+            q = position[n]
+            if q >= 0:
+                if fed and free(n) and 0 < self.ahead(p, q) < room:
+                    return path + [n]
+            elif len(path) < limit and n not in path and free(n):
+                path.append(n)
+                found = self.extend(path, fed or n == goal, limit, p, goal, room)
+                path.pop()
+                if found:
+                    return found
+        return None
+
+    def rejoin(self, start, goal, tail):
+        # Back onto the cycle right after the body, the furthest from the tail
+        position = self.cycle.position
+        best, best_room = -1, -1
+        for n in self.grid.neighbours(start):
+            q = position[n]
+            if q >= 0 and self.grid.free(n):
+                room = self.ahead(q, tail) if tail >= 0 and self.sign else 0
+                if room > best_room:
+                    best, best_room = n, room
+        if best >= 0:
+            return best
+        return self.fallback(start, goal)
+
+    def fallback(self, start, goal):
+        path = GreedySearch.search(self, start, goal)
+        if len(path) > 1:
+            return path[1]
+        for n in self.grid.neighbours(start):
+            if self.grid.free(n):
+                return n
+        return -1
+
+    def search(self, start, goal):
+        # The way round the cycle, or greedy if either end is off it
+        if self.cycle is None:
+            self.prepare()
+        cycle = self.cycle
+        p, q = cycle.position[start], cycle.position[goal]
+        if p < 0 or q < 0:
+            return super().search(start, goal)
+        steps = (q - p) % cycle.length
+        return [cycle.order[(p + k) % cycle.length] for k in range(steps + 1)]
+
+
+def static_distances(grid, source):
+    # Steps from source to every cell around the obstacles alone, -1 where
+    # no way exists; snakes only ever make a way longer
+    cols, size, obstacles = grid.cols, grid.size, grid.obstacles
+    distance = array("i", [-1]) * size
+    distance[source] = 0
+    frontier, d = [source], 0
+    while frontier:
+        d += 1
+        following = []
+        for i in frontier:
+            x = i % cols
+            for n, ok in ((i + 1, x + 1 < cols), (i - 1, x > 0), (i - cols, i >= cols), (i + cols, i + cols < size)):
+                if ok and distance[n] < 0 and not obstacles[n]:
+                    distance[n] = d
+                    following.append(n)
+        frontier = following
+    return distance
+
+
+class LandmarkTable:
+    # Distances from a few landmark cells to every cell, over the obstacles
+    # alone, for the ALT heuristic: by the triangle inequality a path from a
+    # to b is at least |d(L, a) - d(L, b)| steps for every landmark L, and
+    # snake bodies only block more, so the bound stays admissible while they
+    # move. The first landmark is the first open cell, each next one the cell
+    # furthest from all landmarks so far, which puts them at the far ends of
+    # the board.
+    def __init__(self, cells, distances):
+        self.cells = cells
+        self.distances = distances
+
+    def bound(self, a, b):
+        best = 0
+        for distance in self.distances:
+            da, db = distance[a], distance[b]
+            if da >= 0 and db >= 0:
+                if da - db > best:
+                    best = da - db
+                elif db - da > best:
+                    best = db - da
+        return best
+
+
+def build_landmarks(grid, count=LANDMARKS):
+    obstacles = grid.obstacles
+    source = next((i for i in range(grid.size) if not obstacles[i]), -1)
+    cells, distances, nearest = [], [], None
+    while source >= 0 and len(cells) < count:
+        distance = static_distances(grid, source)
+        cells.append(source)
+        distances.append(distance)
+        nearest = distance if nearest is None else array("i", map(min, nearest, distance))
+        source = max(range(grid.size), key=nearest.__getitem__)
+        if nearest[source] <= 0:
+            break
+    return LandmarkTable(cells, distances)
+
+
+def layout_key(grid, count=LANDMARKS):
+    header = "{}x{}:{}:".format(grid.cols, grid.rows, count).encode()
+    return hashlib.sha1(header + bytes(grid.obstacles)).hexdigest()
+
+
+def save_landmarks(path, table, size):
+    data = array("i", [len(table.cells), size]) + array("i", table.cells)
+    for distance in table.distances:
+        data += distance
+    # Written aside and renamed, so a reader never sees half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary, "wb") as f:
+        data.tofile(f)
+    os.replace(temporary, path)
+
+
+def load_landmarks(path, size):
+    # None if the file is missing or isn't a table for a board of this size
+    data = array("i")
+    try:
+        with open(path, "rb") as f:
+            data.frombytes(f.read())
+    except OSError:
+        return None
+    if len(data) < 2 or data[1] != size or len(data) != 2 + data[0] * (size + 1):
+        return None
+    count = data[0]
+    cells = list(data[2:2 + count])
+    offset = 2 + count
+    distances = [data[offset + k * size:offset + (k + 1) * size] for k in range(count)]
+    return LandmarkTable(cells, distances)
+
+
+_landmark_tables = weakref.WeakValueDictionary()
+
+
+def landmark_table(grid, cache_dir=None):
+    # One table per obstacle layout, whichever grid holds it. Tables of
+    # large boards take seconds to build; with a cache_dir they are kept
+    # there under the layout's hash, so a restart with the same layout loads
+    # them instead. Every layout is a new file of 16 bytes per cell and
+    # nothing is ever removed, so only ask for it when the same layouts come
+    # back.
+    key = layout_key(grid)
+    table = _landmark_tables.get(key)
+    if table is not None:
+        return table
+    path = None
+    if cache_dir and grid.size > LARGE_BOARD_CELLS:
+        path = os.path.join(cache_dir, key + ".landmarks")
+        table = load_landmarks(path, grid.size)
+    if table is None:
+        table = build_landmarks(grid)
+        if path is not None:
+            try:
+                save_landmarks(path, table, grid.size)
+            except OSError:
+                pass  # no cache this time, the table still works
+    _landmark_tables[key] = table
+    return table
+
+
+class JumpPointSearch(AStarSearch):
+    # A* over jump points on the 4-connected grid, with the larger of the
+    # Manhattan distance and the landmark bound as heuristic. Of all the
+    # equally short paths only those that move vertically as early as they
+    # can are searched: a vertical run goes on and tries both ways
+    # horizontally at every cell, a horizontal run goes straight until a
+    # cell above or below it opens up behind a blocked one, and only cells
+    # where such a run turns or finds the goal go on the heap. The straight
+    # runs between them are filled back in when the path is read. The runs
+    # test free() as they go, so snakes are handled at query time and the
+    # landmark table depends on the obstacles alone. It takes seconds on a
+    # large board, so only prepare() builds it; until then the heuristic is
+    # the Manhattan distance. cache_dir is where landmark tables are kept on
+    # disk, set by the caller like deadline.
+    name = "jps"
+    cache_dir = None
+
+    def __init__(self, grid):
+        super().__init__(grid)
+        self.landmarks = None
+
+    def prepare(self):
+        self.landmarks = landmark_table(self.grid, self.cache_dir)
+
+    def heuristic(self, a, b):
+        h = Pathfinder.heuristic(self, a, b)
+        if self.landmarks is None:
+            return h
+        return max(h, self.landmarks.bound(a, b))
+
+    def path(self, goal):
+        cols = self.grid.cols
+        points = Pathfinder.path(self, goal)
+        cells = points[:1]
+        for a, b in zip(points, points[1:]):
+            if a // cols == b // cols:
+                step = 1 if b > a else -1
+            else:
+                step = cols if b > a else -cols
+            cells.extend(range(a + step, b + step, step))
+        return cells
+
+    def search(self, start, goal):
+        self.begin(start)
+        grid = self.grid
+        cols, size = grid.cols, grid.size
+        obstacles, snake, ai_snake = grid.obstacles, grid.snake, grid.ai_snake
+        seen, parent, cost, stamp = self.seen, self.parent, self.cost, self.stamp
+        heuristic, tie = self.heuristic, self.tie
+        # Equal priorities go to the cell nearer the goal first, most of the
+        # jump points on a shortest path tie with it
+
+        def horizontal(i, dx):
+            # The next jump point along the row, -1 if the run is blocked
+            x = i % cols
+            while True:
+                x += dx
+                if x < 0 or x >= cols:
+                    return -1
+                i += dx
+                if obstacles[i] or snake[i] or ai_snake[i]:
+                    return -1
+                if i == goal:
+                    return i
+                up, down = i - cols, i + cols
+                if up >= 0 and not (obstacles[up] or snake[up] or ai_snake[up]):
+                    b = up - dx
+                    if obstacles[b] or snake[b] or ai_snake[b]:
+                        return i
+                if down < size and not (obstacles[down] or snake[down] or ai_snake[down]):
+                    b = down - dx
+                    if obstacles[b] or snake[b] or ai_snake[b]:
+                        return i
+
+        def vertical(i, dy):
+            while True:
+                i += dy
+                if i < 0 or i >= size or obstacles[i] or snake[i] or ai_snake[i]:
+                    return -1
+                if i == goal or horizontal(i, 1) >= 0 or horizontal(i, -1) >= 0:
+                    return i
+
+        open_set = [(heuristic(start, goal), 0, start)]
+        best, best_h = start, INF
+        while open_set:
+            priority, _, current = heappop(open_set)
+            g = cost[current]
+            if priority > g + heuristic(current, goal):
+                continue  # a shorter way to this cell was queued after this entry
+            self.expanded += 1
+            if current == goal:
+                return self.path(goal)
+            if self.deadline is not None:
+                h = Pathfinder.heuristic(self, current, goal)
+                if h < best_h:
+                    best, best_h = current, h
+                if self.out_of_time():
+                    return self.path(best)
+
+            p = parent[current]
+            if p < 0:
+                jumps = (horizontal(current, 1), horizontal(current, -1),
+                         vertical(current, cols), vertical(current, -cols))
+            elif p // cols == current // cols:
+                dx = 1 if current > p else -1
+                jumps = [horizontal(current, dx)]
+                # The forced turns: open above or below, blocked behind that
+                for dy in (-cols, cols):
+                    n = current + dy
+                    if (0 <= n < size and not (obstacles[n] or snake[n] or ai_snake[n])
+                            and (obstacles[n - dx] or snake[n - dx] or ai_snake[n - dx])):
+                        jumps.append(vertical(current, dy))
+            else:
+                dy = cols if current > p else -cols
+                jumps = (vertical(current, dy), horizontal(current, 1), horizontal(current, -1))
+
+            for jump in jumps:
+                if jump < 0:
+                    continue
+                step = Pathfinder.heuristic(self, current, jump)
+                if seen[jump] != stamp or g + step < cost[jump]:
+                    seen[jump] = stamp
+                    cost[jump] = g + step
+                    parent[jump] = current
+                    h = heuristic(jump, goal)
+                    heappush(open_set, (g + step + h, h * size + tie(jump), jump))
+        return []
+
+
+PATHFINDERS = {
+    finder.name: finder
+    for finder in (GreedySearch, AStarSearch, BreadthFirstSearch, DijkstraSearch,
+                   IncrementalPlanner, DistanceField, HamiltonianCycle, JumpPointSearch)
+}
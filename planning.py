@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from pathfinding import PATHFINDERS
+from snake_engine import OccupancyGrid
+
+PLAN_MS = 20 # time the AI snakes get to decide a tick's moves
+
+
+class PlanningWorker:
+    # Plans the AI snakes' moves on a background thread so a slow search
+    # can't hold up the Tk event loop. The worker searches its own copy of
+    # the grid, brought up to date from the game grid's change log with every
+    # request, so the game can keep moving snakes while it plans. Searches
+    # get the deadline and return their best partial path when it passes;
+    # if the answer is still late, targets() doesn't wait for it and the
+    # snakes keep a safe heading. Jobs run one at a time, in order, so a late
+    # job only delays the next one and the copy of the grid stays consistent.
+    def __init__(self, engine, plan_ms=PLAN_MS):
+        self.engine = engine
+        self.plan_seconds = plan_ms / 1000
+        self.grid = OccupancyGrid(engine.grid.width, engine.grid.height)
+        self.cursor = -1
+        self.pathfinders = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-planner")
+        self.missed = 0
+        self.expanded = 0
+        # The copy starts out as the game's grid so the finders can build
+        # their tables before the first deadline; the game's own finders
+        # have built the same ones, they come out of the cache
+        layers, _, snakes, _ = self.snapshot()
+        self.grid.load(*layers)
+        for _, snake_id, strategy, _, _ in snakes:
+            self.pathfinder(snake_id, strategy).prepare()
+
+    def snapshot(self):
+        # What changed on the game grid since the last request, or all of it
+        grid = self.engine.grid
+        changed = grid.changes_since(self.cursor)
+        if changed is None:
+            layers = (bytes(grid.obstacles), bytes(grid.snake), bytes(grid.ai_snake))
+            cells = None
+        else:
+            layers = None
+            cells = [(i, grid.obstacles[i], grid.snake[i], grid.ai_snake[i]) for i in set(changed)]
+        self.cursor = grid.cursor()
+        snakes = [
+            (k, ai_snake.id, ai_snake.strategy, ai_snake.coordinates.head_cell(),
+             ai_snake.coordinates.tail_cell())
+            for k, ai_snake in enumerate(self.engine.ai_snakes)
+            if not ai_snake.died and ai_snake.strategy in PATHFINDERS
+        ]
+        return layers, cells, snakes, grid.index(self.engine.food)
+
+    def pathfinder(self, snake_id, name):
+        key = name if PATHFINDERS[name].shared else (snake_id, name)
+        finder = self.pathfinders.get(key)
+        if finder is None:
+            finder = self.pathfinders[key] = PATHFINDERS[name](self.grid)
+        return finder
+
+    def plan(self, snapshot, deadline):
+        # Runs on the worker thread: the next cell of every snake, or -1
+        layers, cells, snakes, food = snapshot
+        if layers is not None:
+            self.grid.load(*layers)
+        else:
+            for cell in cells:
+                self.grid.set_cell(*cell)
+        steps = {}
+        expanded = 0
+        for k, snake_id, strategy, head, tail in snakes:
+            finder = self.pathfinder(snake_id, strategy)
+            finder.deadline = deadline
+            finder.tail = tail
+            steps[k] = finder.next_step(head, food) if food >= 0 else -1
+            expanded += finder.expanded
+        return steps, expanded
+
+    def targets(self):
+        # The next cell of every AI snake, ready to pass to SnakeEngine.step
+        # as ai_targets; each snake checks its own against the live grid
+        # when its turn comes in the tick
+        deadline = time.perf_counter() + self.plan_seconds
+        future = self.executor.submit(self.plan, self.snapshot(), deadline)
+        try:
+            # A couple of ms of slack for the thread handing the result back
+            timeout = max(0, deadline - time.perf_counter()) + 0.002
+            steps, self.expanded = future.result(timeout=timeout)
+        except TimeoutError:
+            self.missed += 1
+            steps, self.expanded = {}, 0
+        targets = []
+        for k, ai_snake in enumerate(self.engine.ai_snakes):
+            if ai_snake.strategy not in PATHFINDERS:
+                # Tree search needs the game itself, it decides in the tick
+                targets.append(None)
+            else:
+                targets.append(steps.get(k, -1))
+        return targets
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
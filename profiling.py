@@ -0,0 +1,142 @@
+import csv
+import json
+import time
+from collections import deque
+
+# Phases of one game tick, in the order they run, plus drawing
+PHASES = ("move", "collision", "ai_decide", "food", "render")
+# Upper edges of the histogram buckets in milliseconds
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, float("inf"))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class NullProfiler:
+    # Takes the engine's calls when no TickProfiler is attached and does
+    # nothing, so step() has one way through whether it is timed or not
+    def clock(self):
+        return 0.0
+
+    def begin_tick(self, tick):
+        return 0.0
+
+    def lap(self, phase, started):
+        return started
+
+    def add_nodes(self, count):
+        pass
+
+    def end_tick(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class TickProfiler:
+    # Opt-in timing of every phase of a tick. The engine calls begin_tick and
+    # end_tick around step() and lap() after each phase; when no profiler is
+    # attached it calls NULL_PROFILER instead. Samples are kept for the last `window`
+    # ticks so the histograms follow the game, and every tick is also kept as
+    # a row for the dump written at game over.
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, window=300):
+        self.window = window
+        self.samples = {phase: deque(maxlen=window) for phase in PHASES}
+        self.nodes = deque(maxlen=window)
+        self.rows = []
+        self.row = None
+
+    def begin_tick(self, tick):
+        self.row = dict.fromkeys(PHASES, 0.0)
+        self.row["tick"] = tick
+        self.row["nodes"] = 0
+        return self.clock()
+
+    def lap(self, phase, started):
+        # Adds the time since started to phase and returns now for the next lap
+        now = self.clock()
+        self.row[phase] += (now - started) * 1000
+        return now
+
+    def add_nodes(self, count):
+        self.row["nodes"] += count
+
+    def end_tick(self):
+        row = self.row
+        for phase in PHASES[:-1]:
+            self.samples[phase].append(row[phase])
+        self.nodes.append(row["nodes"])
+        self.rows.append(row)
+        self.row = None
+
+    def add_planning(self, ms, nodes):
+        # Time spent waiting for a planning thread counts as deciding
+        if self.rows:
+            self.rows[-1]["ai_decide"] += ms
+            self.rows[-1]["nodes"] += nodes
+            self.samples["ai_decide"][-1] += ms
+            self.nodes[-1] += nodes
+
+    def add_render(self, ms):
+        # Frames aren't ticks, a frame's time goes to the tick it showed
+        self.samples["render"].append(ms)
+        if self.rows:
+            self.rows[-1]["render"] += ms
+
+    def histogram(self, phase):
+        counts = [0] * len(BUCKETS_MS)
+        for ms in self.samples[phase]:
+            k = 0
+            while ms > BUCKETS_MS[k]:
+                k += 1
+            counts[k] += 1
+        return counts
+
+    def summary(self):
+        summary = {}
+        for phase in PHASES:
+            values = list(self.samples[phase])
+            summary[phase] = {
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) if values else 0.0,
+                "p50_ms": percentile(values, 50),
+                "p99_ms": percentile(values, 99),
+                "max_ms": max(values) if values else 0.0,
+                "histogram": self.histogram(phase),
+            }
+        nodes = list(self.nodes)
+        summary["ai_decide"]["mean_nodes"] = sum(nodes) / len(nodes) if nodes else 0.0
+        summary["ai_decide"]["max_nodes"] = max(nodes) if nodes else 0
+        return summary
+
+    def overlay_text(self):
+        summary = self.summary()
+        lines = ["{:<10} {:>7} {:>7} {:>7}".format("phase", "p50", "p99", "max")]
+        for phase, entry in summary.items():
+            lines.append("{:<10} {:>7.2f} {:>7.2f} {:>7.2f}".format(
+                phase, entry["p50_ms"], entry["p99_ms"], entry["max_ms"]))
+        lines.append("nodes/tick {:.0f}".format(summary["ai_decide"]["mean_nodes"]))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        # CSV gets one row per tick, anything else the JSON summary and rows
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=("tick",) + PHASES + ("nodes",))
+                writer.writeheader()
+                writer.writerows(self.rows)
+        else:
+            with open(path, "w") as f:
+                json.dump({
+                    "window": self.window,
+                    "buckets_ms": [str(edge) for edge in BUCKETS_MS],
+                    "summary": self.summary(),
+                    "ticks": self.rows,
+                }, f, indent=2)
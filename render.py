@@ -0,0 +1,342 @@
+import argparse
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from replay import ReplayPlayer
+from snake_engine import AI_SNAKE_COLOURS, TICK_MS
+
+# python render.py match.snr --out match.gif --start 100 --stop 300 --cell 8
+# python render.py replays/*.snr --deaths clips --before 40
+# Draws games without a Tk window, in the colours of SnakeGame, into a
+# palette image and writes it as PNG or animated GIF.
+
+# The Tk colours SnakeGame draws with, the first two are the canvas and the
+# outline of every rectangle
+RGB = {
+    "grey": (190, 190, 190), "black": (0, 0, 0), "white": (255, 255, 255),
+    "green": (0, 255, 0), "blue": (0, 0, 255), "yellow": (255, 255, 0),
+    "orange": (255, 165, 0), "purple": (160, 32, 240), "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255), "pink": (255, 192, 203), "brown": (165, 42, 42),
+    "gold": (255, 215, 0),
+}
+PALETTE = ("grey", "black", "white", "green", "blue") + tuple(AI_SNAKE_COLOURS)
+PALETTE_BITS = max(1, (len(PALETTE) - 1).bit_length())
+BACKGROUND, OUTLINE, OBSTACLE, USER_SNAKE, FOOD = range(5)
+
+
+def palette_bytes():
+    rgb = b"".join(bytes(RGB[colour]) for colour in PALETTE)
+    return rgb + bytes(3 * ((1 << PALETTE_BITS) - len(PALETTE)))
+
+
+def png_bytes(pixels):
+    # An 8 bit palette PNG, every row unfiltered
+    height, width = pixels.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        chunk(b"PLTE", palette_bytes()[:3 * len(PALETTE)]),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ))
+
+
+def lzw_encode(data, min_size):
+    # GIF flavoured LZW: variable code width up to 12 bits and a clear code
+    # whenever the table is full
+    clear = 1 << min_size
+    end = clear + 1
+    size = min_size + 1
+    next_code = end + 1
+    table = {}
+    out = bytearray()
+    acc, bits = clear, size
+    prefix = data[0]
+    for pixel in data[1:]:
+        key = prefix << 8 | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        acc |= prefix << bits
+        bits += size
+        while bits >= 8:
+            out.append(acc & 255)
+            acc >>= 8
+            bits -= 8
+        if next_code == 1 << size and size < 12:
+            size += 1
+        if next_code < 4095:
+            table[key] = next_code
+            next_code += 1
+        else:
+            acc |= clear << bits
+            bits += size
+            table = {}
+            size = min_size + 1
+            next_code = end + 1
+        prefix = pixel
+    acc |= prefix << bits
+    bits += size
+    if next_code == 1 << size and size < 12:
+        size += 1
+    acc |= end << bits
+    bits += size
+    while bits > 0:
+        out.append(acc & 255)
+        acc >>= 8
+        bits -= 8
+    return bytes(out)
+
+
+class FrameRenderer:
+    # An engine's board drawn the way SnakeGame draws it, cell by cell, into
+    # one reusable buffer of palette indices (one byte per pixel). Which
+    # colour every cell was last drawn in is kept, and each draw() only
+    # repaints the cells the grid's change log says were touched, plus the
+    # old and new food; a different engine (a replay seek that copied one)
+    # or a trimmed log compares every cell instead, in NumPy. Painting
+    # writes the cells' prebuilt tiles through a (rows, cell, cols, cell)
+    # view of the buffer. `box` collects the pixel rectangle changed since
+    # the last take_box(), for frames that only store what changed.
+    def __init__(self, grid, cell=20):
+        self.cols, self.rows = grid.cols, grid.rows
+        self.cell = cell
+        self.width = grid.width * cell // 20
+        self.height = grid.height * cell // 20
+        self.pixels = np.zeros((self.rows * cell, self.cols * cell), dtype=np.uint8)
+        self.blocks = self.pixels.reshape(self.rows, cell, self.cols, cell)
+        self.codes = np.zeros(self.cols * self.rows, dtype=np.uint8)
+        self.tiles = np.empty((len(PALETTE), cell, cell), dtype=np.uint8)
+        for code in range(len(PALETTE)):
+            self.tiles[code] = code
+            if code != BACKGROUND and cell >= 4:
+                self.tiles[code, [0, -1], :] = OUTLINE
+                self.tiles[code, :, [0, -1]] = OUTLINE
+        self.grid = None
+        self.cursor = -1
+        self.food = -1
+        self.box = None
+
+    def colours(self, engine):
+        return {ai_snake.id: PALETTE.index(ai_snake.colour) for ai_snake in engine.ai_snakes}
+
+    def code(self, grid, i, food, colours):
+        if i == food:
+            return FOOD
+        if grid.obstacles[i]:
+            return OBSTACLE
+        if grid.snake[i]:
+            return USER_SNAKE
+        if grid.ai_snake[i]:
+            return colours.get(grid.owners[i][-1], PALETTE.index("yellow"))
+        return BACKGROUND
+
+    def all_codes(self, engine, food):
+        grid = engine.grid
+        codes = np.zeros(grid.size, dtype=np.uint8)
+        ai = np.frombuffer(grid.ai_snake, dtype=np.uint8).nonzero()[0]
+        colours = self.colours(engine)
+        yellow = PALETTE.index("yellow")
+        codes[ai] = [colours.get(grid.owners[i][-1], yellow) for i in ai.tolist()]
+        codes[np.frombuffer(grid.snake, dtype=np.uint8) > 0] = USER_SNAKE
+        codes[np.frombuffer(grid.obstacles, dtype=np.uint8) > 0] = OBSTACLE
+        if food >= 0:
+            codes[food] = FOOD
+        return codes
+
+    def draw(self, engine):
+        grid = engine.grid
+        food = grid.index(engine.food) if engine.food is not None else -1
+        changed = grid.changes_since(self.cursor) if grid is self.grid else None
+        self.grid = grid
+        self.cursor = grid.cursor()
+        if changed is None:
+            codes = self.all_codes(engine, food)
+            dirty = np.nonzero(codes != self.codes)[0]
+            new = codes[dirty]
+        else:
+            colours = self.colours(engine)
+            candidates = set(changed)
+            candidates.update(i for i in (self.food, food) if i >= 0)
+            dirty, new = [], []
+            for i in candidates:
+                code = self.code(grid, i, food, colours)
+                if code != self.codes[i]:
+                    dirty.append(i)
+                    new.append(code)
+            dirty = np.array(dirty, dtype=np.int64)
+            new = np.array(new, dtype=np.uint8)
+        self.food = food
+        if len(dirty):
+            self.codes[dirty] = new
+            ys, xs = np.divmod(dirty, self.cols)
+            self.blocks[ys, :, xs, :] = self.tiles[new]
+            cell = self.cell
+            box = (int(xs.min()) * cell, int(ys.min()) * cell,
+                   (int(xs.max()) + 1) * cell, (int(ys.max()) + 1) * cell)
+            if self.box is not None:
+                box = (min(box[0], self.box[0]), min(box[1], self.box[1]),
+                       max(box[2], self.box[2]), max(box[3], self.box[3]))
+            self.box = box
+        return len(dirty)
+
+    def take_box(self):
+        # The changed rectangle inside the visible board, None if nothing changed
+        box, self.box = self.box, None
+        if box is None:
+            return None
+        x0, y0, x1, y1 = box
+        x1, y1 = min(x1, self.width), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def frame(self):
+        return self.pixels[:self.height, :self.width]
+
+    def png(self):
+        return png_bytes(self.frame())
+
+    def save_png(self, path):
+        with open(path, "wb") as f:
+            f.write(self.png())
+
+
+class GifWriter:
+    # An animated GIF of a renderer's frames. The first frame is the whole
+    # board, every later one only the rectangle that changed since the one
+    # before, drawn over it, so a tick usually costs a few cells.
+    def __init__(self, path, renderer, delay_ms=TICK_MS, loop=0):
+        self.renderer = renderer
+        self.delay = max(1, round(delay_ms / 10))
+        self.file = open(path, "wb")
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", renderer.width, renderer.height,
+                                                0xF0 | (PALETTE_BITS - 1), BACKGROUND, 0))
+        self.file.write(palette_bytes())
+        # Netscape extension, loop forever by default
+        self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+        self.frames = 0
+
+    def add_frame(self):
+        renderer = self.renderer
+        box = renderer.take_box()
+        if self.frames == 0:
+            box = (0, 0, renderer.width, renderer.height)
+        elif box is None:
+            # Nothing moved, a one pixel frame keeps the timing
+            box = (0, 0, 1, 1)
+        x0, y0, x1, y1 = box
+        pixels = renderer.pixels[y0:y1, x0:x1]
+        data = lzw_encode(pixels.tobytes(), max(2, PALETTE_BITS))
+        blocks = b"".join(bytes((len(data[k:k + 255]),)) + data[k:k + 255] for k in range(0, len(data), 255))
+        self.file.write(b"\x21\xf9\x04\x04" + struct.pack("<H", self.delay) + b"\x00\x00")
+        self.file.write(b"\x2c" + struct.pack("<HHHHB", x0, y0, x1 - x0, y1 - y0, 0))
+        self.file.write(bytes((max(2, PALETTE_BITS),)) + blocks + b"\x00")
+        self.frames += 1
+
+    def close(self):
+        self.file.write(b"\x3b")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def render_replay(path, out, start=0, stop=None, cell=20, every=1):
+    # Ticks start..stop of a recording as a GIF, or the board at stop as a PNG
+    player = ReplayPlayer(path)
+    try:
+        stop = player.ticks if stop is None else min(stop, player.ticks)
+        engine = player.seek(start if not out.endswith(".png") else stop)
+        renderer = FrameRenderer(engine.grid, cell)
+        renderer.draw(engine)
+        if out.endswith(".png"):
+            renderer.save_png(out)
+            return 1
+        with GifWriter(out, renderer, TICK_MS * every) as gif:
+            gif.add_frame()
+            while engine.tick < stop and not engine.is_game_over:
+                for _ in range(every):
+                    player.step()
+                renderer.draw(engine)
+                gif.add_frame()
+            return gif.frames
+    finally:
+        player.close()
+
+
+def death_ticks(path):
+    # (snake number, tick) of every death in a recording, user snake first
+    player = ReplayPlayer(path)
+    try:
+        engine = player.engine
+        deaths = []
+        alive = None
+        while not engine.is_game_over and engine.tick < player.ticks:
+            player.step()
+            now = ([not engine.snake_died] if engine.user_snake else []) + [
+                not ai_snake.died for ai_snake in engine.ai_snakes]
+            if alive is not None:
+                deaths += [(k, engine.tick) for k, (was, is_) in enumerate(zip(alive, now)) if was and not is_]
+            alive = now
+        return deaths
+    finally:
+        player.close()
+
+
+def death_clips(task):
+    # One GIF of the last `before` ticks up to every death in a recording
+    path, out_dir, before, cell = task
+    name = os.path.splitext(os.path.basename(path))[0]
+    clips = []
+    for snake, tick in death_ticks(path):
+        out = os.path.join(out_dir, "{}-snake{}-tick{}.gif".format(name, snake, tick))
+        render_replay(path, out, max(0, tick - before), tick, cell)
+        clips.append(out)
+    return clips
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Snake replays to PNG or GIF without a display.")
+    parser.add_argument("replays", nargs="+", help="replay files")
+    parser.add_argument("--out", help="GIF of the ticks, or PNG of the board at --stop, for one replay")
+    parser.add_argument("--start", type=int, default=0, help="first tick")
+    parser.add_argument("--stop", type=int, help="last tick")
+    parser.add_argument("--every", type=int, default=1, help="ticks per GIF frame")
+    parser.add_argument("--cell", type=int, default=20, help="pixels per cell")
+    parser.add_argument("--deaths", help="directory to write a clip of every death in every replay to")
+    parser.add_argument("--before", type=int, default=40, help="ticks of a death clip")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes for --deaths")
+    args = parser.parse_args(argv)
+
+    if args.deaths:
+        os.makedirs(args.deaths, exist_ok=True)
+        tasks = [(path, args.deaths, args.before, args.cell) for path in args.replays]
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            clips = sum(pool.map(death_clips, tasks), [])
+        print("{} clips written to {}".format(len(clips), args.deaths))
+    else:
+        if len(args.replays) != 1 or not args.out:
+            parser.error("give one replay and --out, or --deaths")
+        frames = render_replay(args.replays[0], args.out, args.start, args.stop, args.cell, args.every)
+        print("{} frames written to {}".format(frames, args.out))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import copy
+import mmap
+import struct
+
+from snake_engine import DIRECTIONS, SnakeEngine
+
+# File layout, all little endian:
+#   header  magic, version, user snake flag, AI snake count, seed, max ticks,
+#           board width and height in pixels
+#   layout  obstacle count and (x, y) pairs, then every snake's initial
+#           length and (x, y) pairs, user snake first
+#   ticks   one record per tick holding every snake's direction in 2 bits,
+#           so a two snake game costs one byte per tick
+MAGIC = b"SNKR"
+VERSION = 3
+HEADER = struct.Struct("<4sBBHQIHH")
+COUNT = struct.Struct("<H")
+POINT = struct.Struct("<HH")
+KEYFRAME_INTERVAL = 256
+
+
+def snakes_of(engine):
+    snakes = ([engine.snake] if engine.user_snake else []) + [s.coordinates for s in engine.ai_snakes]
+    return [list(snake) for snake in snakes]
+
+
+def pack_points(points):
+    return COUNT.pack(len(points)) + b"".join(POINT.pack(x, y) for x, y in points)
+
+
+class ReplayRecorder:
+    # Call record() after every engine.step()
+    def __init__(self, path, engine):
+        self.engine = engine
+        snakes = snakes_of(engine)
+        self.record_size = (len(snakes) + 3) // 4
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(
+            MAGIC, VERSION, engine.user_snake, len(engine.ai_snakes), engine.seed, engine.max_ticks,
+            engine.grid.width, engine.grid.height,
+        ))
+        self.file.write(pack_points(engine.obstacles))
+        for coordinates in snakes:
+            self.file.write(pack_points(coordinates))
+
+    def record(self):
+        directions = [self.engine.direction] if self.engine.user_snake else []
+        directions += [ai_snake.direction for ai_snake in self.engine.ai_snakes]
+        packed = 0
+        for k, direction in enumerate(directions):
+            packed |= DIRECTIONS.index(direction) << (2 * k)
+        self.file.write(packed.to_bytes(self.record_size, "little"))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayPlayer:
+    # Memory-maps a recording and rebuilds the game at any tick by replaying
+    # the recorded directions, no AI search involved. Every KEYFRAME_INTERVAL
+    # ticks a copy of the engine is kept, so seeking only re-simulates from
+    # the closest keyframe before the wanted tick.
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, user_snake, ai_count, seed, max_ticks, width, height = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} snake replay".format(path, VERSION))
+        offset = HEADER.size
+        layout = []
+        for _ in range(1 + user_snake + ai_count):
+            points, offset = self.read_points(offset)
+            layout.append(points)
+
+        self.user_snake = bool(user_snake)
+        self.ai_count = ai_count
+        self.seed = seed
+        self.max_ticks = max_ticks
+        self.width = width
+        self.height = height
+        self.snake_count = user_snake + ai_count
+        self.record_size = (self.snake_count + 3) // 4
+        self.offset = offset
+        self.ticks = (len(self.data) - offset) // self.record_size
+
+        engine = self.new_engine()
+        if [engine.obstacles] + snakes_of(engine) != layout:
+            raise ValueError("{} was recorded with different game rules".format(path))
+        self.keyframes = {0: copy.deepcopy(engine)}
+        self.engine = engine
+
+    def read_points(self, offset):
+        (count,) = COUNT.unpack_from(self.data, offset)
+        offset += COUNT.size
+        points = [POINT.unpack_from(self.data, offset + k * POINT.size) for k in range(count)]
+        return points, offset + count * POINT.size
+
+    def new_engine(self):
+        engine = SnakeEngine(seed=self.seed, ai_count=self.ai_count, user_snake=self.user_snake,
+                             width=self.width, height=self.height)
+        engine.max_ticks = self.max_ticks
+        return engine
+
+    def directions(self, tick):
+        # Directions recorded for the step that led to tick + 1
+        start = self.offset + tick * self.record_size
+        packed = int.from_bytes(self.data[start:start + self.record_size], "little")
+        return [DIRECTIONS[(packed >> (2 * k)) & 3] for k in range(self.snake_count)]
+
+    def step(self):
+        engine = self.engine
+        directions = self.directions(engine.tick)
+        if self.user_snake:
+            engine.step(directions[0], directions[1:])
+        else:
+            engine.step(None, directions)
+        if engine.tick % KEYFRAME_INTERVAL == 0 and engine.tick not in self.keyframes:
+            self.keyframes[engine.tick] = copy.deepcopy(engine)
+
+    def seek(self, tick):
+        tick = max(0, min(tick, self.ticks))
+        if tick < self.engine.tick or tick - self.engine.tick > KEYFRAME_INTERVAL:
+            keyframe = max(t for t in self.keyframes if t <= tick)
+            if keyframe > self.engine.tick or tick < self.engine.tick:
+                self.engine = copy.deepcopy(self.keyframes[keyframe])
+        while self.engine.tick < tick and not self.engine.is_game_over:
+            self.step()
+        return self.engine
+
+    def close(self):
+        self.data.close()
+        self.file.close()
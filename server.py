@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import json
+import struct
+import sys
+import time
+from collections import deque
+
+from pathfinding import JumpPointSearch
+from profiling import percentile
+from snake_engine import DIRECTIONS, HEIGHT, OPPOSITE, STRATEGIES, TICK_MS, WIDTH, SnakeEngine
+
+# python server.py --port 7777 --matches 1000
+# Every message either way is a 4 byte little endian length and then the
+# body, whose first byte says what it is. Cells are indices into the board
+# row by row, as in OccupancyGrid; snakes are listed user snake first.
+#   client -> server
+#     J  match id: watch that match, 0 starts a new one with the client's
+#        own snake to steer
+#     D  an index into DIRECTIONS, taken at the next tick like a key press
+#   server -> client
+#     S  the match as it is now, sent once after joining: match id, tick,
+#        columns, rows, user snake flag, snake count, tick ms and food
+#        (-1 for none), then the obstacles and every snake head first
+#     T  one tick: the tick, the new food cell or -1 when it didn't move,
+#        then every snake's new head cell (-1 if it didn't move) and flags
+#     E  game over, the message in UTF-8
+LENGTH = struct.Struct("<I")
+JOIN = struct.Struct("<cI")
+INPUT = struct.Struct("<cB")
+START = struct.Struct("<cIIHHBBHi")
+COUNT = struct.Struct("<I")
+TICK = struct.Struct("<cIi")
+SNAKE = struct.Struct("<iB")
+
+# Flags of a snake in a tick
+TAIL_LEFT = 1 # the tail cell was freed, the snake didn't grow
+DIED = 2 # the snake is gone from the board
+
+JITTER_WINDOW = 300 # ticks of jitter kept per match
+MAX_BUFFERED = 1 << 20 # bytes a client may fall behind before it is dropped
+
+
+def pack_message(body):
+    return LENGTH.pack(len(body)) + body
+
+
+async def read_message(reader):
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return await reader.readexactly(length)
+
+
+def pack_cells(cells):
+    return COUNT.pack(len(cells)) + struct.pack("<{}i".format(len(cells)), *cells)
+
+
+def unpack_cells(data, offset):
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    return list(struct.unpack_from("<{}i".format(count), data, offset)), offset + 4 * count
+
+
+class Match:
+    # One game on the server's event loop with the clients watching it. The
+    # ticks are due on a fixed schedule; how late each one actually ran is
+    # its jitter. A match that falls more than a whole tick behind skips
+    # ahead instead of stepping in a burst and counts an overrun. phase
+    # delays the first tick by that fraction of a tick.
+    def __init__(self, match_id, engine, tick_ms=TICK_MS, player=None, phase=0.0):
+        self.id = match_id
+        self.engine = engine
+        self.tick_seconds = tick_ms / 1000
+        self.tick_ms = tick_ms
+        self.player = player
+        self.phase = phase
+        self.clients = []
+        self.direction = engine.direction
+        self.bodies = ([engine.snake] if engine.user_snake else []) + [s.coordinates for s in engine.ai_snakes]
+        self.jitter = deque(maxlen=JITTER_WINDOW)
+        self.step_ms = deque(maxlen=JITTER_WINDOW)
+        self.recent = []
+        self.overruns = 0
+        self.bytes_sent = 0
+
+    def deaths(self):
+        engine = self.engine
+        return ([engine.snake_died] if engine.user_snake else []) + [s.died for s in engine.ai_snakes]
+
+    def start_message(self):
+        engine = self.engine
+        grid = engine.grid
+        food = grid.index(engine.food) if engine.food is not None else -1
+        parts = [
+            START.pack(b"S", self.id, engine.tick, grid.cols, grid.rows, engine.user_snake,
+                       len(self.bodies), self.tick_ms, food),
+            pack_cells([grid.index(point) for point in engine.obstacles]),
+        ]
+        for body in self.bodies:
+            parts.append(pack_cells([grid.index(point) for point in body]))
+        return pack_message(b"".join(parts))
+
+    def tick_message(self, food, lengths, died):
+        # What changed in the step just taken, from the state before it
+        engine = self.engine
+        moved = engine.food is not None and engine.food != food
+        parts = [TICK.pack(b"T", engine.tick, engine.grid.index(engine.food) if moved else -1)]
+        for body, length, was_dead, dead in zip(self.bodies, lengths, died, self.deaths()):
+            if was_dead:
+                parts.append(SNAKE.pack(-1, 0))
+            elif dead:
+                parts.append(SNAKE.pack(-1, DIED))
+            else:
+                parts.append(SNAKE.pack(body.head_cell(), TAIL_LEFT if len(body) == length else 0))
+        return pack_message(b"".join(parts))
+
+    def join(self, writer):
+        self.clients.append(writer)
+        self.send(writer, self.start_message())
+
+    def leave(self, writer):
+        if writer in self.clients:
+            self.clients.remove(writer)
+        if writer is self.player and not self.engine.is_game_over:
+            self.engine.game_over("Game Over! The player left.")
+
+    def send(self, writer, message):
+        # A client too far behind is dropped rather than slowing the match
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            writer.close()
+            self.leave(writer)
+            return
+        writer.write(message)
+        self.bytes_sent += len(message)
+
+    def broadcast(self, message):
+        for writer in list(self.clients):
+            self.send(writer, message)
+
+    def change_direction(self, index):
+        # The same rule as a key press in SnakeGame
+        if index < len(DIRECTIONS) and DIRECTIONS[index] != OPPOSITE[self.direction]:
+            self.direction = DIRECTIONS[index]
+
+    def step(self):
+        engine = self.engine
+        lengths = [len(body) for body in self.bodies]
+        died = self.deaths()
+        food = engine.food
+        started = time.perf_counter()
+        engine.step(self.direction if engine.user_snake else None)
+        self.step_ms.append((time.perf_counter() - started) * 1000)
+        self.direction = engine.direction
+        self.broadcast(self.tick_message(food, lengths, died))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        due = loop.time() + self.tick_seconds * (1 + self.phase)
+        while not self.engine.is_game_over:
+            await asyncio.sleep(due - loop.time())
+            now = loop.time()
+            late = now - due
+            self.jitter.append(late * 1000)
+            self.recent.append(late * 1000)
+            if late > self.tick_seconds:
+                self.overruns += 1
+                due = now
+            if self.engine.is_game_over:
+                break
+            self.step()
+            due += self.tick_seconds
+        self.finish()
+
+    def finish(self):
+        # Tell every client how the game ended and hang up
+        self.broadcast(pack_message(b"E" + self.engine.game_over_message.encode()))
+        for writer in self.clients:
+            writer.close()
+        self.clients = []
+
+    def report(self):
+        jitter = list(self.jitter)
+        return {
+            "match": self.id,
+            "tick": self.engine.tick,
+            "jitter_p50_ms": percentile(jitter, 50),
+            "jitter_p99_ms": percentile(jitter, 99),
+            "jitter_max_ms": max(jitter) if jitter else 0.0,
+            "step_mean_ms": sum(self.step_ms) / len(self.step_ms) if self.step_ms else 0.0,
+            "overruns": self.overruns,
+            "bytes_sent": self.bytes_sent,
+            "game_over": self.engine.game_over_message,
+        }
+
+
+class MatchView:
+    # A client's copy of a match, built from its S message and kept up to
+    # date by apply() with every T message; enough to draw the board.
+    def __init__(self, message):
+        (_, self.id, self.tick, self.cols, self.rows, user_snake, count,
+         self.tick_ms, self.food) = START.unpack_from(message, 0)
+        self.user_snake = bool(user_snake)
+        self.obstacles, offset = unpack_cells(message, START.size)
+        self.snakes = []
+        for _ in range(count):
+            cells, offset = unpack_cells(message, offset)
+            self.snakes.append(deque(cells))
+        self.died = [not cells for cells in self.snakes]
+        self.game_over_message = None
+
+    def apply(self, message):
+        kind = message[:1]
+        if kind == b"E":
+            self.game_over_message = message[1:].decode()
+            return
+        _, self.tick, food = TICK.unpack_from(message, 0)
+        if food >= 0:
+            self.food = food
+        for k, snake in enumerate(self.snakes):
+            head, flags = SNAKE.unpack_from(message, TICK.size + k * SNAKE.size)
+            if flags & DIED:
+                snake.clear()
+                self.died[k] = True
+            elif head >= 0:
+                snake.appendleft(head)
+                if flags & TAIL_LEFT:
+                    snake.pop()
+
+
+class GameServer:
+    # Hosts every match on one event loop. Clients join a match with a J
+    # message; `matches` headless AI-only matches are kept running on top of
+    # that as load, a new one starting whenever one ends. The first batch is
+    # spread over a tick, matches that all tick at the same moment would
+    # measure how long the batch takes rather than the loop's jitter.
+    def __init__(self, ai_count=1, strategy=None, tick_ms=TICK_MS, width=WIDTH, height=HEIGHT,
+                 seed=0, matches=0, policy=None):
+        self.ai_count = ai_count
+        self.strategy = strategy
+        self.policy = policy
+        self.tick_ms = tick_ms
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.headless = matches
+        self.matches = {}
+        self.finished = []
+        self.next_id = 1
+        self.tasks = set()
+        self.connections = set()
+        self.closing = False
+
+    def new_match(self, player=None, phase=0.0):
+        match_id = self.next_id
+        self.next_id += 1
+        engine = SnakeEngine(seed=self.seed + match_id, ai_count=self.ai_count, strategy=self.strategy,
+                             user_snake=player is not None, width=self.width, height=self.height,
+                             policy=self.policy, tick_ms=self.tick_ms)
+        match = self.matches[match_id] = Match(match_id, engine, self.tick_ms, player, phase)
+        task = asyncio.get_running_loop().create_task(self.play(match))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return match
+
+    async def play(self, match):
+        try:
+            await match.run()
+        finally:
+            del self.matches[match.id]
+            self.finished.append(match.report())
+            if match.player is None and not self.closing and len(self.matches) < self.headless:
+                self.new_match()
+
+    async def handle(self, reader, writer):
+        match = None
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        try:
+            kind, match_id = JOIN.unpack(await read_message(reader))
+            if kind != b"J":
+                return
+            if match_id == 0:
+                match = self.new_match(writer)
+            else:
+                match = self.matches.get(match_id)
+                if match is None:
+                    writer.write(pack_message(b"E" + "No match {}".format(match_id).encode()))
+                    return
+            match.join(writer)
+            while True:
+                message = await read_message(reader)
+                if message[:1] == b"D" and writer is match.player:
+                    match.change_direction(INPUT.unpack(message)[1])
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            if match is not None:
+                match.leave(writer)
+            writer.close()
+            self.connections.discard(connection)
+
+    def report(self, elapsed):
+        # Jitter of every running match since the last report
+        samples = []
+        ticks = 0
+        for match in self.matches.values():
+            samples += match.recent
+            ticks += len(match.recent)
+            match.recent = []
+        worst = sorted(self.matches.values(), key=lambda m: percentile(list(m.jitter), 99), reverse=True)
+        print("{} matches  {:.0f} ticks/s  jitter p50 {:.2f}  p99 {:.2f}  max {:.2f} ms  overruns {}".format(
+            len(self.matches), ticks / elapsed if elapsed else 0.0, percentile(samples, 50),
+            percentile(samples, 99), max(samples) if samples else 0.0,
+            sum(match.overruns for match in self.matches.values())))
+        for match in worst[:3]:
+            entry = match.report()
+            print("  match {:<6} p99 {:.2f}  max {:.2f} ms  step {:.3f} ms".format(
+                entry["match"], entry["jitter_p99_ms"], entry["jitter_max_ms"], entry["step_mean_ms"]))
+
+    async def serve(self, host="127.0.0.1", port=7777, unix=None, report_seconds=5.0, duration=None):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        print("Serving on {}".format(unix or "{}:{}".format(host, port)))
+        for k in range(self.headless):
+            self.new_match(phase=k / self.headless)
+        loop = asyncio.get_running_loop()
+        started = last = loop.time()
+        async with server:
+            while duration is None or loop.time() - started < duration:
+                wait = report_seconds
+                if duration is not None:
+                    wait = min(wait, started + duration - loop.time())
+                await asyncio.sleep(wait)
+                now = loop.time()
+                self.report(now - last)
+                last = now
+            await self.shutdown(server)
+
+    async def shutdown(self, server):
+        # Every client hears the game is over before it is hung up on, then
+        # the matches and connections are waited for so nothing is left
+        # running when the loop closes
+        self.closing = True
+        server.close()
+        for match in list(self.matches.values()):
+            if not match.engine.is_game_over:
+                match.engine.game_over("Game Over! The server shut down.")
+            match.finish()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, *self.connections, return_exceptions=True)
+
+    def summary(self):
+        # Matches still running at the end are reported as they were
+        return self.finished + [match.report() for match in self.matches.values()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Snake matches for remote clients.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--matches", type=int, default=0, help="headless AI matches to keep running as load")
+    parser.add_argument("--ai-count", type=int, default=1, help="AI snakes in every match")
+    parser.add_argument("--strategy", choices=STRATEGIES, help="how the AI snakes pick their moves")
+    parser.add_argument("--tick-ms", type=int, default=TICK_MS, help="milliseconds per game tick")
+    parser.add_argument("--seed", type=int, default=0, help="match n plays seed + n")
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between jitter reports")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--out", help="write every match's jitter report as JSON at the end")
+    parser.add_argument("--policy", help="checkpoint from evolve.py for the neural strategy")
+    parser.add_argument("--landmark-cache", help="keep landmark tables of the jps strategy on large boards in this directory")
+    args = parser.parse_args(argv)
+    if args.ai_count < 1:
+        parser.error("--ai-count must be at least 1")
+    if args.tick_ms <= 0:
+        parser.error("--tick-ms must be positive")
+    JumpPointSearch.cache_dir = args.landmark_cache
+
+    policy = None
+    if args.policy:
+        from neural import load_policy
+        policy = load_policy(args.policy)
+    elif args.strategy == "neural":
+        parser.error("--strategy neural needs a --policy checkpoint")
+    server = GameServer(args.ai_count, args.strategy, args.tick_ms, seed=args.seed, matches=args.matches,
+                        policy=policy)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report, args.duration))
+    except KeyboardInterrupt:
+        pass
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(server.summary(), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,784 @@
+import random
+from array import array
+
+from bitboard import MoveSafety
+from pathfinding import LARGE_BOARD_CELLS, PATHFINDERS
+from profiling import NULL_PROFILER
+
+HEIGHT = 650
+WIDTH = 1000
+INITIAL_AI_SNAKE_COORDS = [(100, 200), (80, 200), (60, 200)]
+INITIAL_SNAKE_COORDS = [(100, 100), (80, 100), (60, 100)]
+OBSTACLES_COUNT = 20 # on the default board, larger boards get as many per cell
+MAX_BOARD_CELLS = 2000 # largest board in cells per side
+GAME_TIME = 300 # in seconds
+TICK_MS = 200 # one simulation step every 200 ms in the Tk window
+
+USER_SNAKE_ID = 0
+AI_SNAKE_COLOURS = ["yellow", "orange", "purple", "cyan", "magenta", "pink", "brown", "gold"]
+
+DIRECTIONS = ("Right", "Left", "Up", "Down")
+# Every AI strategy: the pathfinders plus Monte Carlo tree search (mcts.py)
+# and the evolved policy (neural.py)
+STRATEGIES = tuple(PATHFINDERS) + ("mcts", "neural")
+OPPOSITE = {"Right": "Left", "Left": "Right", "Up": "Down", "Down": "Up"}
+
+
+class FreeCells:
+    # Every free cell in a list plus each cell's place in that list. Taking a
+    # cell out swaps the last one into its slot, so adding, removing and
+    # drawing a random free cell are all O(1) however full the board is.
+    # Both are flat int arrays, a 2000x2000 board costs 32 MB, not hundreds.
+    def __init__(self, size):
+        self.cells = array("i")
+        self.position = array("i", [-1]) * size
+
+    def extend(self, start, stop):
+        # Add the cells start..stop-1, all of them currently missing
+        first = len(self.cells)
+        self.cells.extend(range(start, stop))
+        self.position[start:stop] = array("i", range(first, first + stop - start))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, cell):
+        if self.position[cell] < 0:
+            self.position[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        k = self.position[cell]
+        if k < 0:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[k] = last
+            self.position[last] = k
+        self.position[cell] = -1
+
+    def snapshot(self):
+        # The order matters too, it decides which cell a random draw lands on
+        return self.cells[:], self.position[:]
+
+    def restore(self, snapshot):
+        cells, position = snapshot
+        self.cells[:] = cells
+        self.position[:] = position
+
+    def choice(self, rng):
+        # -1 when the board is full
+        if not self.cells:
+            return -1
+        return self.cells[int(rng.random() * len(self.cells))]
+
+
+class OccupancyGrid:
+    # One byte per 20-px cell for each kind of thing that can sit on it, so
+    # every "is this cell taken" question is an index lookup, not a list scan.
+    # The snake layers count segments so a growing tail can share a cell.
+    # Every add/remove is also logged so planners can catch up on just the
+    # cells that changed since they last looked. owners is a spatial hash of
+    # which snakes have a segment on a cell, so telling who a head ran into
+    # costs the same however many snakes there are.
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+        self.cols = (width + 19) // 20
+        self.rows = (height + 19) // 20
+        self.size = self.cols * self.rows
+        self.obstacles = bytearray(self.size)
+        self.snake = bytearray(self.size)
+        self.ai_snake = bytearray(self.size)
+        self.changes = []
+        self.changes_base = 0
+        # Off while a search plays out futures it undoes again, the planners
+        # don't need to hear about cells that end up as they were
+        self.recording = True
+        self.owners = {}
+        # Food and obstacles only go on cells that are fully on screen
+        self.placeable_cols = width // 20
+        self.placeable_rows = height // 20
+        self.free_cells = FreeCells(self.size)
+        for row in range(min(self.placeable_rows, self.rows)):
+            self.free_cells.extend(row * self.cols, row * self.cols + min(self.placeable_cols, self.cols))
+
+    def index(self, point):
+        x, y = point
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return (y // 20) * self.cols + x // 20
+        return -1
+
+    def point(self, index):
+        return (index % self.cols) * 20, (index // self.cols) * 20
+
+    def placeable(self, i):
+        return i % self.cols < self.placeable_cols and i // self.cols < self.placeable_rows
+
+    def free(self, i):
+        return not (self.obstacles[i] or self.snake[i] or self.ai_snake[i])
+
+    def is_free(self, point):
+        i = self.index(point)
+        return i >= 0 and not (self.obstacles[i] or self.snake[i] or self.ai_snake[i])
+
+    def next_cell(self, i, direction):
+        # The cell a head on i moves into, -1 past the board edge
+        cols = self.cols
+        if i < 0:
+            return -1
+        if direction == "Right":
+            return i + 1 if i % cols + 1 < cols else -1
+        elif direction == "Left":
+            return i - 1 if i % cols > 0 else -1
+        elif direction == "Up":
+            return i - cols if i >= cols else -1
+        return i + cols if i + cols < self.size else -1
+
+    def load(self, obstacles, snake, ai_snake):
+        # Replace every layer at once, planners reading the log start over
+        self.obstacles[:] = obstacles
+        self.snake[:] = snake
+        self.ai_snake[:] = ai_snake
+        self.changes_base = self.cursor() + 1
+        self.changes = []
+
+    def set_cell(self, i, obstacle, snake, ai_snake):
+        self.obstacles[i] = obstacle
+        self.snake[i] = snake
+        self.ai_snake[i] = ai_snake
+        self.record(i)
+
+    def neighbours(self, i):
+        # Right, Left, Up, Down, the same order the searches try moves in
+        cols = self.cols
+        x = i % cols
+        result = []
+        if x + 1 < cols:
+            result.append(i + 1)
+        if x > 0:
+            result.append(i - 1)
+        if i >= cols:
+            result.append(i - cols)
+        if i + cols < self.size:
+            result.append(i + cols)
+        return result
+
+    def cursor(self):
+        return self.changes_base + len(self.changes)
+
+    def changes_since(self, cursor):
+        # None means the log was trimmed past the cursor, so replan from scratch
+        if cursor < self.changes_base:
+            return None
+        return self.changes[cursor - self.changes_base:]
+
+    def record(self, i):
+        if not self.recording:
+            return
+        if len(self.changes) >= 4096:
+            self.changes_base += len(self.changes)
+            self.changes = []
+        self.changes.append(i)
+
+    def add_obstacle(self, i):
+        self.obstacles[i] = 1
+        self.free_cells.discard(i)
+
+    def add(self, layer, point, owner):
+        self.add_cell(layer, self.index(point), owner)
+
+    def remove(self, layer, point, owner):
+        self.remove_cell(layer, self.index(point), owner)
+
+    def add_cell(self, layer, i, owner):
+        if i >= 0:
+            self.free_cells.discard(i)
+            layer[i] += 1
+            self.owners.setdefault(i, []).append(owner)
+            self.record(i)
+
+    def remove_cell(self, layer, i, owner):
+        if i >= 0 and layer[i]:
+            layer[i] -= 1
+            owners = self.owners[i]
+            owners.remove(owner)
+            if not owners:
+                del self.owners[i]
+                if not self.obstacles[i] and self.placeable(i):
+                    self.free_cells.add(i)
+            self.record(i)
+
+
+class SnakeBody:
+    # A snake as a ring buffer of cell indices, head first when read as a
+    # sequence of (x, y) points. Moving writes the new head into the next
+    # slot and drops the tail slot, so a step costs the same for 3 segments
+    # or 3000; the buffer only doubles (amortized) when the snake outgrows it.
+    # `point in body` is one lookup in the grid's owners of the cell. Eating
+    # sets pending growth: the next move keeps the tail where it is instead
+    # of adding a placeholder segment. The body keeps its grid layer in sync
+    # itself.
+    __slots__ = ("grid", "layer", "owner", "cells", "mask", "head", "length", "pending")
+
+    def __init__(self, grid, layer, owner, points=()):
+        self.grid = grid
+        self.layer = layer
+        self.owner = owner
+        self.reserve(len(points))
+        for point in reversed(points):
+            self.push(grid.index(point))
+
+    def reserve(self, length):
+        capacity = 16
+        while capacity < 2 * length:
+            capacity *= 2
+        self.cells = array("l", [-1]) * capacity
+        self.mask = capacity - 1
+        self.head = self.mask
+        self.length = 0
+        self.pending = 0
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        cells, mask, head, point = self.cells, self.mask, self.head, self.grid.point
+        for k in range(self.length):
+            yield point(cells[(head - k) & mask])
+
+    def __getitem__(self, k):
+        # Segment k from the head as a point, slices give lists
+        if isinstance(k, slice):
+            return [self[j] for j in range(*k.indices(self.length))]
+        if k < 0:
+            k += self.length
+        if not 0 <= k < self.length:
+            raise IndexError("snake segment out of range")
+        return self.grid.point(self.cells[(self.head - k) & self.mask])
+
+    def __contains__(self, point):
+        return self.contains(self.grid.index(point))
+
+    def contains(self, i):
+        return i >= 0 and self.owner in self.grid.owners.get(i, ())
+
+    def head_cell(self):
+        # -1 once the head has left the board, or for an empty body
+        return self.cells[self.head] if self.length else -1
+
+    def tail_cell(self):
+        return self.cells[(self.head - self.length + 1) & self.mask] if self.length else -1
+
+    def push(self, i):
+        if self.length > self.mask:
+            self.resize()
+        self.head = (self.head + 1) & self.mask
+        self.cells[self.head] = i
+        self.length += 1
+        if i >= 0:
+            self.grid.add_cell(self.layer, i, self.owner)
+
+    def resize(self):
+        cells = self.cells_from_tail()
+        self.cells = array("l", [-1]) * (2 * len(self.cells))
+        self.cells[:len(cells)] = cells
+        self.mask = len(self.cells) - 1
+        self.head = len(cells) - 1
+
+    def advance(self, direction):
+        # The tail leaves after the head arrives, the same order as before
+        tail = self.tail_cell()
+        self.push(self.grid.next_cell(self.head_cell(), direction))
+        if self.pending:
+            self.pending -= 1
+        else:
+            self.length -= 1
+            if tail >= 0:
+                self.grid.remove_cell(self.layer, tail, self.owner)
+        return self.head_cell()
+
+    def grow(self, segments=1):
+        self.pending += segments
+
+    def cells_from_tail(self):
+        start = (self.head - self.length + 1) & self.mask
+        if start + self.length <= len(self.cells):
+            return self.cells[start:start + self.length]
+        return self.cells[start:] + self.cells[:self.head + 1]
+
+    def clear(self):
+        for i in self.cells_from_tail():
+            if i >= 0:
+                self.grid.remove_cell(self.layer, i, self.owner)
+        self.length = 0
+        self.pending = 0
+
+    def snapshot(self):
+        # Two slice copies of the live part of the buffer
+        return self.cells_from_tail(), self.pending
+
+    def restore(self, snapshot):
+        # Refills the same buffer unless the snapshot no longer fits in it
+        cells, pending = snapshot
+        self.clear()
+        if len(cells) > self.mask:
+            self.reserve(len(cells))
+        self.head = self.mask
+        for i in cells:
+            self.push(i)
+        self.pending = pending
+
+
+class AISnake:
+    def __init__(self, game, strategy="incremental", coordinates=None, snake_id=1, colour="yellow"):
+        self.game = game
+        self.coordinates = SnakeBody(
+            game.grid, game.grid.ai_snake, snake_id, coordinates or INITIAL_AI_SNAKE_COORDS
+        )
+        self.direction = "Down"
+        self.moves = 0
+        self.strategy = strategy
+        self.pathfinders = {}
+        self.id = snake_id
+        self.colour = colour
+        self.score = 0
+        self.died = False
+        self.death_cause = None
+        self.death_tick = None
+        self.tree_search = None
+
+    def decide_direction(self, food_coords):
+        if self.strategy == "mcts":
+            self.direction = self.monte_carlo().decide(self)
+            return
+        heading = self.direction
+        if self.strategy == "neural":
+            self.direction = self.game.policy.decide(self)
+        else:
+            path = self.next_step(self.strategy, food_coords)
+            if len(path) > 1:
+                # Move towards the next point in the path
+                next_point = path[1]
+                head = self.coordinates[0]
+                if head[0] < next_point[0]:
+                    self.direction = "Right"
+                elif head[0] > next_point[0]:
+                    self.direction = "Left"
+                elif head[1] < next_point[1]:
+                    self.direction = "Down"
+                else:
+                    self.direction = "Up"
+        self.direction = self.check_move(heading, self.direction)
+
+    def follow(self, target):
+        # Towards the cell a planner picked before the tick, decided at this
+        # snake's turn so the snakes that moved first are where they are now.
+        # -1 (no plan in time) keeps going if that is free.
+        heading = self.direction
+        head = self.coordinates.head_cell()
+        grid = self.game.grid
+        direction = None
+        if target >= 0:
+            for move in DIRECTIONS:
+                if move != OPPOSITE[heading] and grid.next_cell(head, move) == target:
+                    direction = move
+        if direction is None or not grid.free(target):
+            direction = self.free_direction(direction or heading)
+        self.direction = self.check_move(heading, direction)
+
+    def free_direction(self, direction):
+        # direction if its next cell is free, otherwise any free cell
+        grid = self.game.grid
+        head = self.coordinates.head_cell()
+        for candidate in (direction,) + DIRECTIONS:
+            if candidate != OPPOSITE[self.direction]:
+                i = grid.next_cell(head, candidate)
+                if i >= 0 and grid.free(i):
+                    return candidate
+        return direction
+
+    def check_move(self, heading, direction):
+        # direction unless it leads somewhere too small for the body, then
+        # the first move that doesn't, or the one with the most room
+        safety = self.game.move_safety
+        if safety is None:
+            return direction
+        body = self.coordinates
+        head, need = body.head_cell(), len(body)
+        rooms = {}
+        for move in (direction,) + DIRECTIONS:
+            if move == OPPOSITE[heading] or move in rooms:
+                continue
+            room = safety.room(body, self.game.grid.next_cell(head, move), need)
+            if room >= need:
+                return move
+            rooms[move] = room
+        best = max(rooms, key=rooms.get)
+        return best if rooms[best] > rooms.get(direction, -1) else direction
+
+    def check_collision(self):
+        grid = self.game.grid
+        i = self.coordinates.head_cell()
+        # Boundary check
+        if i < 0:
+            self.game.on_ai_snake_died("End! Enemy Snake died because it hit the boundary.", self)
+            return
+        owners = grid.owners[i]
+        # Snake colliding with a obstacle
+        if grid.obstacles[i]:
+            self.game.on_ai_snake_died("End! Enemy Snake died because it hit an obstacle.", self)
+        # Snake colliding with itself, the head is one of the segments on the cell
+        elif owners.count(self.id) > 1:
+            self.game.on_ai_snake_died("End! Enemy Snake died because it hit itself.", self)
+        elif grid.snake[i]:
+            self.game.on_ai_snake_died("End! Enemy Snake died because it hit User Snake.", self)
+        elif len(owners) > 1:
+            self.game.on_ai_snake_died("End! Enemy Snake died because it hit another Enemy Snake.", self)
+
+    def move(self):
+        self.coordinates.advance(self.direction)
+        self.moves += 1
+
+    def calculate_direction(self, current, target):
+        if current[0] < target[0]:
+            return "Right"
+        elif current[0] > target[0]:
+            return "Left"
+        elif current[1] < target[1]:
+            return "Down"
+        else:
+            return "Up"
+
+    def monte_carlo(self):
+        if self.tree_search is None:
+            from mcts import MonteCarloSearch  # mcts.py builds on this module
+            self.tree_search = MonteCarloSearch(self.game.seed * 31 + self.id)
+        return self.tree_search
+
+    def snapshot(self):
+        return (self.direction, self.moves, self.score, self.died, self.death_cause,
+                self.death_tick, self.coordinates.snapshot())
+
+    def restore(self, snapshot):
+        (self.direction, self.moves, self.score, self.died, self.death_cause,
+         self.death_tick, body) = snapshot
+        self.coordinates.restore(body)
+
+    def pathfinder(self, name):
+        finder = self.pathfinders.get(name)
+        if finder is None:
+            cache = self.game.shared_pathfinders if PATHFINDERS[name].shared else self.pathfinders
+            finder = cache.get(name)
+            if finder is None:
+                finder = cache[name] = PATHFINDERS[name](self.game.grid)
+            self.pathfinders[name] = finder
+        return finder
+
+    def next_step(self, name, food_coords):
+        # Only the next cell is needed to pick a direction
+        grid = self.game.grid
+        goal = grid.index(food_coords)
+        if goal < 0:
+            return []
+        finder = self.pathfinder(name)
+        finder.tail = self.coordinates.tail_cell()
+        step = finder.next_step(self.coordinates.head_cell(), goal)
+        if step < 0:
+            return []
+        return [self.coordinates[0], grid.point(step)]
+
+    def find_path(self, name, food_coords):
+        grid = self.game.grid
+        goal = grid.index(food_coords)
+        if goal < 0:
+            return []
+        path = self.pathfinder(name).search(self.coordinates.head_cell(), goal)
+        return [grid.point(i) for i in path]
+
+    def greedy_search(self, food_coords):
+        return self.find_path("greedy", food_coords)
+
+    def a_star_pathfinding(self, food_coords):
+        return self.find_path("a_star", food_coords)
+
+
+class SnakeEngine:
+    # All the game rules of SnakePj.py as plain data, no tkinter needed.
+    # SnakeGame draws whatever this holds; tests and AI evaluation can call
+    # step() directly as fast as Python allows.
+    # strategies gives every AI snake its own pathfinder name and overrides
+    # ai_count; without a user snake the AI snakes just play each other.
+    # width and height are the board size in pixels. tick_ms is how long a
+    # tick lasts on screen, a game holds GAME_TIME seconds of them.
+    def __init__(self, seed=None, ai_count=1, strategy=None, strategies=None, user_snake=True,
+                 width=WIDTH, height=HEIGHT, policy=None, move_safety=True, tick_ms=TICK_MS):
+        if strategies is not None:
+            ai_count = len(strategies)
+        if ai_count < 1:
+            # ai_snake, ai_score and the game over rules all need one
+            raise ValueError("a game needs at least one AI snake")
+        if tick_ms <= 0:
+            raise ValueError("tick_ms must be positive")
+        self.grid = OccupancyGrid(width, height)
+        if strategy is None:
+            # Every D* Lite planner replays every snake's moves, the shared
+            # distance field does that once for the whole crowd. On a large
+            # board every new food would restart either over millions of
+            # cells, greedy only looks along the way to the food.
+            if self.grid.size > LARGE_BOARD_CELLS:
+                strategy = "greedy"
+            else:
+                strategy = "incremental" if ai_count == 1 else "field"
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        # Kept so a game can be replayed from its seed
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.score = 0
+
+        self.tick = 0
+        self.max_ticks = GAME_TIME * 1000 // tick_ms
+        self.is_game_over = False
+        self.game_over_message = None
+        self.snake_died = False
+        self.snake_death_cause = None
+        self.snake_death_tick = None
+
+        self.shared_pathfinders = {}
+        # Flood fills every AI move for room to fit the body (bitboard.py)
+        self.move_safety = MoveSafety(self.grid) if move_safety else None
+        # The neural.NeuralPolicy every "neural" snake plays
+        self.policy = policy
+        if policy is None and "neural" in (strategies or (strategy,)):
+            raise ValueError("the neural strategy needs a policy, see evolve.py")
+        # A profiling.TickProfiler to time every phase of step()
+        self.profiler = None
+        self.user_snake = user_snake
+        self.snake = SnakeBody(
+            self.grid, self.grid.snake, USER_SNAKE_ID, INITIAL_SNAKE_COORDS if user_snake else ()
+        )
+        self.snake_died = not user_snake
+        self.ai_snakes = []
+        for k in range(ai_count):
+            coordinates = INITIAL_AI_SNAKE_COORDS if k == 0 else self.spawn_coordinates()
+            if coordinates is None:
+                break
+            colour = AI_SNAKE_COLOURS[k % len(AI_SNAKE_COLOURS)]
+            ai_strategy = strategies[k] if strategies is not None else strategy
+            self.ai_snakes.append(AISnake(self, ai_strategy, coordinates, k + 1, colour))
+        self.ai_snake = self.ai_snakes[0]
+        self.ai_alive = len(self.ai_snakes)
+        self.direction = "Right"
+        self.snake_moves = 0
+
+        self.obstacles = []
+        for _ in range(self.obstacles_count()):
+            obstacle = self.create_obstacle()
+            if obstacle is None:
+                break
+            self.obstacles.append(obstacle)
+        self.food = self.create_food()
+        # Now the obstacles are placed, the finders build their tables from
+        # them here and not in the first tick's search
+        for ai_snake in self.ai_snakes:
+            if ai_snake.strategy in PATHFINDERS:
+                ai_snake.pathfinder(ai_snake.strategy).prepare()
+
+    @property
+    def ai_score(self):
+        # The best enemy is the one the user has to beat
+        return max(ai_snake.score for ai_snake in self.ai_snakes)
+
+    @property
+    def ai_snake_died(self):
+        return self.ai_alive == 0
+
+    @property
+    def ai_snake_death_cause(self):
+        return self.ai_snake.death_cause
+
+    def spawn_coordinates(self):
+        # Three free cells in a row for another AI snake, head on the right
+        for _ in range(100):
+            x = self.random.randint(2, self.max_x()) * 20
+            y = self.random.randint(0, self.max_y()) * 20
+            coordinates = [(x, y), (x - 20, y), (x - 40, y)]
+            if all(self.grid.is_free(point) for point in coordinates):
+                return coordinates
+        return None
+
+    def on_snake_died(self, msg: str):
+        self.snake_died = True
+        self.snake_death_cause = msg
+        self.snake_death_tick = self.tick
+        self.snake.clear()
+
+    def on_ai_snake_died(self, msg: str, ai_snake=None):
+        ai_snake = ai_snake or self.ai_snake
+        ai_snake.died = True
+        ai_snake.death_cause = msg
+        ai_snake.death_tick = self.tick
+        self.ai_alive -= 1
+        ai_snake.coordinates.clear()
+
+    def obstacles_count(self):
+        default_size = ((WIDTH + 19) // 20) * ((HEIGHT + 19) // 20)
+        return OBSTACLES_COUNT * self.grid.size // default_size
+
+    def snapshot(self):
+        # Everything a tick can change, for a search to play a future and
+        # come back. Obstacles never change; the grid follows the bodies.
+        return (
+            self.tick, self.score, self.is_game_over, self.game_over_message,
+            self.snake_died, self.snake_death_cause, self.snake_death_tick,
+            self.direction, self.snake_moves, self.ai_alive, self.food,
+            self.random.getstate(), self.snake.snapshot(),
+            [ai_snake.snapshot() for ai_snake in self.ai_snakes],
+            self.grid.free_cells.snapshot(),
+        )
+
+    def restore(self, snapshot):
+        (self.tick, self.score, self.is_game_over, self.game_over_message,
+         self.snake_died, self.snake_death_cause, self.snake_death_tick,
+         self.direction, self.snake_moves, self.ai_alive, self.food,
+         random_state, snake, ai_snakes, free_cells) = snapshot
+        self.random.setstate(random_state)
+        self.snake.restore(snake)
+        for ai_snake, state in zip(self.ai_snakes, ai_snakes):
+            ai_snake.restore(state)
+        # After the bodies, putting them back shuffled the free list
+        self.grid.free_cells.restore(free_cells)
+
+    def max_x(self):
+        return self.grid.placeable_cols - 1
+
+    def max_y(self):
+        return self.grid.placeable_rows - 1
+
+    def increase_score(self, of):
+        # of is 'user' or the AISnake that ate
+        if of == 'user':
+            self.score += 1
+        else:
+            of.score += 1
+
+    def create_food(self):
+        # Any cell without an obstacle or a snake on it, None if there is none
+        i = self.grid.free_cells.choice(self.random)
+        if i < 0:
+            return None
+        return self.grid.point(i)
+
+    def create_obstacle(self):
+        i = self.grid.free_cells.choice(self.random)
+        if i < 0:
+            return None
+        self.grid.add_obstacle(i)
+        return self.grid.point(i)
+
+    def winner(self):
+        if self.score < self.ai_score:
+            return "ai"
+        elif self.score > self.ai_score:
+            return "user"
+        return "draw"
+
+    def game_over(self, msg):
+        self.is_game_over = True
+        self.game_over_message = msg
+
+    def check_collision(self):
+        i = self.snake.head_cell()
+        # Boundary check
+        if i < 0:
+            self.on_snake_died("Game Over! Snake hit the boundary.")
+        # Snake colliding with a obstacle
+        elif self.grid.obstacles[i]:
+            self.on_snake_died("Game Over! Snake hit an obstacle.")
+        # Snake colliding with itself, the head is one of the segments on the cell
+        elif self.grid.snake[i] > 1:
+            self.on_snake_died("Game Over! Snake hit itself.")
+        elif self.grid.ai_snake[i]:
+            self.on_snake_died("Game Over! Snake hit AI Snake.")
+
+    def change_direction(self, direction):
+        if direction in OPPOSITE and not self.direction == OPPOSITE[direction]:
+            self.direction = direction
+
+    def move_snake(self):
+        self.snake.advance(self.direction)
+        self.snake_moves += 1
+
+    def check_for_food(self):
+        food = self.grid.index(self.food)
+        eaten_by = []
+        if not self.snake_died and self.snake.head_cell() == food:
+            self.snake.grow()
+            eaten_by.append('user')
+
+        for ai_snake in self.ai_snakes:
+            if not ai_snake.died and ai_snake.coordinates.head_cell() == food:
+                ai_snake.coordinates.grow()
+                eaten_by.append(ai_snake)
+
+        for by in eaten_by:
+            self.increase_score(by)
+        if eaten_by:
+            self.food = self.create_food()
+        return eaten_by
+
+    def step(self, user_dir=None, ai_dirs=None, ai_targets=None):
+        # ai_dirs replaces the AI decisions, a replay already knows them. A
+        # None in it lets that snake decide for itself. ai_targets are the
+        # next cells a planning.PlanningWorker picked, followed at each
+        # snake's turn (AISnake.follow); None again decides in the tick.
+        if self.is_game_over:
+            return
+        if user_dir is not None:
+            self.change_direction(user_dir)
+        self.tick += 1
+        profiler = self.profiler or NULL_PROFILER
+        t = profiler.begin_tick(self.tick)
+        if not self.snake_died:
+            self.move_snake()
+            t = profiler.lap("move", t)
+            self.check_collision()
+            profiler.lap("collision", t)
+        self.finish_step(ai_dirs, ai_targets=ai_targets)
+
+    def finish_step(self, ai_dirs=None, first=0, ai_targets=None):
+        # The AI snakes from `first` on take their turn, then the tick ends.
+        # Every phase is timed by the attached profiler, if there is one.
+        profiler = self.profiler or NULL_PROFILER
+        t = profiler.clock()
+        ai_snakes = self.ai_snakes
+        for k in range(first, len(ai_snakes)):
+            ai_snake = ai_snakes[k]
+            if not ai_snake.died:
+                if ai_targets is not None and ai_targets[k] is not None:
+                    ai_snake.follow(ai_targets[k])
+                elif ai_dirs is None or ai_dirs[k] is None:
+                    ai_snake.decide_direction(self.food)
+                    if ai_snake.strategy in PATHFINDERS:
+                        profiler.add_nodes(ai_snake.pathfinder(ai_snake.strategy).expanded)
+                else:
+                    ai_snake.direction = ai_dirs[k]
+                t = profiler.lap("ai_decide", t)
+                ai_snake.move()
+                t = profiler.lap("move", t)
+                ai_snake.check_collision()
+                t = profiler.lap("collision", t)
+
+        self.check_for_food()
+        profiler.lap("food", t)
+        profiler.end_tick()
+        self.end_step()
+
+    def end_step(self):
+        if self.food is None:
+            self.game_over("Game Over! The board is full.")
+        elif self.snake_died and self.ai_snake_died:
+            self.game_over("Game Over! All snakes died.")
+        elif self.tick >= self.max_ticks:
+            self.game_over("Game Over! Time's up!")
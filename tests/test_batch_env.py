@@ -0,0 +1,161 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch_env import BODY, EMPTY, OBSTACLE, BatchSnakeEnv
+from snake_engine import DIRECTIONS, INITIAL_SNAKE_COORDS, OPPOSITE, SnakeEngine
+
+
+def solo_engine(seed, max_ticks):
+    # The batch games have no AI snake, this one's is taken off the board
+    engine = SnakeEngine(seed=seed, move_safety=False)
+    engine.on_ai_snake_died("", engine.ai_snake)
+    engine.max_ticks = max_ticks
+    return engine
+
+
+def mirror(env, k, engine):
+    # Game k of the batch set up as the engine's game is now. The two draw
+    # food from different generators, so the engine's food is used.
+    grid = engine.grid
+    cells = engine.snake.cells_from_tail()
+    env.board[k] = EMPTY
+    env.board[k, np.frombuffer(grid.obstacles, dtype=np.uint8) > 0] = OBSTACLE
+    env.board[k, cells] = BODY
+    env.body[k, :len(cells)] = cells
+    env.head_ptr[k] = len(cells) - 1
+    env.length[k] = len(cells)
+    env.grow[k] = engine.snake.pending > 0
+    env.direction[k] = DIRECTIONS.index(engine.direction)
+    env.food[k] = grid.index(engine.food)
+    env.score[k] = engine.score
+    env.steps[k] = engine.tick
+
+
+def body_of(env, k):
+    # Head first, like iterating a SnakeBody
+    return [int(env.body[k, (env.head_ptr[k] - j) % env.cells]) for j in range(env.length[k])]
+
+
+def choose(engine, rng):
+    # Mostly towards the food onto a free cell, sometimes anything at all,
+    # reversing included, so the snakes grow long and still die every way
+    grid = engine.grid
+    head, food = engine.snake.head_cell(), grid.index(engine.food)
+    options = []
+    for k, direction in enumerate(DIRECTIONS):
+        i = grid.next_cell(head, direction)
+        if direction != OPPOSITE[engine.direction] and i >= 0 and grid.free(i):
+            distance = abs(i % grid.cols - food % grid.cols) + abs(i // grid.cols - food // grid.cols)
+            options.append((distance + rng.random(), k))
+    if options and rng.random() < 0.95:
+        return min(options)[1]
+    return rng.randrange(len(DIRECTIONS))
+
+
+def check_occupancy(env):
+    # Every game's board holds its body and its obstacles and nothing else
+    for k in range(env.num_envs):
+        body = body_of(env, k)
+        assert len(set(body)) == len(body)
+        assert set(np.nonzero(env.board[k] == BODY)[0].tolist()) == set(body)
+        assert env.board[k, env.food[k]] == EMPTY and env.placeable[env.food[k]]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_follows_the_engine(seed):
+    games, max_ticks = 32, 300
+    engines = [solo_engine(seed * games + k, max_ticks) for k in range(games)]
+    env = BatchSnakeEnv(games, seed=seed, max_steps=max_ticks)
+    env.reset()
+    for k, engine in enumerate(engines):
+        mirror(env, k, engine)
+    rng = random.Random(seed)
+    playing = set(range(games))
+    outcomes = {"died": 0, "truncated": 0, "ate": 0}
+    while playing:
+        actions = [choose(engine, rng) if k in playing else 0 for k, engine in enumerate(engines)]
+        scores = [engine.score for engine in engines]
+        _, rewards, dones, info = env.step(actions)
+        for k in sorted(playing):
+            engine = engines[k]
+            engine.step(DIRECTIONS[actions[k]])
+            assert bool(info["died"][k]) == engine.snake_died, (k, engine.tick)
+            assert bool(info["truncated"][k]) == (engine.is_game_over and not engine.snake_died)
+            assert info["score"][k] == engine.score
+            assert rewards[k] == (engine.score - scores[k]) - engine.snake_died
+            outcomes["ate"] += engine.score - scores[k]
+            if dones[k]:
+                assert engine.is_game_over
+                outcomes["died" if engine.snake_died else "truncated"] += 1
+                playing.discard(k)
+                continue
+            assert body_of(env, k) == [engine.grid.index(point) for point in engine.snake]
+            assert bool(env.grow[k]) == (engine.snake.pending > 0)
+            env.food[k] = engine.grid.index(engine.food)
+    # Every way a game goes is in there
+    assert outcomes["died"] and outcomes["truncated"] and outcomes["ate"]
+
+
+@pytest.mark.parametrize("grow", [False, True])
+def test_tail_leaves_before_the_collision_check(grow):
+    # A snake of four in a square turns onto its own tail, which is only
+    # still there if the snake ate the tick before
+    engine = solo_engine(0, 100)
+    grid = engine.grid
+    square = [grid.index(point) for point in [(200, 200), (220, 200), (220, 220), (200, 220)]]
+    engine.snake.restore((square, int(grow)))
+    engine.direction = "Left"
+    env = BatchSnakeEnv(1, seed=0)
+    env.reset()
+    mirror(env, 0, engine)
+    _, _, dones, info = env.step([DIRECTIONS.index("Up")])
+    engine.step("Up")
+    assert bool(info["died"][0]) == engine.snake_died == grow
+
+
+def test_growth_shows_the_tick_after_eating():
+    engine = solo_engine(0, 100)
+    env = BatchSnakeEnv(1, seed=0)
+    env.reset()
+    mirror(env, 0, engine)
+    head = engine.snake.head_cell()
+    engine.food = engine.grid.point(head + 1)
+    env.food[0] = head + 1
+    lengths = []
+    for _ in range(2):
+        _, rewards, _, _ = env.step([DIRECTIONS.index("Right")])
+        engine.step("Right")
+        env.food[0] = engine.grid.index(engine.food)
+        lengths.append((int(env.length[0]), len(engine.snake)))
+    assert engine.score == 1
+    assert lengths == [(3, 3), (4, 4)]
+
+
+def test_finished_games_start_again():
+    env = BatchSnakeEnv(8, seed=1, max_steps=50)
+    env.reset()
+    initial = [(y // 20) * env.cols + x // 20 for x, y in INITIAL_SNAKE_COORDS]
+    finished = set()
+    # Straight up, into an obstacle or the top edge five rows up
+    for _ in range(6):
+        _, _, dones, info = env.step([DIRECTIONS.index("Up")] * 8)
+        assert (dones == info["died"]).all()
+        for k in np.nonzero(dones)[0].tolist():
+            finished.add(k)
+            assert body_of(env, k) == initial
+            assert env.steps[k] == 0 and env.score[k] == 0 and not env.grow[k]
+            assert (env.board[k] == OBSTACLE).sum() == env.obstacles_count
+        check_occupancy(env)
+    assert finished == set(range(8))
+
+
+def test_occupancy_follows_the_bodies():
+    env = BatchSnakeEnv(64, seed=2, max_steps=200)
+    env.reset()
+    rng = np.random.default_rng(2)
+    for _ in range(300):
+        env.step(rng.integers(0, len(DIRECTIONS), env.num_envs))
+        check_occupancy(env)
+        assert ((env.board == OBSTACLE).sum(axis=1) == env.obstacles_count).all()
@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from bitboard import WINDOW_RADIUS, MoveSafety
+from snake_engine import DIRECTIONS, OccupancyGrid, SnakeBody, SnakeEngine
+
+
+def reference(grid, body, cell, need):
+    # room() on sets over the whole board, one move at a time
+    if cell < 0:
+        return 0
+    tail = body.cells_from_tail()
+    delay = body.pending + 1
+
+    def left(t):
+        # Body cells the snake can move onto on move t
+        return {tail[j] for j in range(len(tail)) if j + delay <= t}
+
+    def grow(reach, t):
+        vacated = left(t)
+        return reach | {n for c in reach for n in grid.neighbours(c) if grid.free(n) or n in vacated}
+
+    t = 1
+    if not (grid.free(cell) or cell in left(t)):
+        return 0
+    reach = {cell}
+    while True:
+        if reach & left(t) or len(reach) >= need:
+            return need
+        t += 1
+        grown = grow(reach, t)
+        if grown == reach:
+            # Nothing opens up before the next tail cell leaves, and the
+            # snake has to keep moving inside reach until then
+            later = [j + delay for j in range(len(tail)) if j + delay > t]
+            if not later or later[0] - 1 > len(reach):
+                return len(reach)
+            t = later[0]
+            grown = grow(reach, t)
+        reach = grown
+
+
+def wall(grid, points):
+    for point in points:
+        grid.add_obstacle(grid.index(point))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_room_matches_a_set_flood_fill(seed):
+    rng = random.Random(seed)
+    engine = SnakeEngine(seed=seed, ai_count=3, strategy="greedy", move_safety=False)
+    for _ in range(rng.randrange(5, 300)):
+        engine.step()
+        if engine.is_game_over:
+            break
+    safety = MoveSafety(engine.grid)
+    for ai_snake in engine.ai_snakes:
+        if ai_snake.died:
+            continue
+        body = ai_snake.coordinates
+        body.grow(rng.choice([0, 0, 1, 3]))
+        for direction in DIRECTIONS:
+            cell = engine.grid.next_cell(body.head_cell(), direction)
+            need = len(body) + rng.choice([0, 0, 30, 200])
+            assert safety.room(body, cell, need) == reference(engine.grid, body, cell, need), direction
+
+
+def test_dead_end_is_only_as_big_as_it_is():
+    grid = OccupancyGrid(120, 60)
+    wall(grid, [(20, 0)])
+    body = SnakeBody(grid, grid.ai_snake, 1, [(0, 20), (20, 20), (40, 20), (60, 20), (80, 20)])
+    safety = MoveSafety(grid)
+    assert safety.room(body, grid.index((0, 0)), len(body)) == 1
+    assert safety.room(body, grid.index((0, 40)), len(body)) == len(body)
+
+
+@pytest.mark.parametrize("pending, room", [(0, 7), (1, 7), (2, 1)])
+def test_chasing_the_tail(pending, room):
+    # A 4x2 board the snake fills but for one cell; its tail leaves the
+    # cell next to it on the first move, unless the snake is still growing
+    grid = OccupancyGrid(80, 40)
+    body = SnakeBody(grid, grid.ai_snake, 1, [(0, 20), (20, 20), (40, 20), (60, 20), (60, 0), (40, 0), (20, 0)])
+    body.grow(pending)
+    cell = grid.index((0, 0))
+    assert MoveSafety(grid).room(body, cell, len(body)) == room == reference(grid, body, cell, len(body))
+
+
+@pytest.mark.parametrize("corridor", [30, 45])
+def test_fill_past_the_first_window(corridor):
+    # A snake 40 long heads into a one cell wide corridor that runs well
+    # past WINDOW_RADIUS: a dead end shorter than the body is too small
+    grid = OccupancyGrid(2000, 100)
+    end = 41 + corridor
+    wall(grid, [(x * 20, y) for x in range(end + 1) for y in (20, 60)] + [(0, 40), (end * 20, 40)])
+    body = SnakeBody(grid, grid.ai_snake, 1, [(x * 20, 40) for x in range(40, 0, -1)])
+    cell = grid.index((820, 40))
+    assert corridor > WINDOW_RADIUS
+    room = MoveSafety(grid).room(body, cell, len(body))
+    assert room == reference(grid, body, cell, len(body))
+    assert room == min(corridor, len(body))
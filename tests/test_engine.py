@@ -0,0 +1,172 @@
+import pytest
+
+from mcts import MonteCarloSearch
+from profiling import TickProfiler
+from snake_engine import GAME_TIME, SnakeEngine
+
+
+def empty_engine(**kwargs):
+    # An engine without obstacles, so only the moves a test makes decide
+    # where the snakes go
+    engine = SnakeEngine(seed=1, **kwargs)
+    grid = engine.grid
+    for point in engine.obstacles:
+        i = grid.index(point)
+        grid.obstacles[i] = 0
+        grid.free_cells.add(i)
+    engine.obstacles = []
+    return engine
+
+
+def play(engine, moves):
+    # moves holds (user direction, AI directions) for every tick
+    for user_dir, ai_dirs in moves:
+        engine.step(user_dir, ai_dirs)
+
+
+def free_cells_match(grid):
+    free = {i for i in range(grid.size) if grid.free(i) and grid.placeable(i)}
+    cells = list(grid.free_cells.cells)
+    return (set(cells) == free and len(cells) == len(free)
+            and all(grid.free_cells.position[i] == k for k, i in enumerate(cells)))
+
+
+def test_user_snake_hits_the_boundary():
+    engine = empty_engine()
+    play(engine, [("Up", ["Right"])] * 6)
+    assert engine.snake_died
+    assert engine.snake_death_cause == "Game Over! Snake hit the boundary."
+    assert engine.snake_death_tick == 6
+
+
+def test_user_snake_hits_an_obstacle():
+    engine = empty_engine()
+    engine.grid.add_obstacle(engine.grid.index((120, 100)))
+    play(engine, [("Right", ["Down"])])
+    assert engine.snake_death_cause == "Game Over! Snake hit an obstacle."
+
+
+def test_user_snake_hits_itself():
+    engine = empty_engine()
+    engine.snake.grow(2)
+    play(engine, [("Down", ["Right"]), ("Left", ["Right"]), ("Up", ["Right"])])
+    assert engine.snake_death_cause == "Game Over! Snake hit itself."
+
+
+def test_user_snake_hits_ai_snake():
+    engine = empty_engine()
+    play(engine, [("Right", ["Right"]), ("Down", ["Up"]), ("Down", ["Up"]), ("Down", ["Up"])])
+    assert engine.snake_death_cause == "Game Over! Snake hit AI Snake."
+    assert not engine.ai_snake.died
+
+
+def test_ai_snake_hits_user_snake():
+    engine = empty_engine()
+    play(engine, [("Down", ["Up"]), ("Down", ["Left"]), ("Left", ["Up"]), ("Left", ["Up"])])
+    assert engine.ai_snake.death_cause == "End! Enemy Snake died because it hit User Snake."
+    assert not engine.snake_died
+
+
+def test_ai_snake_hits_itself():
+    engine = empty_engine()
+    play(engine, [("Up", ["Left"])])
+    assert engine.ai_snake.death_cause == "End! Enemy Snake died because it hit itself."
+
+
+def test_ai_snake_hits_another_ai_snake():
+    engine = empty_engine(ai_count=2, user_snake=False)
+    grid, other = engine.grid, engine.ai_snakes[1]
+    other.coordinates.restore(([grid.index((80, y)) for y in (140, 160, 180)], 0))
+    play(engine, [(None, ["Up", "Down"])])
+    assert not engine.ai_snakes[0].died
+    assert other.death_cause == "End! Enemy Snake died because it hit another Enemy Snake."
+    assert free_cells_match(grid)
+
+
+def test_eating_scores_and_grows():
+    engine = empty_engine()
+    engine.food = (120, 100)
+    play(engine, [("Right", ["Down"])])
+    assert engine.score == 1
+    assert engine.food != (120, 100)
+    play(engine, [("Right", ["Down"])])
+    assert len(engine.snake) == 4
+
+
+def test_game_ends_when_time_is_up():
+    engine = SnakeEngine(seed=2)
+    engine.max_ticks = 5
+    play(engine, [(None, None)] * 10)
+    assert engine.is_game_over and engine.tick == 5
+    assert engine.game_over_message == "Game Over! Time's up!"
+
+
+def test_game_length_follows_the_tick():
+    assert SnakeEngine(seed=2, tick_ms=100).max_ticks == GAME_TIME * 10
+    assert SnakeEngine(seed=2, tick_ms=250).max_ticks == GAME_TIME * 4
+
+
+def test_a_tick_takes_time():
+    with pytest.raises(ValueError):
+        SnakeEngine(tick_ms=0)
+
+
+def test_game_ends_when_all_snakes_died():
+    engine = empty_engine(user_snake=False)
+    play(engine, [(None, ["Left"])] * 2)
+    assert engine.is_game_over and engine.tick == 1
+    assert engine.game_over_message == "Game Over! All snakes died."
+
+
+def test_a_game_needs_an_ai_snake():
+    with pytest.raises(ValueError):
+        SnakeEngine(ai_count=0)
+
+
+@pytest.mark.parametrize("width, height", [(1000, 650), (410, 290)])
+def test_free_cells_follow_the_grid(width, height):
+    engine = SnakeEngine(seed=3, ai_count=4, width=width, height=height)
+    while not engine.is_game_over and engine.tick < 300:
+        engine.step()
+        assert free_cells_match(engine.grid), engine.tick
+
+
+def test_restore_plays_the_same_game_again():
+    engine = SnakeEngine(seed=4, ai_count=3)
+    directions = ["Right", "Down", "Left", "Down", "Right", "Up"]
+    for tick in range(20):
+        engine.step(directions[tick % len(directions)])
+    snapshot = engine.snapshot()
+
+    def run():
+        states = []
+        for tick in range(100):
+            engine.step(directions[tick % len(directions)])
+            states.append((engine.tick, engine.food, engine.score, engine.snake_died,
+                           list(engine.snake), [list(s.coordinates) for s in engine.ai_snakes],
+                           [s.score for s in engine.ai_snakes], list(engine.grid.free_cells.cells)))
+        return states
+
+    first = run()
+    engine.restore(snapshot)
+    assert run() == first
+
+
+def test_profiling_times_the_same_game():
+    def run(profiler):
+        engine = SnakeEngine(seed=5, strategies=["a_star", "field", "mcts"])
+        engine.ai_snakes[-1].tree_search = MonteCarloSearch(iterations=20)
+        engine.profiler = profiler
+        directions = ["Right", "Down", "Left", "Down"]
+        states = []
+        for tick in range(60):
+            engine.step(directions[tick % len(directions)])
+            states.append((engine.score, list(engine.snake), [list(s.coordinates) for s in engine.ai_snakes]))
+        return states
+
+    profiler = TickProfiler()
+    assert run(profiler) == run(None)
+    assert [row["tick"] for row in profiler.rows] == list(range(1, 61))
+    # The tree search's own playouts aren't ticks of the game
+    assert all(row["ai_decide"] > 0 for row in profiler.rows)
+    assert sum(row["nodes"] for row in profiler.rows) > 0
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from bench_pathfinding import make_board
+from pathfinding import PATHFINDERS
+
+# These head for the food without looking for the shortest way there
+NOT_SHORTEST = {"greedy", "hamiltonian"}
+
+
+def is_path(grid, path, start, goal, free):
+    cols = grid.cols
+    return (path[0] == start and path[-1] == goal
+            and all(free(i) for i in path[1:])
+            and all(abs(a - b) == cols or (abs(a - b) == 1 and a // cols == b // cols)
+                    for a, b in zip(path, path[1:])))
+
+
+@pytest.mark.parametrize("name", sorted(PATHFINDERS))
+@pytest.mark.parametrize("width, height, obstacles, snake_length", [
+    (400, 300, 30, 20),
+    (1000, 650, 400, 60),
+    (3000, 1800, 1500, 100),
+])
+def test_paths_are_as_short_as_bfs(name, width, height, obstacles, snake_length):
+    for seed in range(4):
+        grid, head, rng = make_board(width, height, obstacles, snake_length, seed)
+        finder, bfs = PATHFINDERS[name](grid), PATHFINDERS["bfs"](grid)
+        finder.prepare()
+        free = grid.free
+        if name == "hamiltonian":
+            # The way round the cycle only avoids obstacles, bodies on it
+            # move along ahead of the snake
+            free = lambda i: not grid.obstacles[i]
+        free_cells = [i for i in range(grid.size) if grid.free(i)]
+        for goal in random.Random(seed).sample(free_cells, 5):
+            path, shortest = finder.search(head, goal), bfs.search(head, goal)
+            if name in NOT_SHORTEST:
+                assert not path or is_path(grid, path, head, goal, free)
+            else:
+                assert len(path) == len(shortest), (seed, goal)
+                assert not path or is_path(grid, path, head, goal, free)
@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from mcts import MonteCarloSearch
+from pathfinding import PATHFINDERS
+from planning import PlanningWorker
+from snake_engine import SnakeEngine
+
+
+def distances(grid, start, goal):
+    # Steps of the shortest way, -1 when there is none
+    return len(PATHFINDERS["bfs"](grid).search(start, goal)) - 1
+
+
+@pytest.mark.parametrize("strategy", ["incremental", "field"])
+def test_repaired_plans_stay_shortest(strategy):
+    # Planners kept across ticks only repair the cells the change log names;
+    # every tick their move has to start a shortest way to the food
+    engine = SnakeEngine(seed=11, ai_count=3, strategy="a_star")
+    grid = engine.grid
+    finders = {}
+    for _ in range(250):
+        if engine.is_game_over:
+            break
+        goal = grid.index(engine.food)
+        for ai_snake in engine.ai_snakes:
+            if ai_snake.died:
+                continue
+            key = strategy if PATHFINDERS[strategy].shared else ai_snake.id
+            finder = finders.setdefault(key, PATHFINDERS[strategy](grid))
+            head = ai_snake.coordinates.head_cell()
+            step = finder.next_step(head, goal)
+            shortest = distances(grid, head, goal)
+            if shortest < 0:
+                assert step < 0
+            else:
+                assert step in grid.neighbours(head) and grid.free(step)
+                assert step == goal or distances(grid, step, goal) == shortest - 1, engine.tick
+        engine.step()
+    assert engine.tick > 100
+
+
+def test_searches_out_of_time_return_a_partial_path():
+    engine = SnakeEngine(seed=12, width=20000, height=20000)
+    grid = engine.grid
+    head = engine.ai_snake.coordinates.head_cell()
+    goal = grid.size - 1 - grid.cols
+    assert grid.free(goal)
+    for name in ("a_star", "bfs", "greedy", "dijkstra", "jps"):
+        finder = PATHFINDERS[name](grid)
+        finder.deadline = time.perf_counter()
+        path = finder.search(head, goal)
+        # Nothing slow happens before the first look at the clock, jps's
+        # landmark table included
+        assert time.perf_counter() - finder.deadline < 0.5, name
+        assert path and path[0] == head and path[-1] != goal, name
+        assert all(grid.free(i) for i in path[1:])
+        assert all(b in grid.neighbours(a) for a, b in zip(path, path[1:]))
+        assert finder.heuristic(path[-1], goal) <= finder.heuristic(head, goal)
+
+
+@pytest.mark.parametrize("strategy, table", [("jps", "landmarks"), ("hamiltonian", "cycle")])
+def test_tables_are_ready_before_the_first_tick(strategy, table):
+    engine = SnakeEngine(seed=15, strategies=[strategy, "a_star"], width=6000, height=6000)
+    built = getattr(engine.ai_snake.pathfinder(strategy), table)
+    assert built is not None
+    worker = PlanningWorker(engine, 20)
+    try:
+        # The worker's copy of the grid has the same obstacles, so the same table
+        assert getattr(worker.pathfinder(engine.ai_snake.id, strategy), table) is built
+    finally:
+        worker.close()
+
+
+def test_dstar_out_of_time_carries_on_next_tick():
+    engine = SnakeEngine(seed=12, width=4000, height=4000)
+    grid = engine.grid
+    head = engine.ai_snake.coordinates.head_cell()
+    goal = grid.size - 1 - grid.cols
+    finder = PATHFINDERS["incremental"](grid)
+    finder.deadline = time.perf_counter()
+    step = finder.next_step(head, goal)
+    # Only a move it could take, if any
+    assert step < 0 or (step in grid.neighbours(head) and grid.free(step))
+    finder.deadline = None
+    step = finder.next_step(head, goal)
+    assert distances(grid, step, goal) == distances(grid, head, goal) - 1
+
+
+def test_snakes_without_a_plan_keep_a_safe_heading():
+    engine = SnakeEngine(seed=13, ai_count=4, user_snake=False)
+    grid = engine.grid
+    for _ in range(200):
+        if engine.is_game_over:
+            break
+        safe = {}
+        for ai_snake in engine.ai_snakes:
+            head = ai_snake.coordinates.head_cell()
+            safe[ai_snake.id] = any(grid.free(i) for i in grid.neighbours(head))
+        engine.step(ai_targets=[-1] * len(engine.ai_snakes))
+        for ai_snake in engine.ai_snakes:
+            # No snake with a free cell next to it ran into anything on its
+            # own; it can still lose a head-on race for the same cell
+            if ai_snake.died and ai_snake.death_tick == engine.tick and safe[ai_snake.id]:
+                assert "another Enemy Snake" in ai_snake.death_cause
+
+
+@pytest.mark.parametrize("plan_ms", [1, 20])
+def test_worker_results_are_this_ticks(plan_ms):
+    engine = SnakeEngine(seed=14, strategies=["incremental", "field", "field", "a_star", "jps", "mcts"],
+                         user_snake=False, width=1600, height=1200)
+    # The tree search plays on the main thread, a short one will do
+    engine.ai_snakes[-1].tree_search = MonteCarloSearch(iterations=10)
+    worker = PlanningWorker(engine, plan_ms)
+    try:
+        layers = None
+        for _ in range(150):
+            if engine.is_game_over:
+                break
+            heads = [ai_snake.coordinates.head_cell() for ai_snake in engine.ai_snakes]
+            grid = engine.grid
+            layers = (bytes(grid.obstacles), bytes(grid.snake), bytes(grid.ai_snake))
+            targets = worker.targets()
+            for ai_snake, head, target in zip(engine.ai_snakes, heads, targets):
+                if ai_snake.strategy == "mcts":
+                    assert target is None
+                elif ai_snake.died:
+                    assert target == -1
+                else:
+                    # A late answer from an earlier tick would be next to an
+                    # older head
+                    assert target == -1 or target in grid.neighbours(head)
+            engine.step(ai_targets=targets)
+        # Once the queue is empty the worker's grid is the game's grid as
+        # of its last request
+        worker.executor.submit(lambda: None).result()
+        assert (bytes(worker.grid.obstacles), bytes(worker.grid.snake), bytes(worker.grid.ai_snake)) == layers
+    finally:
+        worker.close()
+    assert engine.tick > 50
@@ -0,0 +1,143 @@
+import copy
+import random
+import struct
+
+import numpy as np
+import pytest
+
+from render import PALETTE_BITS, FrameRenderer, GifWriter, lzw_encode
+from snake_engine import SnakeEngine
+
+
+def lzw_decode(data, min_size):
+    # A plain GIF LZW decoder, returns the pixels and how many clear codes
+    # it read
+    clear, end = 1 << min_size, (1 << min_size) + 1
+    size, table, prev = min_size + 1, None, None
+    out = bytearray()
+    acc = int.from_bytes(data, "little")
+    position = clears = 0
+    while True:
+        code = (acc >> position) & ((1 << size) - 1)
+        position += size
+        if code == clear or table is None:
+            assert code == clear, "the stream starts with a clear code"
+            clears += 1
+            size, table, prev = min_size + 1, [bytes((i,)) for i in range(clear)] + [b"", b""], None
+            continue
+        if code == end:
+            return bytes(out), clears
+        if prev is None:
+            entry = table[code]
+        else:
+            entry = table[code] if code < len(table) else prev + prev[:1]
+            table.append(prev + entry[:1])
+        if len(table) == 1 << size and size < 12:
+            size += 1
+        out += entry
+        prev = entry
+
+
+def decode_gif(path):
+    # Every frame of an animated GIF drawn over the ones before, as arrays
+    # of palette indices, and the clear codes in all of them
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:6] == b"GIF89a"
+    width, height, flags = struct.unpack_from("<HHB", data, 6)
+    position = 13 + 3 * (2 << (flags & 7))
+    canvas = np.zeros((height, width), dtype=np.uint8)
+    frames = []
+    clears = 0
+    while data[position] != 0x3B:
+        kind = data[position]
+        if kind == 0x21:
+            position += 2
+            while data[position]:
+                position += data[position] + 1
+            position += 1
+            continue
+        assert kind == 0x2C
+        x, y, w, h, image_flags = struct.unpack_from("<HHHHB", data, position + 1)
+        assert image_flags == 0
+        min_size = data[position + 10]
+        position += 11
+        blocks = bytearray()
+        while data[position]:
+            blocks += data[position + 1:position + 1 + data[position]]
+            position += data[position] + 1
+        position += 1
+        pixels, image_clears = lzw_decode(bytes(blocks), min_size)
+        clears += image_clears
+        canvas[y:y + h, x:x + w] = np.frombuffer(pixels, dtype=np.uint8).reshape(h, w)
+        frames.append(canvas.copy())
+    return frames, clears
+
+
+@pytest.mark.parametrize("kind", ["random", "runs", "mixed"])
+def test_lzw_round_trip(kind):
+    rng = random.Random(kind)
+    colours = 1 << PALETTE_BITS
+    if kind == "random":
+        data = bytes(rng.randrange(colours) for _ in range(60000))
+    elif kind == "runs":
+        data = b"".join(bytes((rng.randrange(colours),)) * rng.randrange(1, 400) for _ in range(20000))
+    else:
+        data = b"".join(bytes(rng.randrange(colours) for _ in range(rng.randrange(1, 20))) * rng.randrange(1, 30)
+                        for _ in range(3000))
+    encoded = lzw_encode(data, PALETTE_BITS)
+    decoded, clears = lzw_decode(encoded, PALETTE_BITS)
+    assert decoded == data
+    # Past a full table, so the code width went to 12 bits and back
+    assert clears >= 2
+
+
+def test_lzw_round_trip_of_every_short_length():
+    # Some of these end just as the code width grows
+    colours = 1 << PALETTE_BITS
+    for n in range(1, 600):
+        rng = random.Random(n)
+        data = bytes(rng.randrange(colours) for _ in range(n))
+        assert lzw_decode(lzw_encode(data, PALETTE_BITS), PALETTE_BITS)[0] == data, n
+
+
+def test_gif_frames_decode_to_the_rendered_board(tmp_path):
+    engine = SnakeEngine(seed=7, ai_count=3, width=2000, height=1400)
+    # A busy board so the first frame alone takes several code tables
+    rng = random.Random(7)
+    for i in rng.sample(list(engine.grid.free_cells.cells), engine.grid.size // 4):
+        if engine.grid.free(i):
+            engine.grid.add_obstacle(i)
+    renderer = FrameRenderer(engine.grid, 6)
+    renderer.draw(engine)
+    path = str(tmp_path / "game.gif")
+    expected = []
+    with GifWriter(path, renderer) as gif:
+        gif.add_frame()
+        expected.append(renderer.frame().copy())
+        for _ in range(60):
+            engine.step()
+            renderer.draw(engine)
+            gif.add_frame()
+            expected.append(renderer.frame().copy())
+    frames, clears = decode_gif(path)
+    assert clears > len(frames)
+    assert len(frames) == len(expected)
+    for tick, (frame, pixels) in enumerate(zip(frames, expected)):
+        assert np.array_equal(frame, pixels), tick
+
+
+@pytest.mark.parametrize("cell", [4, 20])
+def test_dirty_rects_match_a_full_redraw(cell):
+    engine = SnakeEngine(seed=8, ai_count=4, width=610, height=410)
+    renderer = FrameRenderer(engine.grid, cell)
+    renderer.draw(engine)
+    while not engine.is_game_over and engine.tick < 400:
+        engine.step()
+        if engine.tick % 50 == 0:
+            # What a replay seek does, a copy of the engine with its own grid
+            engine = copy.deepcopy(engine)
+        renderer.draw(engine)
+        full = FrameRenderer(engine.grid, cell)
+        full.draw(engine)
+        assert np.array_equal(renderer.frame(), full.frame()), engine.tick
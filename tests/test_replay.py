@@ -0,0 +1,25 @@
+from replay import KEYFRAME_INTERVAL, ReplayPlayer, ReplayRecorder, snakes_of
+from snake_engine import SnakeEngine
+
+
+def test_seek_matches_the_live_game(tmp_path):
+    path = str(tmp_path / "game.snr")
+    engine = SnakeEngine(seed=5, ai_count=3, user_snake=False)
+    states = {0: (snakes_of(engine), engine.food)}
+    with ReplayRecorder(path, engine) as recorder:
+        while not engine.is_game_over and engine.tick < 3 * KEYFRAME_INTERVAL:
+            engine.step()
+            recorder.record()
+            states[engine.tick] = (snakes_of(engine), engine.food)
+    assert engine.tick > KEYFRAME_INTERVAL
+
+    player = ReplayPlayer(path)
+    try:
+        # Forwards tick by tick, then jumps both ways across keyframes
+        ticks = list(range(engine.tick + 1)) + [engine.tick // 2, 1, engine.tick, KEYFRAME_INTERVAL + 1, 0]
+        for tick in ticks:
+            replayed = player.seek(tick)
+            assert replayed.tick == tick
+            assert (snakes_of(replayed), replayed.food) == states[tick], tick
+    finally:
+        player.close()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import random
+
+import snake_engine
+from server import INPUT, JOIN, GameServer, Match, MatchView, pack_message, read_message
+
+
+def test_views_follow_the_engine_every_tick(monkeypatch):
+    # Games of 200 ticks at 5 ms
+    monkeypatch.setattr(snake_engine, "GAME_TIME", 1)
+    expected = {}
+    step = Match.step
+
+    def recorded_step(match):
+        step(match)
+        grid = match.engine.grid
+        food = grid.index(match.engine.food) if match.engine.food is not None else None
+        expected[match.id, match.engine.tick] = ([[grid.index(p) for p in body] for body in match.bodies], food)
+
+    monkeypatch.setattr(Match, "step", recorded_step)
+
+    def check(view):
+        bodies, food = expected[view.id, view.tick]
+        assert [list(snake) for snake in view.snakes] == bodies, view.tick
+        if food is not None:
+            assert view.food == food, view.tick
+
+    async def watch(reader, view, ticks):
+        while view.game_over_message is None:
+            message = await read_message(reader)
+            view.apply(message)
+            if view.game_over_message is None:
+                check(view)
+                ticks.append(view.tick)
+
+    async def play(port, rng):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(pack_message(JOIN.pack(b"J", 0)))
+        view = MatchView(await read_message(reader))
+        # A second client watches the same match from a few ticks in
+        await asyncio.sleep(0.03)
+        spectator_reader, spectator_writer = await asyncio.open_connection("127.0.0.1", port)
+        spectator_writer.write(pack_message(JOIN.pack(b"J", view.id)))
+        spectator = MatchView(await read_message(spectator_reader))
+        ticks, spectator_ticks = [], []
+
+        async def steer():
+            while view.game_over_message is None:
+                writer.write(pack_message(INPUT.pack(b"D", rng.randrange(4))))
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(watch(reader, view, ticks), watch(spectator_reader, spectator, spectator_ticks), steer())
+        writer.close()
+        spectator_writer.close()
+        return view, spectator, ticks, spectator_ticks
+
+    async def main():
+        server = GameServer(tick_ms=5)
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        results = await asyncio.wait_for(asyncio.gather(*(play(port, random.Random(k)) for k in range(3))), 30)
+        listener.close()
+        await listener.wait_closed()
+        return server, results
+
+    server, results = asyncio.run(main())
+    for view, spectator, ticks, spectator_ticks in results:
+        assert ticks == list(range(1, view.tick + 1))
+        assert spectator_ticks == list(range(spectator_ticks[0], view.tick + 1))
+        assert view.game_over_message == spectator.game_over_message
+    assert len(server.finished) == 3
+
+
+def test_shutdown_ends_matches_and_hangs_up(tmp_path):
+    path = str(tmp_path / "server.sock")
+
+    async def client():
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(pack_message(JOIN.pack(b"J", 0)))
+        view = MatchView(await read_message(reader))
+        while view.game_over_message is None:
+            view.apply(await read_message(reader))
+        rest = await reader.read()
+        writer.close()
+        return view.game_over_message, rest
+
+    async def main():
+        server = GameServer(tick_ms=20, matches=2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        watching = asyncio.ensure_future(client())
+        await asyncio.wait_for(server.serve(unix=path, report_seconds=10, duration=0.5), 5)
+        elapsed = loop.time() - started
+        return server, elapsed, await asyncio.wait_for(watching, 5)
+
+    server, elapsed, (message, rest) = asyncio.run(main())
+    assert 0.5 <= elapsed < 1.5
+    assert message == "Game Over! The server shut down."
+    # The server closed the connection after the E message
+    assert rest == b""
+    assert not server.matches and not server.tasks and not server.connections
+    assert len(server.finished) == 3
@@ -0,0 +1,165 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from pathfinding import JumpPointSearch
+from replay import ReplayRecorder
+from snake_engine import STRATEGIES, SnakeEngine
+
+# python tournament.py --strategies greedy,a_star,incremental --games 10000
+# Every pairing plays --games headless matches, each seed twice with the spawn
+# positions swapped, spread over a process pool.
+
+
+def play_match(task):
+    seed, strategies, max_ticks, record_dir, policy_path, move_safety = task
+    policy = None
+    if policy_path:
+        from neural import load_policy
+        policy = load_policy(policy_path)
+    engine = SnakeEngine(seed=seed, strategies=strategies, user_snake=False, policy=policy,
+                         move_safety=move_safety)
+    if max_ticks:
+        engine.max_ticks = max_ticks
+    recorder = None
+    if record_dir:
+        name = "match-{}-{}.snr".format(seed, "-".join(strategies))
+        recorder = ReplayRecorder(os.path.join(record_dir, name), engine)
+    while not engine.is_game_over:
+        engine.step()
+        if recorder is not None:
+            recorder.record()
+    if recorder is not None:
+        recorder.close()
+    scores = [ai_snake.score for ai_snake in engine.ai_snakes]
+    best = max(scores)
+    winners = [i for i, score in enumerate(scores) if score == best]
+    return {
+        "seed": seed,
+        "strategies": list(strategies),
+        "scores": scores,
+        "survived": [
+            ai_snake.death_tick if ai_snake.died else engine.tick for ai_snake in engine.ai_snakes
+        ],
+        "death_causes": [ai_snake.death_cause for ai_snake in engine.ai_snakes],
+        "winner": winners[0] if len(winners) == 1 else None,
+        "ticks": engine.tick,
+    }
+
+
+def use_landmark_cache(cache_dir):
+    # Runs in every worker process
+    JumpPointSearch.cache_dir = cache_dir
+
+
+def make_tasks(strategies, games, seed, max_ticks, record_dir=None, policy=None, move_safety=True):
+    tasks = []
+    for a, b in itertools.combinations(strategies, 2):
+        for game in range(games):
+            pairing = (a, b) if game % 2 == 0 else (b, a)
+            # Both ways round on the same board, so neither side keeps the
+            # better spawn of a layout
+            tasks.append((seed + game // 2, pairing, max_ticks, record_dir, policy, move_safety))
+    return tasks
+
+
+def summarize(results):
+    stats = {}
+    for result in results:
+        for i, name in enumerate(result["strategies"]):
+            entry = stats.setdefault(name, {
+                "games": 0, "wins": 0, "draws": 0, "losses": 0,
+                "score": 0, "survived": 0, "death_causes": Counter(),
+            })
+            entry["games"] += 1
+            if result["winner"] is None:
+                entry["draws"] += 1
+            elif result["winner"] == i:
+                entry["wins"] += 1
+            else:
+                entry["losses"] += 1
+            entry["score"] += result["scores"][i]
+            entry["survived"] += result["survived"][i]
+            entry["death_causes"][result["death_causes"][i] or "Survived"] += 1
+
+    summary = {}
+    for name, entry in stats.items():
+        games = entry["games"]
+        summary[name] = {
+            "games": games,
+            "win_rate": entry["wins"] / games,
+            "draw_rate": entry["draws"] / games,
+            "loss_rate": entry["losses"] / games,
+            "mean_score": entry["score"] / games,
+            "mean_survival_ticks": entry["survived"] / games,
+            "death_causes": dict(entry["death_causes"].most_common()),
+        }
+    return summary
+
+
+def print_summary(summary):
+    print("{:<12} {:>7} {:>7} {:>7} {:>7} {:>8} {:>9}".format(
+        "strategy", "games", "win", "draw", "loss", "score", "survival"))
+    ranked = sorted(summary.items(), key=lambda item: item[1]["win_rate"], reverse=True)
+    for name, entry in ranked:
+        print("{:<12} {:>7} {:>6.1%} {:>6.1%} {:>6.1%} {:>8.2f} {:>9.1f}".format(
+            name, entry["games"], entry["win_rate"], entry["draw_rate"], entry["loss_rate"],
+            entry["mean_score"], entry["mean_survival_ticks"]))
+    for name, entry in ranked:
+        print("\n{} died from:".format(name))
+        for cause, count in entry["death_causes"].items():
+            print("  {:>6}  {}".format(count, cause))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless matches between AISnake strategies.")
+    parser.add_argument("--strategies", default="greedy,a_star,incremental",
+                        help="comma separated strategy names, any of: " + ", ".join(STRATEGIES))
+    parser.add_argument("--games", type=int, default=100, help="matches per pairing")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--max-ticks", type=int, default=0, help="override the match length in ticks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--out", help="write the summary and every match result as JSON")
+    parser.add_argument("--record", help="directory to save a replay of every match in")
+    parser.add_argument("--policy", help="checkpoint from evolve.py for the neural strategy")
+    parser.add_argument("--no-safety", action="store_true",
+                        help="let the AI snakes move into pockets too small for their bodies")
+    parser.add_argument("--landmark-cache", help="keep landmark tables of the jps strategy on large boards in this directory")
+    args = parser.parse_args(argv)
+
+    strategies = args.strategies.split(",")
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error("unknown strategies: {}".format(", ".join(unknown)))
+    if len(strategies) < 2:
+        parser.error("need at least two strategies")
+    if "neural" in strategies and not args.policy:
+        parser.error("the neural strategy needs a --policy checkpoint")
+
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    tasks = make_tasks(strategies, args.games, args.seed, args.max_ticks, args.record, args.policy,
+                       not args.no_safety)
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=use_landmark_cache,
+                             initargs=(args.landmark_cache,)) as pool:
+        chunksize = max(1, len(tasks) // (4 * (args.workers or 1)))
+        results = list(pool.map(play_match, tasks, chunksize=chunksize))
+    elapsed = time.time() - started
+
+    summary = summarize(results)
+    print("{} matches in {:.1f}s\n".format(len(results), elapsed))
+    print_summary(summary)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"summary": summary, "matches": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())